@@ -0,0 +1,307 @@
+# pylint: disable = (missing-module-docstring)
+
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import stats
+
+from src.backends import BACKENDS
+from src.latency_stats import (
+    NS_IN_MS,
+    bootstrap_relative_change_ci,
+    load_latency_samples,
+)
+from src.results_store import ResultsStore
+
+# result fields which identify a configuration, besides options of its backend
+CONFIG_FIELDS = (
+    "model_name",
+    "benchmark_type",
+    "benchmark_name",
+    "precision",
+    "batch_size",
+    "use_jit",
+    "data_mode",
+    "latency_scope",
+    "amount",
+)
+# backend options which do not change what is measured
+IGNORED_OPTIONS = (
+    "cache_frozen_torchscript",
+    "onnx_cache_dir",
+    "onnx_cache_max_size",
+    "quantization_cache_dir",
+    "compile_cache_dir",
+)
+
+
+def get_config_key(result: Dict[str, Any]) -> str:
+    option_names: List[str] = []
+    backend_spec = BACKENDS.get(result["benchmark_type"])
+    if backend_spec is not None:
+        option_names = [
+            name
+            for name in [*backend_spec.options, *backend_spec.fixed_options]
+            if name not in IGNORED_OPTIONS
+        ]
+    config = {name: result.get(name) for name in [*CONFIG_FIELDS, *option_names]}
+    return json.dumps(config, sort_keys=True)
+
+
+def load_batch_times(result: Dict[str, Any], store_dir: str) -> Optional[np.ndarray]:
+    # paths of latency samples are relative to the directory the benchmark ran in,
+    # usually the directory of the store
+    path = result.get("latency_samples_file")
+    if path is None:
+        return None
+    for candidate_path in (path, os.path.join(store_dir, path)):
+        if os.path.exists(candidate_path):
+            return load_latency_samples(candidate_path)["time_ns"] / NS_IN_MS
+    return None
+
+
+def load_configurations(
+    path: str, **filters: Any
+) -> Dict[str, Tuple[Dict[str, Any], List[np.ndarray]]]:
+    """Load per-batch latency of every configuration in a results store.
+
+    Args:
+        path: Results store.
+        filters: Values of indexed columns of compared results.
+
+    Returns:
+        Configuration and latency samples of all its runs by configuration key.
+    """
+    if not os.path.exists(path):
+        raise RuntimeError(f"File doesn't exist: {path}")
+
+    store_dir = os.path.dirname(os.path.abspath(path))
+    configurations: Dict[str, Tuple[Dict[str, Any], List[np.ndarray]]] = {}
+    with ResultsStore(path) as store:
+        for result in store.query(**filters):
+            _, batch_times = configurations.setdefault(
+                get_config_key(result), (result, [])
+            )
+            times = load_batch_times(result, store_dir)
+            if times is not None:
+                batch_times.append(times)
+    return configurations
+
+
+def get_compared_latency(
+    baseline_runs: List[np.ndarray], candidate_runs: List[np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray, str]:
+    """Select latency samples compared between the stores.
+
+    Batches of a run share its noise, e.g. frequency scaling or a busy neighbour, so
+    they are not independent samples of run-to-run variation. Runs are compared by
+    their mean latency if any of the stores has many runs of the configuration,
+    batches are compared only between two single runs.
+
+    Args:
+        baseline_runs: Per-batch latency of every baseline run.
+        candidate_runs: Per-batch latency of every candidate run.
+
+    Returns:
+        Compared baseline and candidate latency and their unit, `runs` or `batches`.
+    """
+    if max(len(baseline_runs), len(candidate_runs)) >= 2:
+        return (
+            np.array([np.mean(times) for times in baseline_runs]),
+            np.array([np.mean(times) for times in candidate_runs]),
+            "runs",
+        )
+    return np.concatenate(baseline_runs), np.concatenate(candidate_runs), "batches"
+
+
+def compare_batch_times(
+    baseline: np.ndarray,
+    candidate: np.ndarray,
+    confidence: float,
+) -> Dict[str, float]:
+    """Compare latency of two runs of the same configuration.
+
+    Args:
+        baseline: Per-batch latency measured before the change.
+        candidate: Per-batch latency measured after the change.
+        confidence: Confidence level of the interval of the relative change.
+
+    Returns:
+        Mean latency of both runs, relative change of the mean with its confidence
+        interval and p-value of two-sided Mann-Whitney U test.
+    """
+    ci_low, ci_high = bootstrap_relative_change_ci(
+        baseline, candidate, confidence=confidence
+    )
+    return {
+        "baseline_mean": float(np.mean(baseline)),
+        "candidate_mean": float(np.mean(candidate)),
+        "relative_change": float(np.mean(candidate) / np.mean(baseline) - 1.0),
+        "relative_change_ci_low": ci_low,
+        "relative_change_ci_high": ci_high,
+        "p_value": float(
+            stats.mannwhitneyu(candidate, baseline, alternative="two-sided").pvalue
+        ),
+    }
+
+
+def get_verdict(comparison: Dict[str, float], alpha: float, threshold: float) -> str:
+    """Classify change of latency between two runs of a configuration.
+
+    A regression or an improvement needs latency distributions which differ
+    significantly, a change of the mean larger than the threshold and a confidence
+    interval of the change which excludes zero, so that noisy runs do not fail the
+    comparison.
+
+    Args:
+        comparison: Comparison of two runs, see `compare_batch_times`.
+        alpha: Significance level of Mann-Whitney U test.
+        threshold: Relative change of the mean, e.g. 0.05 for 5%.
+
+    Returns:
+        Verdict of the comparison.
+    """
+    if comparison["p_value"] >= alpha:
+        return "no change"
+    if abs(comparison["relative_change"]) <= threshold:
+        return "within threshold"
+    if comparison["relative_change_ci_low"] > 0.0:
+        return "REGRESSION"
+    if comparison["relative_change_ci_high"] < 0.0:
+        return "improvement"
+    return "inconclusive"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        "Compare latency of configurations benchmarked in two results stores"
+    )
+    parser.add_argument(
+        "--baseline_file",
+        type=str,
+        required=True,
+        help="SQLite database with results before the change, e.g. an upgrade.",
+    )
+    parser.add_argument(
+        "--candidate_file",
+        type=str,
+        required=True,
+        help="SQLite database with results after the change.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=5.0,
+        help="Change of mean latency in percent above which a significant increase "
+        + "is a regression and a significant decrease an improvement.",
+    )
+    parser.add_argument(
+        "--alpha",
+        type=float,
+        default=0.05,
+        help="Significance level of Mann-Whitney U test.",
+    )
+    parser.add_argument(
+        "--confidence",
+        type=float,
+        default=0.95,
+        help="Confidence level of the interval of the relative change.",
+    )
+    parser.add_argument(
+        "--model_name", type=str, help="Compare only results of this model."
+    )
+    parser.add_argument(
+        "--benchmark_type", type=str, help="Compare only results of this type."
+    )
+    parser.add_argument(
+        "--precision",
+        choices=["fp32", "fp16", "int8"],
+        help="Compare only results of this precision.",
+    )
+    parser.add_argument(
+        "--batch_size", type=int, help="Compare only results of this batch size."
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    filters = {
+        "model_name": args.model_name,
+        "benchmark_type": args.benchmark_type,
+        "precision": args.precision,
+        "batch_size": args.batch_size,
+    }
+    baseline_configs = load_configurations(args.baseline_file, **filters)
+    candidate_configs = load_configurations(args.candidate_file, **filters)
+
+    n_regressions = 0
+    n_compared = 0
+    n_missing_samples = 0
+    print(
+        "| model | type | benchmark | precision | batch size | baseline [ms/batch] "
+        + "| candidate [ms/batch] | change [%] | CI [%] | p-value | compared "
+        + "| verdict |"
+    )
+    print("|---|---|---|---|---|---|---|---|---|---|---|---|")
+    for key, (config, candidate_times) in candidate_configs.items():
+        if key not in baseline_configs:
+            continue
+
+        _, baseline_times = baseline_configs[key]
+        description = (
+            f"| {config['model_name']} | {config['benchmark_type']} "
+            + f"| {config['benchmark_name']} | {config['precision']} "
+            + f"| {config['batch_size']} |"
+        )
+        if not baseline_times or not candidate_times:
+            print(f"{description} | | | | | | missing latency samples |")
+            n_missing_samples += 1
+            continue
+
+        baseline, candidate, unit = get_compared_latency(
+            baseline_times, candidate_times
+        )
+        comparison = compare_batch_times(
+            baseline=baseline, candidate=candidate, confidence=args.confidence
+        )
+        verdict = get_verdict(comparison, args.alpha, args.threshold / 100.0)
+        n_compared += 1
+        n_regressions += verdict == "REGRESSION"
+        print(
+            f"{description} {comparison['baseline_mean']:.3f} "
+            + f"| {comparison['candidate_mean']:.3f} "
+            + f"| {comparison['relative_change'] * 100.0:+.2f} "
+            + f"| [{comparison['relative_change_ci_low'] * 100.0:+.2f}, "
+            + f"{comparison['relative_change_ci_high'] * 100.0:+.2f}] "
+            + f"| {comparison['p_value']:.4f} | {len(candidate)} {unit} "
+            + f"| {verdict} |"
+        )
+
+    unmatched = set(baseline_configs) ^ set(candidate_configs)
+    if unmatched:
+        print(
+            f"\nWARNING: {len(unmatched)} configurations are benchmarked only in "
+            + "one of the stores and are not compared."
+        )
+    if n_missing_samples:
+        print(
+            f"\nWARNING: {n_missing_samples} configurations have no latency samples "
+            + "in one of the stores and are not compared."
+        )
+    if not n_compared:
+        print("\nWARNING: no configuration was compared.")
+    if n_regressions:
+        print(f"\n{n_regressions} configurations regressed by more than the threshold.")
+    # configurations which can't be compared fail the comparison like regressions
+    if n_regressions or n_missing_samples or not n_compared:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,16 @@
 # pylint: disable = (missing-module-docstring)
 
 import argparse
-import json
 import os
-from typing import Dict, List, Union
+from typing import Any, Dict, List, Union
 
 import pandas as pd
 
-
-def load_benchmark_result(
-    path: str,
-) -> Dict[str, List[Dict[str, Union[float, int, str]]]]:
-    benchmark_results: Dict[str, List[Dict[str, Union[float, int, str]]]] = {}
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as file:
-            benchmark_results = json.load(file)
-    else:
-        raise RuntimeError(f"File doesn't exist: {path}")
-
-    return benchmark_results
+from src.results_store import INT8_BENCHMARK_NAMES, ResultsStore
 
 
 def parse_model_results(
-    data: List[Dict[str, Union[float, int, str]]],
+    data: List[Dict[str, Any]],
     value_key: str,
 ) -> str:
     inference_time_dict: Dict[str, Dict[str, Union[float, int]]] = {}
@@ -33,40 +21,74 @@ def parse_model_results(
                 benchmark_name = f"{benchmark_name} GPU"
             else:
                 benchmark_name = f"{benchmark_name} CPU"
+        elif benchmark_name == "BenchmarkPruningSweep":
+            benchmark_name = f"{benchmark_name} {entry['amount']}"
+        elif benchmark_name == "BenchmarkCompile":
+            benchmark_name = f"{benchmark_name} {entry['compile_mode']}"
 
         if entry["use_jit"]:
             benchmark_name = f"{benchmark_name} JIT"
 
         if benchmark_name == "BenchmarkTensorPTQ":
             benchmark_name = f"{benchmark_name} GPU INT8"
-        elif benchmark_name == "BenchmarkTensorDynamicQuantization":
-            benchmark_name = f"{benchmark_name} CPU INT8"
+        elif benchmark_name in INT8_BENCHMARK_NAMES:
+            # dynamic quantization to float16 is stored with fp16 precision
+            benchmark_name = f"{benchmark_name} CPU {entry['precision'].upper()}"
         else:
             if entry["use_fp16"]:
                 benchmark_name = f"{benchmark_name} FP16"
             else:
                 benchmark_name = f"{benchmark_name} FP32"
 
-        value = entry[value_key]
+        value = entry.get(value_key)
         batch_size = f"batch size {entry['batch_size']}"
         try:
             inference_time_dict[benchmark_name][batch_size] = value
         except KeyError:
             inference_time_dict[benchmark_name] = {batch_size: value}
 
-    return pd.read_json(
-        json.dumps(inference_time_dict),
+    return pd.DataFrame.from_dict(
+        inference_time_dict,
         orient="index",
     ).to_markdown()
 
 
+def print_model_results(model_name: str, results: List[Dict[str, Any]]) -> None:
+    print(model_name)
+    print("\nInference time [ms/batch]")
+    print(parse_model_results(data=results, value_key="mean_inference_time_per_batch"))
+    print("\nInference time p99 [ms/batch]")
+    print(parse_model_results(data=results, value_key="p99_inference_time_per_batch"))
+    if any("throughput_samples_per_sec" in entry for entry in results):
+        print("\nThroughput [samples/s]")
+        print(parse_model_results(data=results, value_key="throughput_samples_per_sec"))
+    print("\nMemory Peak usage [MB] - max_memory_usage")
+    print(parse_model_results(data=results, value_key="max_memory_usage"))
+    print("\nF1 score")
+    print(parse_model_results(data=results, value_key="mean_f1"))
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser("Benchmark model optimization techniques")
     parser.add_argument(
         "--result_file",
         type=str,
-        default="benchmark_log.json",
-        help="Filename of a file where all benchmark results will be stored.",
+        default="benchmark_results.db",
+        help="SQLite database where results of all benchmarks are stored.",
+    )
+    parser.add_argument(
+        "--model_name", type=str, help="Convert only results of this model."
+    )
+    parser.add_argument(
+        "--benchmark_type", type=str, help="Convert only results of this type."
+    )
+    parser.add_argument(
+        "--precision",
+        choices=["fp32", "fp16", "int8"],
+        help="Convert only results of this precision.",
+    )
+    parser.add_argument(
+        "--batch_size", type=int, help="Convert only results of this batch size."
     )
 
     return parser.parse_args()
@@ -74,17 +96,29 @@ def parse_args() -> argparse.Namespace:
 
 def main() -> None:
     args = parse_args()
-    benchmark_result = load_benchmark_result(path=args.result_file)
-    for model_name, results in benchmark_result.items():
-        print(model_name)
-        print("\nInference time [ms/batch]")
-        print(
-            parse_model_results(data=results, value_key="mean_inference_time_per_batch")
+    if not os.path.exists(args.result_file):
+        raise RuntimeError(f"File doesn't exist: {args.result_file}")
+
+    with ResultsStore(args.result_file) as store:
+        model_names = (
+            [args.model_name]
+            if args.model_name is not None
+            else store.get_model_names()
         )
-        print("\nGPU Memory Peak usage [MB] - max_memory_allocated")
-        print(parse_model_results(data=results, value_key="max_memory_usage"))
-        print("\nF1 score")
-        print(parse_model_results(data=results, value_key="mean_f1"))
+        for model_name in model_names:
+            # only results of a single model are kept in memory
+            results = list(
+                store.query(
+                    model_name=model_name,
+                    benchmark_type=args.benchmark_type,
+                    precision=args.precision,
+                    batch_size=args.batch_size,
+                )
+            )
+            if not results:
+                continue
+
+            print_model_results(model_name=model_name, results=results)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,91 @@
+# pylint: disable = (missing-module-docstring)
+
+import argparse
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from src.backends import BACKENDS
+from src.results_store import ResultsStore
+
+
+def infer_benchmark_type(data: Dict[str, Any]) -> Optional[str]:
+    """Find benchmark type of a result stored before types were recorded.
+
+    Args:
+        data: Result of a benchmark.
+
+    Returns:
+        The only benchmark type whose backend class and fixed options match the
+        result, `None` if there is no such type or there are many of them.
+    """
+    benchmark_types = [
+        benchmark_type
+        for benchmark_type, backend_spec in BACKENDS.items()
+        if backend_spec.class_name == data["benchmark_name"]
+        and all(
+            data.get(name, value) == value
+            for name, value in backend_spec.fixed_options.items()
+        )
+    ]
+    return benchmark_types[0] if len(benchmark_types) == 1 else None
+
+
+def import_result_json(json_path: str, store: ResultsStore) -> int:
+    """Append all results of a JSON log file to the results store.
+
+    Args:
+        json_path: JSON log file of results grouped by model name.
+        store: Results store.
+
+    Returns:
+        Number of imported results.
+    """
+    with open(json_path, "r", encoding="utf-8") as file:
+        benchmark_results: Dict[str, List[Dict[str, Any]]] = json.load(file)
+
+    n_results = 0
+    for model_name, results in benchmark_results.items():
+        for data in results:
+            store.append(
+                model_name=model_name,
+                data=data,
+                benchmark_type=infer_benchmark_type(data),
+            )
+            n_results += 1
+    return n_results
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        "Import JSON log of benchmark results into the results store, once, "
+        + "importing the same log again duplicates its results"
+    )
+    parser.add_argument(
+        "--json_file",
+        type=str,
+        default="benchmark_log.json",
+        help="JSON log file written by the previous versions of the benchmark.",
+    )
+    parser.add_argument(
+        "--result_file",
+        type=str,
+        default="benchmark_results.db",
+        help="SQLite database where results of all benchmarks are stored.",
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if not os.path.exists(args.json_file):
+        raise RuntimeError(f"File doesn't exist: {args.json_file}")
+
+    with ResultsStore(args.result_file) as store:
+        n_results = import_result_json(json_path=args.json_file, store=store)
+    print(f"Imported {n_results} results from {args.json_file} to {args.result_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,86 +1,37 @@
 # pylint: disable = (missing-module-docstring)
 
 import argparse
+import gc
 import json
-import os
-from typing import Dict, Union
+import sys
+import traceback
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import torch
 
-# to install version 1.3.0 follow
-# https://github.com/pytorch/TensorRT/issues/1371#issuecomment-1256035010
-import torch_tensorrt
-
-from src.benchmark import (
-    BenchmarkCPU,
-    BenchmarkCUDA,
-    BenchmarkONNX,
-    BenchmarkTensorDynamicQuantization,
-    BenchmarkTensorPruning,
-    BenchmarkTensorPTQ,
-    BenchmarkTensorRT,
-)
+from src.backends import BACKENDS, get_backend_spec
 from src.dataset_utils import (
     DatasetFactory,
     DatasetImagenetMiniFactory,
     DatasetIMDBFactory,
 )
-from src.memory import vram_monitor_factory
-from src.model_utils import save_torchscript
-
-torch_tensorrt.logging.set_reportable_log_level(
-    torch_tensorrt.logging.Level(torch_tensorrt.logging.Level.Error)
-)
-
-
-def append_results_to_log_file(
-    path: str, model_name: str, data: Dict[str, Union[str, float]]
-) -> None:
-    benchmark_results = {}
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as file:
-            benchmark_results = json.load(file)
-
-    if model_name in benchmark_results.keys():
-        benchmark_results[model_name].append(data)
-    else:
-        benchmark_results[model_name] = [data]
-
-    with open(path, "w", encoding="utf-8") as file:
-        json.dump(benchmark_results, file, indent=4)
+from src.memory import MEMORY_MONITORS, create_memory_monitor
+from src.model_utils import MODEL_REGISTRY, enable_model_cache, save_torchscript
+from src.results_store import append_result
+from src.sweep import expand_sweep_spec, load_sweep_spec
 
 
-def parse_args() -> argparse.Namespace:
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser("Benchmark model optimization techniques")
     parser.add_argument(
         "--type",
-        choices=[
-            "cpu",
-            "cuda",
-            "tensorrt",
-            "quantization",
-            "dynamic_quantization",
-            "pruning",
-            "onnx_cpu",
-            "onnx_gpu",
-        ],
+        choices=list(BACKENDS),
         required=True,
         help="Model's operation type.",
     )
     parser.add_argument(
         "--model_name",
-        choices=[
-            "swin_t",
-            "vit",
-            "resnet",
-            "mobilenet",
-            "fcn",
-            "cnn",
-            "rnn",
-            "bert",
-            "t5",
-            "gptneo",
-        ],
+        choices=list(MODEL_REGISTRY),
         required=True,
         help="Model's name.",
     )
@@ -97,17 +48,216 @@ def parse_args() -> argparse.Namespace:
         default=1,
         help="Number of runs to compute mean of inference times.",
     )
+    parser.add_argument(
+        "--throughput_duration",
+        type=float,
+        help="Wall-clock budget in seconds of an additional throughput run, in which "
+        + "batches are processed back-to-back. Disabled if not set.",
+    )
+    parser.add_argument(
+        "--ci_target",
+        type=float,
+        help="Repeat the dataset until relative half-width of 95% confidence "
+        + "interval of mean latency drops below the target, e.g. 0.01 for +-1%. "
+        + "Replaces fixed `n_runs` by the stopping rule if set.",
+    )
+    parser.add_argument(
+        "--min_iterations",
+        type=int,
+        default=10,
+        help="Number of batches timed before the stopping rule checks the interval.",
+    )
+    parser.add_argument(
+        "--max_iterations",
+        type=int,
+        help="Maximum number of timed batches of the stopping rule.",
+    )
+    parser.add_argument(
+        "--time_budget",
+        type=float,
+        help="Wall-clock budget in seconds of the timed run of the stopping rule, "
+        + "60 if only `ci_target` is set.",
+    )
+    parser.add_argument(
+        "--data_mode",
+        choices=["preload", "stream"],
+        default="preload",
+        help="Load all batches on the device before timing (preload) or load them "
+        + "in the background into a bounded buffer during timing (stream).",
+    )
+    parser.add_argument(
+        "--prefetch_batches",
+        type=int,
+        default=2,
+        help="Number of batches buffered ahead in the stream data mode.",
+    )
+    parser.add_argument(
+        "--latency_scope",
+        choices=["model", "end_to_end"],
+        default="model",
+        help="Time only the model call (model) or also waiting for the batch "
+        + "(end_to_end).",
+    )
+    parser.add_argument(
+        "--memory_monitor",
+        choices=MEMORY_MONITORS,
+        default="auto",
+        help="Memory measured in every phase of the benchmark: resident memory of "
+        + "the process (cpu), memory allocated by torch on CUDA device (gpu) or none. "
+        + "The auto monitor follows the device of the benchmark type.",
+    )
+    parser.add_argument(
+        "--track_torch_allocator",
+        action="store_true",
+        help="Record memory allocated by torch operators in every phase except the "
+        + "timed inference with CPU memory monitor. Profiling slows down the phases.",
+    )
+    parser.add_argument(
+        "--memory_sampling_interval",
+        type=float,
+        default=0.0,
+        help="Interval in milliseconds of sampling memory in a separate process into "
+        + "a time series, saved next to latency samples. Disabled if set to 0, "
+        + "the sampler slows down the timed run if there is no free core for it.",
+    )
     parser.add_argument(
         "--model_dir",
         type=str,
         default="saved_models",
-        help="Directory with saved JIT models.",
+        help="Directory of cached JIT models, shared by all runs.",
+    )
+    parser.add_argument(
+        "--cache_frozen_torchscript",
+        action="store_true",
+        help="Cache frozen JIT models, so that only optimization for inference "
+        + "is applied after loading.",
+    )
+    parser.add_argument(
+        "--onnx_cache_dir",
+        type=str,
+        default="onnx_models",
+        help="Directory with cached ONNX models exported from PyTorch.",
+    )
+    parser.add_argument(
+        "--onnx_cache_max_size",
+        type=float,
+        default=8192,
+        help="Max size of ONNX models cache in MB, least recently used models "
+        + "are removed above it.",
+    )
+    parser.add_argument(
+        "--onnx_opset", type=int, default=14, help="ONNX opset version of export."
+    )
+    parser.add_argument(
+        "--onnx_graph_optimization_level",
+        choices=["disabled", "basic", "extended", "all"],
+        default="basic",
+        help="ONNX Runtime graph optimization level. Optimized graph is saved in "
+        + "the ONNX cache directory and loaded by the following runs.",
+    )
+    parser.add_argument(
+        "--onnx_intra_op_num_threads",
+        type=int,
+        default=0,
+        help="Number of ONNX Runtime intra-op threads, 0 for ONNX Runtime default.",
+    )
+    parser.add_argument(
+        "--onnx_inter_op_num_threads",
+        type=int,
+        default=0,
+        help="Number of ONNX Runtime inter-op threads, 0 for ONNX Runtime default.",
+    )
+    parser.add_argument(
+        "--onnx_execution_mode",
+        choices=["sequential", "parallel"],
+        default="sequential",
+        help="ONNX Runtime execution mode of graph nodes.",
+    )
+    parser.add_argument(
+        "--onnx_enable_cpu_mem_arena",
+        action="store_true",
+        help="Enable ONNX Runtime CPU memory arena.",
+    )
+    parser.add_argument(
+        "--onnx_enable_mem_pattern",
+        action="store_true",
+        help="Enable ONNX Runtime memory pattern optimization.",
+    )
+    parser.add_argument(
+        "--onnx_quant_format",
+        choices=["qdq", "qoperator"],
+        default="qdq",
+        help="Format of ONNX model quantized with static INT8 quantization.",
+    )
+    parser.add_argument(
+        "--onnx_calibration_method",
+        choices=["minmax", "entropy", "percentile"],
+        default="minmax",
+        help="Method of computing activation ranges in ONNX static quantization.",
+    )
+    parser.add_argument(
+        "--onnx_per_channel",
+        action="store_true",
+        help="Quantize ONNX model weights per channel.",
+    )
+    parser.add_argument(
+        "--n_calibration_batches",
+        type=int,
+        default=10,
+        help="Number of dataset batches used to calibrate INT8 quantization.",
+    )
+    parser.add_argument(
+        "--dynamic_quantization_dtype",
+        choices=["qint8", "float16"],
+        default="qint8",
+        help="Weight dtype of modules converted by dynamic quantization.",
+    )
+    parser.add_argument(
+        "--dynamic_quantization_include",
+        type=str,
+        nargs="*",
+        default=None,
+        help="Patterns of module names converted by dynamic quantization, "
+        + "e.g. 'encoder.layer.*'. All Linear, LSTM and GRU modules if not set.",
+    )
+    parser.add_argument(
+        "--dynamic_quantization_exclude",
+        type=str,
+        nargs="*",
+        default=None,
+        help="Patterns of module names not converted by dynamic quantization.",
+    )
+    parser.add_argument(
+        "--quantization_backend",
+        choices=["x86", "fbgemm", "qnnpack"],
+        default="x86",
+        help="Backend of quantized kernels used by static quantization.",
     )
     parser.add_argument(
-        "--model_filename",
+        "--quantization_cache_dir",
         type=str,
-        default="model_jit.pth",
-        help="JIT model file name.",
+        default="quantized_models",
+        help="Directory where statically quantized models are cached.",
+    )
+    parser.add_argument(
+        "--compile_mode",
+        choices=["default", "reduce-overhead", "max-autotune"],
+        default="default",
+        help="Mode of torch.compile.",
+    )
+    parser.add_argument(
+        "--compile_dynamic",
+        choices=["auto", "true", "false"],
+        default="auto",
+        help="Whether torch.compile generates shape-dynamic kernels, 'auto' "
+        + "recompiles with dynamic shapes after a shape change.",
+    )
+    parser.add_argument(
+        "--compile_cache_dir",
+        type=str,
+        default="inductor_cache",
+        help="Directory of on-disk Inductor and FX graph caches of torch.compile, "
+        + "compilation is reported as warm if a previous run wrote the caches.",
     )
     parser.add_argument(
         "--pruning_ratio",
@@ -115,6 +265,13 @@ def parse_args() -> argparse.Namespace:
         default=0.2,
         help="Ratio of model's pruned weights.",
     )
+    parser.add_argument(
+        "--pruning_ratios",
+        type=float,
+        nargs="+",
+        default=[0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9],
+        help="Ratios of model's pruned weights benchmarked by pruning sweep.",
+    )
     parser.add_argument(
         "--pretrained_model_name",
         type=str,
@@ -123,6 +280,35 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--structural_pruning", action="store_true", help="Use structural pruning."
     )
+    parser.add_argument(
+        "--sparse_layout",
+        choices=["csr", "bsr"],
+        default=None,
+        help="Run Linear layers pruned with unstructured pruning with sparse "
+        + "weights of given layout instead of dense weights with zeros, bsr needs "
+        + "PyTorch with BSR matmul on the device, e.g. not on CPU in PyTorch 1.13.",
+    )
+    parser.add_argument(
+        "--sparse_blocksize",
+        type=int,
+        default=4,
+        help="Size of square blocks of bsr sparse layout.",
+    )
+    parser.add_argument(
+        "--sparse_crossover_levels",
+        type=float,
+        nargs="*",
+        default=None,
+        help="Sparsity levels to which Linear layers of the model are pruned to time "
+        + "the whole model with dense and sparse weights, to find the level from "
+        + "which the sparse model wins.",
+    )
+    parser.add_argument(
+        "--remove_pruned_channels",
+        action="store_true",
+        help="Remove pruned channels of Conv2d and Linear layers from the model "
+        + "instead of masking them, so the pruned model needs less compute.",
+    )
 
     parser.add_argument(
         "--max_length",
@@ -139,6 +325,18 @@ def parse_args() -> argparse.Namespace:
         default="val",
         help="Subset of ImageNet-Mini dataset: val or train.",
     )
+    parser.add_argument(
+        "--dataset_cache_dir",
+        type=str,
+        help="Directory of preprocessed ImageNet-Mini and tokenized IMDB cache. "
+        + "Disabled if not set.",
+    )
+    parser.add_argument(
+        "--dataset_cache_dtype",
+        choices=["fp16", "uint8"],
+        default="fp16",
+        help="Storage type of preprocessed ImageNet-Mini cache.",
+    )
     parser.add_argument(
         "--dataset_size",
         type=int,
@@ -148,35 +346,63 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--result_file",
         type=str,
-        default="benchmark_log.json",
-        help="Filename of a file where all benchmark results will be stored.",
+        default="benchmark_results.db",
+        help="SQLite database where results of all benchmarks are appended.",
+    )
+    parser.add_argument(
+        "--latency_samples_dir",
+        type=str,
+        default="latency_samples",
+        help="Directory where raw per-iteration latency samples are stored as .npy.",
     )
 
-    return parser.parse_args()
+    return parser
 
 
-def main() -> None:
-    args = parse_args()
-    # has influence on performance on CNNs:
-    # https://pytorch.org/tutorials/recipes/recipes/tuning_guide.html#enable-cudnn-auto-tuner
-    torch.backends.cudnn.benchmark = True
-    torch.backends.cudnn.enabled = True
+def parse_args() -> argparse.Namespace:
+    return build_parser().parse_args()
 
-    # https://pytorch.org/docs/stable/amp.html
 
-    # For now, we suggest to disable the Jit Autocast Pass,
-    # As the issue: https://github.com/pytorch/pytorch/issues/75956
-    if args.use_jit:
-        torch._C._jit_set_autocast_mode(  # pylint: disable = (protected-access,c-extension-no-member)
-            False
-        )
+def parse_sweep_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        "Benchmark model optimization techniques in a single process sweep"
+    )
+    parser.add_argument(
+        "--spec",
+        type=str,
+        required=True,
+        help="JSON file with sweep specification, see `sweep.json`.",
+    )
+    parser.add_argument(
+        "--result_file",
+        type=str,
+        help="Filename of a file where all benchmark results will be stored. "
+        + "Overrides `result_file` from the sweep specification.",
+    )
+    parser.add_argument(
+        "--model_cache_size",
+        type=int,
+        default=2,
+        help="Number of base models kept in memory and reused between configurations.",
+    )
 
-    if not torch.cuda.is_available():
-        raise RuntimeError("No CUDA device detected. Exiting...")
+    return parser.parse_args(argv)
 
-    cuda_device = torch.device("cuda:0")  # pylint: disable = (no-member)
-    cpu_device = torch.device("cpu:0")  # pylint: disable = (no-member)
 
+def create_sweep_config_args(config: Dict[str, Any]) -> argparse.Namespace:
+    # start from the defaults of the single run CLI and override them with config
+    args = build_parser().parse_args(
+        ["--type", str(config["type"]), "--model_name", str(config["model_name"])]
+    )
+    for key, value in config.items():
+        if not hasattr(args, key):
+            raise RuntimeError(f"Unknown sweep option: {key}")
+        setattr(args, key, value)
+
+    return args
+
+
+def create_dataset_factory(args: argparse.Namespace) -> DatasetFactory:
     dataset_factory: DatasetFactory
     if args.model_name in ["bert", "t5", "gptneo"]:
         dataset_factory = DatasetIMDBFactory(
@@ -184,130 +410,198 @@ def main() -> None:
             dataset_size=args.dataset_size,
             max_length=args.max_length,
             batch_size=args.batch_size,
+            cache_dir=args.dataset_cache_dir,
         )
     else:
         dataset_factory = DatasetImagenetMiniFactory(
             data_dir=args.data_dir,
             subset_name=args.subset_name,
+            cache_dir=args.dataset_cache_dir,
+            cache_dtype=args.dataset_cache_dtype,
+        )
+
+    return dataset_factory
+
+
+def setup_torch(use_jit: bool) -> Tuple[Optional[torch.device], torch.device]:
+    # has influence on performance on CNNs:
+    # https://pytorch.org/tutorials/recipes/recipes/tuning_guide.html#enable-cudnn-auto-tuner
+    torch.backends.cudnn.benchmark = True
+    torch.backends.cudnn.enabled = True
+
+    # https://pytorch.org/docs/stable/amp.html
+
+    # For now, we suggest to disable the Jit Autocast Pass,
+    # As the issue: https://github.com/pytorch/pytorch/issues/75956
+    if use_jit:
+        torch._C._jit_set_autocast_mode(  # pylint: disable = (protected-access,c-extension-no-member)
+            False
+        )
+
+    # CUDA is required only by GPU backends, see `BackendSpec.requires_cuda`
+    cuda_device = None
+    if torch.cuda.is_available():
+        cuda_device = torch.device("cuda:0")  # pylint: disable = (no-member)
+    cpu_device = torch.device("cpu:0")  # pylint: disable = (no-member)
+    return cuda_device, cpu_device
+
+
+def run_benchmark(
+    args: argparse.Namespace,
+    dataset_factory: DatasetFactory,
+    cuda_device: Optional[torch.device],  # pylint: disable = (no-member)
+    cpu_device: torch.device,  # pylint: disable = (no-member)
+) -> List[Dict[str, Union[int, float]]]:
+    backend_spec = get_backend_spec(args.type)
+    if backend_spec.requires_cuda and cuda_device is None:
+        raise RuntimeError(
+            f"No CUDA device detected, required by benchmark type {args.type}. "
+            + "Exiting..."
         )
 
     example_inputs = dataset_factory.get_example_inputs()
 
-    # save model's torchscript .pth file
-    model_torchscript_path: str = os.path.join(args.model_dir, args.model_filename)
+    # save model's torchscript .pth file, unless it is already cached
+    model_torchscript_path = ""
     if args.use_jit:
-        save_torchscript(
+        model_torchscript_path = save_torchscript(
             model_name=args.model_name,
             device=cpu_device,
             batch_size=args.batch_size,
-            model_torchscript_path=model_torchscript_path,
+            model_dir=args.model_dir,
             example_inputs=example_inputs,
         )
 
-    vram_monitor_factory(interval=1e-3, device="cuda:0")
+    measurement_options: Dict[str, Any] = {
+        "throughput_duration": args.throughput_duration,
+        "data_mode": args.data_mode,
+        "prefetch_batches": args.prefetch_batches,
+        "latency_scope": args.latency_scope,
+        "ci_target": args.ci_target,
+        "min_iterations": args.min_iterations,
+        "max_iterations": args.max_iterations,
+        "time_budget": args.time_budget,
+    }
 
-    result_dict: Dict[str, Union[int, float]]
-    # compute inference time, CUDA memory usage and F1 score
-    if args.type == "cpu":
-        result_dict = BenchmarkCPU().benchmark(
-            model_name=args.model_name,
-            device=cpu_device,
-            batch_size=args.batch_size,
-            dataset_factory=dataset_factory,
-            model_torchscript_path=model_torchscript_path,
-            use_jit=args.use_jit,
-            use_fp16=args.use_fp16,
-            n_runs=args.n_runs,
-        )
-    elif args.type == "cuda":
-        result_dict = BenchmarkCUDA().benchmark(
-            model_name=args.model_name,
-            device=cuda_device,
-            batch_size=args.batch_size,
-            dataset_factory=dataset_factory,
-            model_torchscript_path=model_torchscript_path,
-            use_jit=args.use_jit,
-            use_fp16=args.use_fp16,
-            n_runs=args.n_runs,
-        )
-    elif args.type == "tensorrt":
-        result_dict = BenchmarkTensorRT().benchmark(
-            model_name=args.model_name,
-            device=cuda_device,
-            batch_size=args.batch_size,
-            dataset_factory=dataset_factory,
-            model_torchscript_path=model_torchscript_path,
-            use_jit=args.use_jit,
-            use_fp16=args.use_fp16,
-            n_runs=args.n_runs,
+    device = cuda_device if backend_spec.device == "cuda" else cpu_device
+    memory_monitor = create_memory_monitor(
+        monitor_type=args.memory_monitor,
+        device=device,
+        use_cuda=backend_spec.fixed_options.get("use_cuda", False),
+        track_torch_allocator=args.track_torch_allocator,
+        sampling_interval=args.memory_sampling_interval or None,
+    )
+
+    try:
+        # only the module of the selected backend and its dependencies are imported
+        benchmark = backend_spec.load()(
+            memory_monitor=memory_monitor, **measurement_options
         )
-    elif args.type == "quantization":
-        result_dict = BenchmarkTensorPTQ().benchmark(
+        options = backend_spec.get_options(args)
+        if args.type == "pruning_sweep":
+            # one result for every pruning ratio
+            return benchmark.sweep(
+                model_name=args.model_name,
+                device=device,
+                batch_size=args.batch_size,
+                dataset_factory=dataset_factory,
+                n_runs=args.n_runs,
+                latency_samples_dir=args.latency_samples_dir,
+                **options,
+            )
+
+        # compute inference time, memory usage and F1 score
+        result_dict = benchmark.benchmark(
             model_name=args.model_name,
-            device=cuda_device,
+            device=device,
             batch_size=args.batch_size,
             dataset_factory=dataset_factory,
-            use_jit=args.use_jit,
-            use_fp16=args.use_fp16,
-            n_runs=args.n_runs,
-            model_torchscript_path=model_torchscript_path,
-        )
-    elif args.type == "dynamic_quantization":
-        result_dict = BenchmarkTensorDynamicQuantization().benchmark(
-            model_name=args.model_name,
-            device=cpu_device,
-            dataset_factory=dataset_factory,
-            batch_size=args.batch_size,
             model_torchscript_path=model_torchscript_path,
             use_jit=args.use_jit,
             use_fp16=args.use_fp16,
             n_runs=args.n_runs,
+            latency_samples_dir=args.latency_samples_dir,
+            **options,
         )
-    elif args.type == "pruning":
-        result_dict = BenchmarkTensorPruning().benchmark(
-            model_name=args.model_name,
-            device=cpu_device,
-            batch_size=args.batch_size,
-            model_torchscript_path=model_torchscript_path,
-            dataset_factory=dataset_factory,
-            use_jit=args.use_jit,
-            use_fp16=args.use_fp16,
-            n_runs=args.n_runs,
-            name="weight",
-            amount=args.pruning_ratio,
-            structural_pruning=args.structural_pruning,
-        )
-    elif args.type == "onnx_cpu":
-        result_dict = BenchmarkONNX().benchmark(
-            model_name=args.model_name,
-            device=cpu_device,
-            dataset_factory=dataset_factory,
-            batch_size=args.batch_size,
-            model_torchscript_path=model_torchscript_path,
-            use_jit=args.use_jit,
-            use_fp16=args.use_fp16,
-            n_runs=args.n_runs,
-            use_cuda=False,
-        )
-    elif args.type == "onnx_gpu":
-        result_dict = BenchmarkONNX().benchmark(
+        return [result_dict]
+    finally:
+        # memory sampler runs in a separate process
+        if memory_monitor is not None:
+            memory_monitor.close()
+
+
+def main() -> None:
+    args = parse_args()
+    cuda_device, cpu_device = setup_torch(use_jit=args.use_jit)
+    dataset_factory = create_dataset_factory(args)
+
+    results = run_benchmark(
+        args=args,
+        dataset_factory=dataset_factory,
+        cuda_device=cuda_device,
+        cpu_device=cpu_device,
+    )
+    for result_dict in results:
+        append_result(
+            path=args.result_file,
             model_name=args.model_name,
-            device=cpu_device,
-            dataset_factory=dataset_factory,
-            batch_size=args.batch_size,
-            model_torchscript_path=model_torchscript_path,
-            use_jit=args.use_jit,
-            use_fp16=args.use_fp16,
-            n_runs=args.n_runs,
-            use_cuda=True,
+            data=result_dict,
+            benchmark_type=args.type,
         )
 
-    append_results_to_log_file(
-        path=args.result_file,
-        model_name=args.model_name,
-        data=result_dict,
-    )
+
+def sweep(argv: List[str]) -> None:
+    sweep_args = parse_sweep_args(argv)
+    configs = expand_sweep_spec(load_sweep_spec(sweep_args.spec))
+
+    # reuse base models and datasets between configurations
+    enable_model_cache(max_size=sweep_args.model_cache_size)
+    dataset_factories: Dict[str, DatasetFactory] = {}
+
+    failed_configs: List[Dict[str, Any]] = []
+    for index, config in enumerate(configs):
+        print(f"[{index + 1}/{len(configs)}] {json.dumps(config)}")
+        try:
+            args = create_sweep_config_args(config)
+            if sweep_args.result_file is not None:
+                args.result_file = sweep_args.result_file
+            cuda_device, cpu_device = setup_torch(use_jit=args.use_jit)
+
+            dataset_factory = create_dataset_factory(args)
+            dataset_key = json.dumps(dataset_factory.get_config(), sort_keys=True)
+            dataset_factory = dataset_factories.setdefault(dataset_key, dataset_factory)
+
+            results = run_benchmark(
+                args=args,
+                dataset_factory=dataset_factory,
+                cuda_device=cuda_device,
+                cpu_device=cpu_device,
+            )
+            for result_dict in results:
+                append_result(
+                    path=args.result_file,
+                    model_name=args.model_name,
+                    data=result_dict,
+                    benchmark_type=args.type,
+                )
+        except Exception:  # pylint: disable = (broad-except)
+            # a single failing configuration must not abort the whole sweep
+            traceback.print_exc()
+            failed_configs.append(config)
+        finally:
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+    if failed_configs:
+        print(f"{len(failed_configs)}/{len(configs)} configurations failed:")
+        for config in failed_configs:
+            print(json.dumps(config))
+        sys.exit(1)
 
 
 if __name__ == "__main__":
-    main()
+    if sys.argv[1:2] == ["sweep"]:
+        sweep(sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,121 @@
+# pylint: disable = (missing-module-docstring)
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Union
+
+from src.backends import BACKENDS
+
+# dependencies that should be imported only by the backends which use them
+HEAVY_MODULES = (
+    "torch_tensorrt",
+    "onnxruntime",
+    "transformers",
+    "datasets",
+    "torchmetrics",
+    "nvitop",
+)
+
+# run in a fresh interpreter, so that no module is already imported
+IMPORT_SCRIPT = """
+import json
+import sys
+import time
+
+start_time = time.perf_counter()
+import main
+from src.backends import get_backend_spec
+
+get_backend_spec(sys.argv[1]).load()
+elapsed_time = time.perf_counter() - start_time
+print(json.dumps({
+    "import_time": elapsed_time * 1e3,
+    "heavy_modules": [name for name in sys.argv[2:] if name in sys.modules],
+}))
+"""
+
+
+def measure_import_time(
+    benchmark_type: str,
+    n_repeats: int,
+) -> Dict[str, Union[str, float, List[str]]]:
+    """Measure time of importing `main` and the backend of a benchmark type.
+
+    Args:
+        benchmark_type: Benchmark type, see `BACKENDS`.
+        n_repeats: Number of fresh interpreters the import is timed in.
+
+    Returns:
+        Median and minimum import time in milliseconds and heavy dependencies
+        imported by the backend.
+    """
+    import_times: List[float] = []
+    heavy_modules: List[str] = []
+    for _ in range(n_repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT, benchmark_type, *HEAVY_MODULES],
+            # `main` is imported from the root of the repository
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        measurement = json.loads(output.strip().splitlines()[-1])
+        import_times.append(measurement["import_time"])
+        heavy_modules = measurement["heavy_modules"]
+
+    return {
+        "type": benchmark_type,
+        "median_import_time": round(statistics.median(import_times), 1),
+        "min_import_time": round(min(import_times), 1),
+        "heavy_modules": heavy_modules,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser("Measure import time of benchmark backends")
+    parser.add_argument(
+        "--types",
+        nargs="+",
+        choices=list(BACKENDS),
+        default=["cpu", "onnx_cpu", "dynamic_quantization", "pruning"],
+        help="Benchmark types whose import time is measured.",
+    )
+    parser.add_argument(
+        "--n_repeats",
+        type=int,
+        default=5,
+        help="Number of fresh interpreters the import of every type is timed in.",
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    print("| type | median [ms] | min [ms] | heavy modules |")
+    print("|---|---|---|---|")
+    for benchmark_type in args.types:
+        # a backend may fail to import, e.g. TensorRT on a machine without CUDA
+        try:
+            result = measure_import_time(
+                benchmark_type=benchmark_type, n_repeats=args.n_repeats
+            )
+        except subprocess.CalledProcessError as error:
+            error_message = error.stderr.strip().splitlines()[-1]
+            print(f"| {benchmark_type} | failed: {error_message} | | |")
+            continue
+
+        print(
+            f"| {result['type']} | {result['median_import_time']} "
+            + f"| {result['min_import_time']} "
+            + f"| {', '.join(result['heavy_modules']) or '-'} |"
+        )
+
+
+if __name__ == "__main__":
+    main()
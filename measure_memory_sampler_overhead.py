@@ -0,0 +1,134 @@
+# pylint: disable = (missing-module-docstring)
+
+import argparse
+import os
+import statistics
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+
+from main import build_parser, create_dataset_factory
+from src.benchmark import (
+    NLG_MODEL_CLASS_NAMES,
+    get_model_class_name,
+    measure_inference_run,
+    requires_full_batches,
+    warmup_model,
+)
+from src.data_pipeline import prepare_batches
+from src.memory_sampler import MemorySampler
+from src.model_utils import load_model
+
+
+def measure_mean_latency(
+    model: torch.nn.Module,
+    device: torch.device,  # pylint: disable = (no-member)
+    batches: List,
+    n_runs: int,
+    sampling_interval: Optional[float],
+) -> float:
+    """Measure mean latency of a batch with memory sampled in the background.
+
+    Args:
+        model: Benchmarked model.
+        device: Device of the model.
+        batches: Batches of the timed run.
+        n_runs: Number of runs over the batches.
+        sampling_interval: Interval of the memory sampler in milliseconds, memory is
+            not sampled if not set.
+
+    Returns:
+        Mean latency of a batch in milliseconds.
+    """
+    sampler = None
+    if sampling_interval is not None:
+        sampler = MemorySampler(
+            source="process", target=os.getpid(), interval=sampling_interval / 1e3
+        )
+        sampler.start()
+    try:
+        latency_samples, _ = measure_inference_run(
+            model,
+            device,
+            batches,
+            get_model_class_name(model) in NLG_MODEL_CLASS_NAMES,
+            n_runs,
+        )
+    finally:
+        if sampler is not None:
+            sampler.close()
+    return float(np.mean(latency_samples["time_ns"])) / 1e6
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        "Measure overhead of the memory sampler on the timed run"
+    )
+    parser.add_argument(
+        "--sampling_intervals",
+        type=float,
+        nargs="+",
+        default=[1.0, 10.0],
+        help="Intervals of the memory sampler in milliseconds.",
+    )
+    parser.add_argument(
+        "--n_repeats",
+        type=int,
+        default=10,
+        help="Number of timed runs of every sampler setting, settings are "
+        + "interleaved so that drift of the machine affects all of them.",
+    )
+    args, benchmark_argv = parser.parse_known_args()
+
+    # model and dataset are selected by options of the CPU benchmark
+    benchmark_args = build_parser().parse_args(["--type", "cpu", *benchmark_argv])
+    return argparse.Namespace(**vars(benchmark_args), **vars(args))
+
+
+def main() -> None:
+    args = parse_args()
+    device = torch.device("cpu:0")  # pylint: disable = (no-member)
+    model = load_model(
+        model_name=args.model_name, device=device, batch_size=args.batch_size
+    )
+    model.to(memory_format=torch.channels_last)  # pylint: disable = (no-member)
+    model.eval()
+    batches = prepare_batches(
+        dataset=create_dataset_factory(args).get_dataset(),
+        batch_size=args.batch_size,
+        drop_last=requires_full_batches(model),
+        device=device,
+    )
+    warmup_model(model, device, len(batches), batches)
+
+    settings: List[Optional[float]] = [None, *args.sampling_intervals]
+    mean_latencies: Dict[Optional[float], List[float]] = {
+        setting: [] for setting in settings
+    }
+    for _ in range(args.n_repeats):
+        for setting in settings:
+            mean_latencies[setting].append(
+                measure_mean_latency(
+                    model=model,
+                    device=device,
+                    batches=batches,
+                    n_runs=args.n_runs,
+                    sampling_interval=setting,
+                )
+            )
+
+    baseline = statistics.median(mean_latencies[None])
+    print("| sampling interval [ms] | median latency [ms] | overhead [%] |")
+    print("|---|---|---|")
+    for setting in settings:
+        median_latency = statistics.median(mean_latencies[setting])
+        overhead = (median_latency / baseline - 1.0) * 100.0
+        print(
+            f"| {'off' if setting is None else setting} | {median_latency:.3f} "
+            + f"| {overhead:+.2f} |"
+        )
+
+
+if __name__ == "__main__":
+    main()
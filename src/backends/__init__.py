@@ -0,0 +1,172 @@
+# pylint: disable = (missing-module-docstring)
+
+import importlib
+from typing import Any, Dict, Optional, Type
+
+import torch
+
+from src.benchmark import Benchmark
+
+ONNX_OPTIONS = (
+    "onnx_cache_dir",
+    "onnx_cache_max_size",
+    "onnx_opset",
+    "onnx_graph_optimization_level",
+    "onnx_intra_op_num_threads",
+    "onnx_inter_op_num_threads",
+    "onnx_execution_mode",
+    "onnx_enable_cpu_mem_arena",
+    "onnx_enable_mem_pattern",
+    "onnx_quant_format",
+    "onnx_calibration_method",
+    "onnx_per_channel",
+)
+PRUNING_OPTIONS = (
+    "structural_pruning",
+    "remove_pruned_channels",
+    "sparse_layout",
+    "sparse_blocksize",
+)
+
+
+def forward_options(*names: str) -> Dict[str, str]:
+    # command line options passed to the benchmark under the same name
+    return {name: name for name in names}
+
+
+class BackendSpec:
+    """Registry entry of a benchmark backend, its module is imported on first use."""
+
+    def __init__(
+        self,
+        module_name: str,
+        class_name: str,
+        device: str = "cpu",
+        requires_cuda: bool = False,
+        options: Optional[Dict[str, str]] = None,
+        fixed_options: Optional[Dict[str, Any]] = None,
+    ):
+        self.module_name = module_name
+        self.class_name = class_name
+        # device of the benchmarked model, ONNX Runtime selects its device by providers
+        self.device = device
+        self.requires_cuda = requires_cuda or device == "cuda"
+        # benchmark options mapped to names of command line options
+        self.options = options or {}
+        self.fixed_options = fixed_options or {}
+
+    def load(self) -> Type[Benchmark]:
+        module = importlib.import_module(self.module_name)
+        return getattr(module, self.class_name)
+
+    def get_options(self, config: Any) -> Dict[str, Any]:
+        """Collect options of the benchmark.
+
+        Args:
+            config: Namespace with all command line options, e.g. parsed arguments.
+
+        Returns:
+            Keyword arguments of the benchmark, recorded in its results.
+        """
+        return {
+            **self.fixed_options,
+            **{name: getattr(config, option) for name, option in self.options.items()},
+        }
+
+
+BACKENDS: Dict[str, BackendSpec] = {
+    "cpu": BackendSpec(
+        module_name="src.backends.cpu",
+        class_name="BenchmarkCPU",
+        options=forward_options("cache_frozen_torchscript"),
+    ),
+    "cuda": BackendSpec(
+        module_name="src.backends.cuda",
+        class_name="BenchmarkCUDA",
+        device="cuda",
+        options=forward_options("cache_frozen_torchscript"),
+    ),
+    "tensorrt": BackendSpec(
+        module_name="src.backends.tensorrt",
+        class_name="BenchmarkTensorRT",
+        device="cuda",
+        options=forward_options("cache_frozen_torchscript"),
+    ),
+    "quantization": BackendSpec(
+        module_name="src.backends.tensorrt",
+        class_name="BenchmarkTensorPTQ",
+        device="cuda",
+        options=forward_options("cache_frozen_torchscript"),
+    ),
+    "dynamic_quantization": BackendSpec(
+        module_name="src.backends.quantization",
+        class_name="BenchmarkTensorDynamicQuantization",
+        options=forward_options(
+            "dynamic_quantization_dtype",
+            "dynamic_quantization_include",
+            "dynamic_quantization_exclude",
+        ),
+    ),
+    "static_quantization": BackendSpec(
+        module_name="src.backends.quantization",
+        class_name="BenchmarkTensorStaticQuantization",
+        options=forward_options(
+            "quantization_backend", "quantization_cache_dir", "n_calibration_batches"
+        ),
+    ),
+    "pruning": BackendSpec(
+        module_name="src.backends.pruning",
+        class_name="BenchmarkTensorPruning",
+        options={
+            "amount": "pruning_ratio",
+            **forward_options(*PRUNING_OPTIONS, "sparse_crossover_levels"),
+        },
+        fixed_options={"name": "weight"},
+    ),
+    "pruning_sweep": BackendSpec(
+        module_name="src.backends.pruning",
+        class_name="BenchmarkPruningSweep",
+        options=forward_options("pruning_ratios", *PRUNING_OPTIONS),
+        fixed_options={"name": "weight"},
+    ),
+    "onnx_cpu": BackendSpec(
+        module_name="src.backends.onnx_runtime",
+        class_name="BenchmarkONNX",
+        options=forward_options("cache_frozen_torchscript", *ONNX_OPTIONS),
+        fixed_options={"use_cuda": False},
+    ),
+    "onnx_gpu": BackendSpec(
+        module_name="src.backends.onnx_runtime",
+        class_name="BenchmarkONNX",
+        requires_cuda=True,
+        options=forward_options("cache_frozen_torchscript", *ONNX_OPTIONS),
+        fixed_options={"use_cuda": True},
+    ),
+    "onnx_int8": BackendSpec(
+        module_name="src.backends.onnx_runtime",
+        class_name="BenchmarkONNXInt8",
+        options=forward_options(
+            "cache_frozen_torchscript", "n_calibration_batches", *ONNX_OPTIONS
+        ),
+        fixed_options={"use_cuda": False},
+    ),
+}
+
+
+# torch.compile exists since PyTorch 2.0, the type is not available with the locked
+# PyTorch 1.13, which is required by Torch-TensorRT 1.3
+if hasattr(torch, "compile"):
+    BACKENDS["compile"] = BackendSpec(
+        module_name="src.backends.torch_compile",
+        class_name="BenchmarkCompile",
+        options=forward_options("compile_mode", "compile_dynamic", "compile_cache_dir"),
+    )
+
+
+def get_backend_spec(benchmark_type: str) -> BackendSpec:
+    if benchmark_type not in BACKENDS:
+        raise RuntimeError(
+            f"Unknown benchmark type {benchmark_type}, known types: {list(BACKENDS)}"
+        )
+
+    return BACKENDS[benchmark_type]
@@ -0,0 +1,72 @@
+# pylint: disable = (missing-module-docstring)
+
+from typing import Any, Dict, Optional, Tuple
+
+import torch
+
+from src.benchmark import Benchmark, load_model_based_on_mode, measure_inference_latency
+from src.dataset_utils import DatasetFactory
+
+
+class BenchmarkCUDA(Benchmark):
+    """CUDA benchmark class."""
+
+    def get_benchmark_name(
+        self,
+    ) -> str:
+        return self.__class__.__name__
+
+    def measure_time_and_f1_score(
+        self,
+        model_name: str,
+        device: torch.device,  # pylint: disable = (no-member)
+        batch_size: int,
+        dataset_factory: DatasetFactory,
+        model_torchscript_path: str,
+        use_jit: bool,
+        use_fp16: bool,
+        n_runs: int,
+        **kwargs,
+    ) -> Tuple[Dict[str, Any], Optional[float]]:
+        if use_fp16 and use_jit:
+            torch._C._jit_set_autocast_mode(  # pylint: disable = (protected-access,c-extension-no-member)
+                True
+            )
+
+        model = load_model_based_on_mode(
+            model_name=model_name,
+            device=device,
+            batch_size=batch_size,
+            model_torchscript_path=model_torchscript_path,
+            use_jit=use_jit,
+            phase_recorder=self.phase_recorder,
+            cache_frozen_torchscript=kwargs.get("cache_frozen_torchscript", False),
+        )
+        dataset = dataset_factory.get_dataset()
+
+        if not use_fp16:
+            measurement, f1_score = measure_inference_latency(
+                model=model,
+                device=device,
+                batch_size=batch_size,
+                dataset=dataset,
+                n_runs=n_runs,
+                phase_recorder=self.phase_recorder,
+                **self.measurement_options,
+            )
+        else:
+            with torch.amp.autocast(
+                device_type="cuda",
+                dtype=torch.bfloat16,  # pylint: disable = (no-member)
+            ):
+                measurement, f1_score = measure_inference_latency(
+                    model=model,
+                    device=device,
+                    batch_size=batch_size,
+                    dataset=dataset,
+                    n_runs=n_runs,
+                    phase_recorder=self.phase_recorder,
+                    **self.measurement_options,
+                )
+
+        return measurement, f1_score
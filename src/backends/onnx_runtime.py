@@ -0,0 +1,280 @@
+# pylint: disable = (missing-module-docstring)
+
+import os
+from collections.abc import Mapping
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import onnxruntime as onnxrt
+import torch
+
+from src.benchmark import (
+    Benchmark,
+    is_language_model,
+    load_model_based_on_mode,
+    measure_inference_latency,
+)
+from src.cache_utils import ArtifactCache, compute_cache_key
+from src.data_pipeline import load_calibration_batches
+from src.dataset_utils import DatasetFactory
+from src.model_utils import compute_weights_hash
+from src.onnx_utils import (
+    OnnxIOBindingRunner,
+    create_inference_session,
+    quantize_onnx_model,
+)
+
+
+class BenchmarkONNX(Benchmark):
+    """ONNX benchmark class."""
+
+    def get_benchmark_name(
+        self,
+    ) -> str:
+        return self.__class__.__name__
+
+    def measure_time_and_f1_score(
+        self,
+        model_name: str,
+        device: torch.device,  # pylint: disable = (no-member)
+        batch_size: int,
+        dataset_factory: DatasetFactory,
+        model_torchscript_path: str,
+        use_jit: bool,
+        use_fp16: bool,
+        n_runs: int,
+        use_cuda: bool,
+        **kwargs,
+    ) -> Tuple[Dict[str, Any], Optional[float]]:
+        model = load_model_based_on_mode(
+            model_name=model_name,
+            device=device,
+            batch_size=batch_size,
+            model_torchscript_path=model_torchscript_path,
+            use_jit=use_jit,
+            phase_recorder=self.phase_recorder,
+            cache_frozen_torchscript=kwargs.get("cache_frozen_torchscript", False),
+        )
+        if is_language_model(model):
+            raise RuntimeError(
+                "ONNX at the moment is not supported for language models."
+            )
+
+        dataset = dataset_factory.get_dataset()
+        sample = dataset[0][0]
+        # cached ONNX models are loaded instead of being exported again
+        with self.phase_recorder.phase("conversion"):
+            onnx_model_path, providers = self.convert_to_onnx(
+                model=model,
+                device=device,
+                batch_size=batch_size,
+                sample=sample,
+                use_cuda=use_cuda,
+                model_name=model_name,
+                onnx_cache_dir=kwargs.get("onnx_cache_dir", "onnx_models"),
+                onnx_cache_max_size=kwargs.get("onnx_cache_max_size"),
+                onnx_opset=kwargs.get("onnx_opset", 14),
+            )
+            onnx_model_path, conversion_info = self.prepare_onnx_model(
+                onnx_model_path=onnx_model_path,
+                model_name=model_name,
+                batch_size=batch_size,
+                dataset_factory=dataset_factory,
+                **kwargs,
+            )
+
+        with self.phase_recorder.phase("session_creation"):
+            # create ONNX runtime with given Runtime: CPU or GPU
+            onnx_session, optimized_model_loaded = create_inference_session(
+                onnx_model_path=onnx_model_path,
+                providers=providers,
+                cache=ArtifactCache(
+                    cache_dir=kwargs.get("onnx_cache_dir", "onnx_models"),
+                    max_size_mb=kwargs.get("onnx_cache_max_size"),
+                ),
+                graph_optimization_level=kwargs.get(
+                    "onnx_graph_optimization_level", "basic"
+                ),
+                intra_op_num_threads=kwargs.get("onnx_intra_op_num_threads", 0),
+                inter_op_num_threads=kwargs.get("onnx_inter_op_num_threads", 0),
+                execution_mode=kwargs.get("onnx_execution_mode", "sequential"),
+                # disabled by default to prevent non-deterministic differences in VRAM usage
+                enable_cpu_mem_arena=kwargs.get("onnx_enable_cpu_mem_arena", False),
+                enable_mem_pattern=kwargs.get("onnx_enable_mem_pattern", False),
+            )
+
+            # binds torch tensors to the session, no copies in the timed region
+            onnx_inference_func = OnnxIOBindingRunner(onnx_session)
+
+        measurement, f1_score = measure_inference_latency(
+            model=onnx_inference_func,
+            device=device,
+            batch_size=batch_size,
+            dataset=dataset,
+            n_runs=n_runs,
+            drop_last=False,
+            # dense NCHW inputs are bound without conversion
+            channels_last=False,
+            phase_recorder=self.phase_recorder,
+            **self.measurement_options,
+        )
+        measurement["onnx_optimized_model_loaded"] = optimized_model_loaded
+        return {**measurement, **conversion_info}, f1_score
+
+    def prepare_onnx_model(  # pylint: disable = (unused-argument)
+        self,
+        onnx_model_path: str,
+        model_name: str,
+        batch_size: int,
+        dataset_factory: DatasetFactory,
+        **kwargs,
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Transform exported ONNX model before it is benchmarked.
+
+        Args:
+            onnx_model_path: Path of exported ONNX model.
+            model_name: Name of the model.
+            batch_size: Batch size.
+            dataset_factory: Factory of the benchmark dataset.
+
+        Returns:
+            Path of the benchmarked ONNX model and additional result fields.
+        """
+        return onnx_model_path, {}
+
+    def convert_to_onnx(
+        self,
+        model: Union[torch.nn.Module, torch._C.ScriptModule],
+        device: torch.device,
+        batch_size: int,
+        use_cuda: bool,
+        sample,
+        model_name: str = "model",
+        onnx_cache_dir: str = "onnx_models",
+        onnx_cache_max_size: Optional[float] = None,
+        onnx_opset: int = 14,
+    ) -> Tuple[str, List[str]]:
+        # define ONNX Runtime
+        providers: List[str] = ["CPUExecutionProvider"]
+        if use_cuda:
+            providers = ["CUDAExecutionProvider"]
+
+        # dynamic batch size in ONNX model according to PyTorch tutorial:
+        # https://pytorch.org/tutorials/advanced/super_resolution_with_onnxruntime.html
+        # define batch_size as variable dimension
+        input_names: List[str] = ["input"]
+        output_names: List[str] = ["output"]
+        dynamic_axes_dict: Dict[str, Dict[int, str]] = {
+            input_names[0]: {0: "batch_size"},
+            output_names[0]: {0: "batch_size"},
+        }
+
+        sample_input: Union[torch.Tensor, Tuple[torch.Tensor, ...]]
+        if isinstance(sample, torch.Tensor):
+            sample_input = torch.randn(batch_size, *list(sample.shape)).to(device)
+            input_shapes = [list(sample_input.shape)]
+        elif isinstance(sample, Mapping):
+            sample_input = tuple(val.to(device) for val in sample.values())
+            input_shapes = [list(val.shape) for val in sample_input]
+        else:
+            raise RuntimeError(f"Unrecognized sample type: {type(sample)}")
+
+        # exported graph is reused by every run with the same model and inputs
+        cache_key = compute_cache_key(
+            {
+                "model_name": model_name,
+                "weights_hash": compute_weights_hash(model),
+                "input_shapes": input_shapes,
+                "dynamic_axes": dynamic_axes_dict,
+                "opset": onnx_opset,
+                "torch_version": torch.__version__,
+            }
+        )
+        cache = ArtifactCache(cache_dir=onnx_cache_dir, max_size_mb=onnx_cache_max_size)
+        cache_entry = f"{model_name}-{cache_key[:16]}"
+        onnx_model_path = cache.lookup(key=cache_entry, suffix=".onnx")
+        if onnx_model_path is None:
+            # export model to ONNX format
+            onnx_model_path = cache.store(
+                key=cache_entry,
+                suffix=".onnx",
+                write_artifact=lambda path: torch.onnx.export(
+                    model,
+                    sample_input,
+                    path,
+                    export_params=True,
+                    opset_version=onnx_opset,
+                    input_names=input_names,
+                    output_names=output_names,
+                    dynamic_axes=dynamic_axes_dict,
+                ),
+            )
+
+        return onnx_model_path, providers
+
+
+class BenchmarkONNXInt8(BenchmarkONNX):
+    """ONNX Runtime static INT8 quantization benchmark class."""
+
+    def prepare_onnx_model(  # pylint: disable = (unused-argument)
+        self,
+        onnx_model_path: str,
+        model_name: str,
+        batch_size: int,
+        dataset_factory: DatasetFactory,
+        **kwargs,
+    ) -> Tuple[str, Dict[str, Any]]:
+        n_calibration_batches = kwargs.get("n_calibration_batches", 10)
+        quant_format = kwargs.get("onnx_quant_format", "qdq")
+        calibration_method = kwargs.get("onnx_calibration_method", "minmax")
+        per_channel = kwargs.get("onnx_per_channel", False)
+
+        # calibration is paid once per model and calibration set
+        cache_key = compute_cache_key(
+            {
+                "onnx_model": os.path.basename(onnx_model_path),
+                "dataset": dataset_factory.get_config(),
+                "batch_size": batch_size,
+                "n_calibration_batches": n_calibration_batches,
+                "quant_format": quant_format,
+                "calibration_method": calibration_method,
+                "per_channel": per_channel,
+                "onnxruntime_version": onnxrt.__version__,
+            }
+        )
+        cache = ArtifactCache(
+            cache_dir=kwargs.get("onnx_cache_dir", "onnx_models"),
+            max_size_mb=kwargs.get("onnx_cache_max_size"),
+        )
+        cache_entry = f"{model_name}-int8-{cache_key[:16]}"
+        quantized_model_path = cache.lookup(key=cache_entry, suffix=".onnx")
+        quantized_model_loaded = quantized_model_path is not None
+        if quantized_model_path is None:
+
+            def calibrate_and_quantize(path: str) -> None:
+                calibration_batches = load_calibration_batches(
+                    dataset=dataset_factory.get_dataset(),
+                    batch_size=batch_size,
+                    n_batches=n_calibration_batches,
+                    device=torch.device("cpu"),  # pylint: disable = (no-member)
+                    channels_last=False,
+                )
+                quantize_onnx_model(
+                    onnx_model_path=onnx_model_path,
+                    quantized_model_path=path,
+                    calibration_batches=[
+                        batch.float().numpy() for batch in calibration_batches
+                    ],
+                    quant_format=quant_format,
+                    calibration_method=calibration_method,
+                    per_channel=per_channel,
+                )
+
+            quantized_model_path = cache.store(
+                key=cache_entry,
+                suffix=".onnx",
+                write_artifact=calibrate_and_quantize,
+            )
+
+        return quantized_model_path, {
+            "onnx_quantized_model_loaded": quantized_model_loaded
+        }
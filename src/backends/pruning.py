@@ -0,0 +1,270 @@
+# pylint: disable = (missing-module-docstring)
+
+import copy
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+from torch.nn.utils import prune
+
+from src.benchmark import (
+    Benchmark,
+    is_language_model,
+    measure_inference_latency,
+    requires_full_batches,
+)
+from src.data_pipeline import create_data_iterator, prepare_batch, prepare_batches
+from src.dataset_utils import DatasetFactory
+from src.model_utils import load_model
+from src.pruning import (
+    convert_to_sparse,
+    count_nonzero_parameters,
+    find_pareto_optimal,
+    measure_sparse_crossover,
+    remove_pruned_channels,
+)
+
+
+class BenchmarkTensorPruning(Benchmark):
+    """Pruning benchmark class."""
+
+    def get_benchmark_name(
+        self,
+    ) -> str:
+        return self.__class__.__name__
+
+    def measure_time_and_f1_score(
+        self,
+        model_name: str,
+        device: torch.device,  # pylint: disable = (no-member)
+        batch_size: int,
+        dataset_factory: DatasetFactory,
+        model_torchscript_path: str,
+        use_jit: bool,
+        use_fp16: bool,
+        n_runs: int,
+        **kwargs,
+    ) -> Tuple[Dict[str, Any], Optional[float]]:
+        with self.phase_recorder.phase("model_load"):
+            model = load_model(
+                model_name=model_name, device=device, batch_size=batch_size
+            )
+        dataset = dataset_factory.get_dataset()
+
+        sparse_crossover_info: Dict[str, Any] = {}
+        sparse_crossover_levels = kwargs.get("sparse_crossover_levels")
+        if sparse_crossover_levels:
+            # measured on dense layers, before they are pruned
+            sample_batch, _ = next(
+                iter(
+                    create_data_iterator(
+                        dataset=dataset, batch_size=batch_size, drop_last=False
+                    )
+                )
+            )
+            sparse_crossover_info = measure_sparse_crossover(
+                model=model,
+                example_input=prepare_batch(sample_batch, device=device),
+                sparsity_levels=sparse_crossover_levels,
+                layout=kwargs.get("sparse_layout") or "csr",
+                blocksize=kwargs.get("sparse_blocksize", 4),
+            )
+
+        with self.phase_recorder.phase("conversion"):
+            model, pruning_info = self.prune_model(
+                model=model, dataset=dataset, device=device, **kwargs
+            )
+        measurement, f1_score = measure_inference_latency(
+            model=model,
+            device=device,
+            batch_size=batch_size,
+            dataset=dataset,
+            n_runs=n_runs,
+            phase_recorder=self.phase_recorder,
+            **self.measurement_options,
+        )
+        return {**measurement, **sparse_crossover_info, **pruning_info}, f1_score
+
+    def prune_model(
+        self,
+        model: torch.nn.Module,
+        dataset: torch.utils.data.Dataset,
+        device: torch.device,  # pylint: disable = (no-member)
+        **kwargs,
+    ) -> Tuple[torch.nn.Module, Dict[str, Any]]:
+        """Prune Linear and Conv2d layers of the model in place.
+
+        Args:
+            model: Model to prune.
+            dataset: Benchmark dataset, its first sample is used to trace the model.
+            device: Device of the model.
+
+        Returns:
+            Pruned model, it is a different object if its layers were replaced, and
+            additional result fields.
+        """
+        name: str = kwargs["name"]
+        amount: float = kwargs["amount"]
+        structural_pruning: bool = kwargs.get("structural_pruning", False)
+        sparse_layout: Optional[str] = kwargs.get("sparse_layout")
+
+        if kwargs.get("remove_pruned_channels", False):
+            if is_language_model(model):
+                raise RuntimeError(
+                    "Removing pruned channels at the moment is not supported for "
+                    + "language models."
+                )
+            return remove_pruned_channels(
+                model=model,
+                example_input=dataset[0][0].unsqueeze(0).float().to(device),
+                amount=amount,
+            )
+
+        module_set = set()
+        for module in model.modules():
+            if isinstance(module, (torch.nn.Linear, torch.nn.Conv2d)):
+                module_set.add((module, "weight"))
+                if structural_pruning:
+                    prune.ln_structured(
+                        module=module,
+                        name=name,
+                        amount=amount,
+                        n=2,
+                        dim=0,
+                    )
+
+        if not structural_pruning:
+            prune.global_unstructured(
+                parameters=module_set,
+                pruning_method=prune.L1Unstructured,
+                amount=amount,
+            )
+
+        if sparse_layout is not None:
+            return convert_to_sparse(
+                model=model,
+                layout=sparse_layout,
+                blocksize=kwargs.get("sparse_blocksize", 4),
+            )
+
+        return model, {}
+
+
+class BenchmarkPruningSweep(BenchmarkTensorPruning):
+    """Pruning benchmark of many pruning ratios in a single process."""
+
+    def sweep(
+        self,
+        model_name: str,
+        device: torch.device,  # pylint: disable = (no-member)
+        batch_size: int,
+        dataset_factory: DatasetFactory,
+        n_runs: int,
+        pruning_ratios: List[float],
+        latency_samples_dir: Optional[str] = None,
+        **kwargs,
+    ) -> List[Dict[str, Any]]:
+        """Benchmark pruned model for every pruning ratio.
+
+        Base model and batches are loaded once. Masked models are restored from the
+        cached state dict of the base model after every ratio, models with replaced
+        layers are pruned on copies of the base model.
+
+        Args:
+            model_name: Name of the model.
+            device: Device of the benchmark.
+            batch_size: Batch size.
+            dataset_factory: Factory of the benchmark dataset.
+            n_runs: Number of runs over the dataset for every ratio.
+            pruning_ratios: Pruning ratios to benchmark.
+            latency_samples_dir: Directory where raw latency samples are saved.
+
+        Returns:
+            Result of every pruning ratio, marked whether it is on the Pareto frontier
+            of latency, F1 score and number of non-zero parameters.
+        """
+        self.phase_recorder.reset()
+        with self.phase_recorder.phase("model_load"):
+            base_model = load_model(
+                model_name=model_name, device=device, batch_size=batch_size
+            )
+        base_state_dict = copy.deepcopy(base_model.state_dict())
+        dataset = dataset_factory.get_dataset()
+        with self.phase_recorder.phase("dataset_preparation"):
+            batches = prepare_batches(
+                dataset=dataset,
+                batch_size=batch_size,
+                drop_last=requires_full_batches(base_model),
+                device=device,
+                data_mode=self.measurement_options.get("data_mode", "preload"),
+                prefetch_batches=self.measurement_options.get("prefetch_batches", 2),
+            )
+        replaces_layers = kwargs.get("remove_pruned_channels", False) or (
+            kwargs.get("sparse_layout") is not None
+        )
+
+        results: List[Dict[str, Any]] = []
+        for amount in pruning_ratios:
+            with self.phase_recorder.phase("conversion"):
+                model = copy.deepcopy(base_model) if replaces_layers else base_model
+                model, pruning_info = self.prune_model(
+                    model=model, dataset=dataset, device=device, amount=amount, **kwargs
+                )
+            measurement, f1_score = measure_inference_latency(
+                model=model,
+                device=device,
+                batch_size=batch_size,
+                dataset=dataset,
+                n_runs=n_runs,
+                batches=batches,
+                phase_recorder=self.phase_recorder,
+                **self.measurement_options,
+            )
+            measurement["nonzero_params"] = count_nonzero_parameters(model)
+            results.append(
+                self.create_result(
+                    measurement={**measurement, **pruning_info},
+                    f1_score=f1_score,
+                    model_name=model_name,
+                    batch_size=batch_size,
+                    use_jit=False,
+                    use_fp16=False,
+                    latency_samples_dir=latency_samples_dir,
+                    amount=amount,
+                    **kwargs,
+                )
+            )
+            # model is loaded and the dataset is prepared once, only the first ratio
+            # reports them
+            self.phase_recorder.reset()
+
+            if not replaces_layers:
+                for module in model.modules():
+                    if hasattr(module, "weight_mask"):
+                        prune.remove(module, "weight")
+                model.load_state_dict(base_state_dict)
+                # measurement converts weights to channels last format
+                model.to(
+                    memory_format=torch.contiguous_format  # pylint: disable = (no-member)
+                )
+
+        pareto_optimal = find_pareto_optimal(
+            [
+                (
+                    result["mean_inference_time_per_batch"],
+                    -(result["mean_f1"] or 0.0),
+                    result["nonzero_params"],
+                )
+                for result in results
+            ]
+        )
+        for result, is_optimal in zip(results, pareto_optimal):
+            result["pareto_optimal"] = is_optimal
+            if is_optimal:
+                print(
+                    f"Pareto optimal pruning ratio {result['amount']}: "
+                    + f"{result['mean_inference_time_per_batch']} ms/batch, "
+                    + f"F1 {result['mean_f1']}, "
+                    + f"{result['nonzero_params']} non-zero parameters"
+                )
+
+        return results
@@ -0,0 +1,158 @@
+# pylint: disable = (missing-module-docstring)
+
+from typing import Any, Dict, Optional, Tuple
+
+import torch
+
+from src.benchmark import Benchmark, is_language_model, measure_inference_latency
+from src.cache_utils import ArtifactCache, compute_cache_key
+from src.data_pipeline import load_calibration_batches
+from src.dataset_utils import DatasetFactory
+from src.model_utils import compute_weights_hash, load_model
+from src.quantization_utils import (
+    quantize_dynamic_modules,
+    quantize_static_fx,
+    set_quantized_engine,
+)
+
+
+class BenchmarkTensorDynamicQuantization(Benchmark):
+    """Dynamic Quantization benchmark class."""
+
+    def get_benchmark_name(
+        self,
+    ) -> str:
+        return self.__class__.__name__
+
+    def measure_time_and_f1_score(
+        self,
+        model_name: str,
+        device: torch.device,  # pylint: disable = (no-member)
+        batch_size: int,
+        dataset_factory: DatasetFactory,
+        model_torchscript_path: str,
+        use_jit: bool,
+        use_fp16: bool,
+        n_runs: int,
+        **kwargs,
+    ) -> Tuple[Dict[str, Any], Optional[float]]:
+        with self.phase_recorder.phase("model_load"):
+            model = load_model(
+                model_name=model_name, device=device, batch_size=batch_size
+            )
+        dataset = dataset_factory.get_dataset()
+        with self.phase_recorder.phase("conversion"):
+            quantized_model, quantization_info = quantize_dynamic_modules(
+                model=model,
+                dtype=kwargs.get("dynamic_quantization_dtype", "qint8"),
+                include=kwargs.get("dynamic_quantization_include"),
+                exclude=kwargs.get("dynamic_quantization_exclude"),
+            )
+
+        measurement, f1_score = measure_inference_latency(
+            model=quantized_model,
+            device=device,
+            batch_size=batch_size,
+            dataset=dataset,
+            n_runs=n_runs,
+            phase_recorder=self.phase_recorder,
+            **self.measurement_options,
+        )
+        return {**measurement, **quantization_info}, f1_score
+
+
+class BenchmarkTensorStaticQuantization(Benchmark):
+    """FX graph mode static post-training quantization benchmark class."""
+
+    def get_benchmark_name(
+        self,
+    ) -> str:
+        return self.__class__.__name__
+
+    def measure_time_and_f1_score(
+        self,
+        model_name: str,
+        device: torch.device,  # pylint: disable = (no-member)
+        batch_size: int,
+        dataset_factory: DatasetFactory,
+        model_torchscript_path: str,
+        use_jit: bool,
+        use_fp16: bool,
+        n_runs: int,
+        **kwargs,
+    ) -> Tuple[Dict[str, Any], Optional[float]]:
+        backend: str = kwargs.get("quantization_backend", "x86")
+        n_calibration_batches: int = kwargs.get("n_calibration_batches", 10)
+
+        with self.phase_recorder.phase("model_load"):
+            model = load_model(
+                model_name=model_name, device=device, batch_size=batch_size
+            )
+        if is_language_model(model):
+            raise RuntimeError(
+                "Static quantization at the moment is not supported for language "
+                + "models."
+            )
+
+        dataset = dataset_factory.get_dataset()
+        # cached model is loaded instead of being calibrated and quantized again
+        with self.phase_recorder.phase("conversion"):
+            # calibration is paid once per model, calibration set and backend
+            cache_key = compute_cache_key(
+                {
+                    "model_name": model_name,
+                    "weights_hash": compute_weights_hash(model),
+                    "dataset": dataset_factory.get_config(),
+                    "batch_size": batch_size,
+                    "n_calibration_batches": n_calibration_batches,
+                    "backend": backend,
+                    "torch_version": torch.__version__,
+                }
+            )
+            cache = ArtifactCache(
+                cache_dir=kwargs.get("quantization_cache_dir", "quantized_models"),
+            )
+            cache_entry = f"{model_name}-{backend}-{cache_key[:16]}"
+            quantized_model_path = cache.lookup(key=cache_entry, suffix=".pt")
+            quantized_model_loaded = quantized_model_path is not None
+            if quantized_model_path is None:
+
+                def calibrate_and_quantize(path: str) -> None:
+                    calibration_batches = load_calibration_batches(
+                        dataset=dataset,
+                        batch_size=batch_size,
+                        n_batches=n_calibration_batches,
+                        device=device,
+                    )
+                    quantized_model = quantize_static_fx(
+                        model=model,
+                        calibration_batches=calibration_batches,
+                        backend=backend,
+                    )
+                    # saved as TorchScript, loading does not depend on model classes
+                    with torch.no_grad():
+                        traced_model = torch.jit.trace(
+                            quantized_model, example_inputs=calibration_batches[0]
+                        )
+                    torch.jit.save(traced_model, path)
+
+                quantized_model_path = cache.store(
+                    key=cache_entry,
+                    suffix=".pt",
+                    write_artifact=calibrate_and_quantize,
+                )
+
+            set_quantized_engine(backend)
+            quantized_model = torch.jit.load(quantized_model_path, map_location=device)
+
+        measurement, f1_score = measure_inference_latency(
+            model=quantized_model,
+            device=device,
+            batch_size=batch_size,
+            dataset=dataset,
+            n_runs=n_runs,
+            phase_recorder=self.phase_recorder,
+            **self.measurement_options,
+        )
+        measurement["quantized_model_loaded"] = quantized_model_loaded
+        return measurement, f1_score
@@ -0,0 +1,188 @@
+# pylint: disable = (missing-module-docstring)
+
+from collections.abc import Mapping
+from typing import Any, Dict, Optional, Tuple, Union
+
+import torch
+
+# to install version 1.3.0 follow
+# https://github.com/pytorch/TensorRT/issues/1371#issuecomment-1256035010
+import torch_tensorrt
+
+from src.benchmark import Benchmark, load_model_based_on_mode, measure_inference_latency
+from src.dataset_utils import DatasetFactory, collate_float32
+from src.model_utils import get_model_name
+
+torch_tensorrt.logging.set_reportable_log_level(
+    torch_tensorrt.logging.Level(torch_tensorrt.logging.Level.Error)
+)
+
+
+def create_tensorrt_inputs(
+    batch_size: int,
+    sample: Union[Mapping, torch.Tensor],
+) -> torch_tensorrt.Input:
+    if isinstance(sample, Mapping):
+        inputs = [
+            torch_tensorrt.Input((batch_size, *(val.shape))) for val in sample.values()
+        ]
+    elif isinstance(sample, torch.Tensor):
+        inputs = [torch_tensorrt.Input((batch_size, *list(sample.shape)))]
+
+    return inputs
+
+
+class BenchmarkTensorRT(Benchmark):
+    """TensorRT benchmark class."""
+
+    def get_benchmark_name(
+        self,
+    ) -> str:
+        return self.__class__.__name__
+
+    def measure_time_and_f1_score(
+        self,
+        model_name: str,
+        device: torch.device,  # pylint: disable = (no-member)
+        batch_size: int,
+        dataset_factory: DatasetFactory,
+        model_torchscript_path: str,
+        use_jit: bool,
+        use_fp16: bool,
+        n_runs: int,
+        **kwargs,
+    ) -> Tuple[Dict[str, Any], Optional[float]]:
+        dataset = dataset_factory.get_dataset()
+        sample = dataset[0][0]
+
+        inputs = create_tensorrt_inputs(batch_size=batch_size, sample=sample)
+
+        if not use_fp16:
+            enabled_precisions = set(
+                [
+                    torch_tensorrt._enums.dtype.float  # pylint: disable = (protected-access)
+                ]
+            )
+        else:
+            # run FP16: https://github.com/pytorch/TensorRT/issues/603
+            enabled_precisions = {torch.float16}  # pylint: disable = (no-member)
+
+        model = load_model_based_on_mode(
+            model_name=model_name,
+            device=device,
+            batch_size=batch_size,
+            model_torchscript_path=model_torchscript_path,
+            use_jit=use_jit,
+            phase_recorder=self.phase_recorder,
+            cache_frozen_torchscript=kwargs.get("cache_frozen_torchscript", False),
+        )
+
+        # https://developer.nvidia.com/blog/accelerating-inference-up-to-6x-faster-in-pytorch-with-torch-tensorrt/
+        with self.phase_recorder.phase("conversion"):
+            trt_model = torch_tensorrt.compile(
+                module=model,
+                inputs=inputs,
+                enabled_precisions=enabled_precisions,
+                workspace_size=1
+                << 20,  # prevent OutOfMemory error logs: https://github.com/pytorch/TensorRT/issues/603
+                device={
+                    "device_type": torch_tensorrt.DeviceType.GPU,
+                    "gpu_id": 0,
+                },
+            )
+
+        measurement, f1_score = measure_inference_latency(
+            model=trt_model,
+            device=device,
+            batch_size=batch_size,
+            dataset=dataset,
+            n_runs=n_runs,
+            phase_recorder=self.phase_recorder,
+            **self.measurement_options,
+        )
+        return measurement, f1_score
+
+
+class BenchmarkTensorPTQ(Benchmark):
+    """TensorRT PTQ benchmark class."""
+
+    def get_benchmark_name(
+        self,
+    ) -> str:
+        return self.__class__.__name__
+
+    def measure_time_and_f1_score(
+        self,
+        model_name: str,
+        device: torch.device,  # pylint: disable = (no-member)
+        batch_size: int,
+        dataset_factory: DatasetFactory,
+        model_torchscript_path: str,
+        use_jit: bool,
+        use_fp16: bool,
+        n_runs: int,
+        **kwargs,
+    ) -> Tuple[Dict[str, Any], Optional[float]]:
+        dataset = dataset_factory.get_dataset()
+        sample = dataset[0][0]
+
+        # PTQ usage based on https://pytorch.org/TensorRT/tutorials/ptq.html#ptq
+        model_class_name = get_model_name(model_name)
+        model = load_model_based_on_mode(
+            model_name=model_name,
+            device=device,
+            batch_size=batch_size,
+            model_torchscript_path=model_torchscript_path,
+            use_jit=use_jit,
+            phase_recorder=self.phase_recorder,
+            cache_frozen_torchscript=kwargs.get("cache_frozen_torchscript", False),
+        )
+
+        cache_file = f"./{model_class_name}.calibration.cache"
+
+        inputs = create_tensorrt_inputs(batch_size=batch_size, sample=sample)
+
+        testing_dataloader = torch.utils.data.DataLoader(
+            dataset,
+            batch_size=batch_size,
+            shuffle=False,
+            num_workers=1,
+            collate_fn=collate_float32,
+        )
+        # calibration runs during the compilation
+        with self.phase_recorder.phase("conversion"):
+            calibrator = torch_tensorrt.ptq.DataLoaderCalibrator(
+                testing_dataloader,
+                cache_file=cache_file,
+                use_cache=False,
+                algo_type=torch_tensorrt.ptq.CalibrationAlgo.ENTROPY_CALIBRATION_2,
+                device=device,
+            )
+
+            trt_pqt_model = torch_tensorrt.compile(
+                module=model,
+                inputs=inputs,
+                enabled_precisions={torch.int8},  # pylint: disable = (no-member)
+                calibrator=calibrator,
+                workspace_size=1
+                << 20,  # prevent OutOfMemory error logs: https://github.com/pytorch/TensorRT/issues/603
+                device={
+                    "device_type": torch_tensorrt.DeviceType.GPU,
+                    "gpu_id": 0,
+                    "dla_core": 0,
+                    "allow_gpu_fallback": False,
+                    "disable_tf32": False,
+                },
+            )
+        del calibrator
+
+        measurement, f1_score = measure_inference_latency(
+            model=trt_pqt_model,
+            device=device,
+            batch_size=batch_size,
+            dataset=dataset,
+            n_runs=n_runs,
+            phase_recorder=self.phase_recorder,
+            **self.measurement_options,
+        )
+        return measurement, f1_score
@@ -0,0 +1,130 @@
+# pylint: disable = (missing-module-docstring)
+
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import torch
+
+from src.benchmark import (
+    Benchmark,
+    measure_inference_latency,
+    requires_full_batches,
+    warmup_model,
+)
+from src.data_pipeline import prepare_batches
+from src.dataset_utils import DatasetFactory
+from src.latency_stats import NS_IN_MS
+from src.model_utils import load_model
+
+# `auto` recompiles with dynamic shapes only after a shape change
+COMPILE_DYNAMIC_OPTIONS: Dict[str, Optional[bool]] = {
+    "auto": None,
+    "true": True,
+    "false": False,
+}
+
+
+class BenchmarkCompile(Benchmark):
+    """torch.compile benchmark class."""
+
+    def get_benchmark_name(
+        self,
+    ) -> str:
+        return self.__class__.__name__
+
+    def measure_time_and_f1_score(
+        self,
+        model_name: str,
+        device: torch.device,  # pylint: disable = (no-member)
+        batch_size: int,
+        dataset_factory: DatasetFactory,
+        model_torchscript_path: str,
+        use_jit: bool,
+        use_fp16: bool,
+        n_runs: int,
+        **kwargs,
+    ) -> Tuple[Dict[str, Any], Optional[float]]:
+        if not hasattr(torch, "compile"):
+            raise RuntimeError(
+                "torch.compile requires PyTorch 2.0 or newer, installed version: "
+                + torch.__version__
+            )
+
+        # modules of torch.compile do not exist in PyTorch 1.x
+        # pylint: disable = (import-outside-toplevel)
+        from torch import _dynamo as dynamo
+        from torch._inductor import config as inductor_config
+        from torch._inductor import utils as inductor_utils
+
+        compile_cache_dir: str = kwargs.get("compile_cache_dir", "inductor_cache")
+        # on-disk caches are shared by all runs using the same directory
+        os.environ["TORCHINDUCTOR_CACHE_DIR"] = os.path.abspath(compile_cache_dir)
+        # some releases memoize the directory, runs of a sweep may use different ones
+        cache_dir = getattr(inductor_utils, "cache_dir", None)
+        if hasattr(cache_dir, "cache_clear"):
+            cache_dir.cache_clear()
+        if hasattr(inductor_config, "fx_graph_cache"):
+            inductor_config.fx_graph_cache = True
+        compile_cache_reused = os.path.isdir(compile_cache_dir) and bool(
+            os.listdir(compile_cache_dir)
+        )
+
+        with self.phase_recorder.phase("model_load"):
+            model = load_model(
+                model_name=model_name, device=device, batch_size=batch_size
+            )
+        # compiled graph is specialized for weights layout, so it is set beforehand
+        model.to(device)
+        model.to(memory_format=torch.channels_last)  # pylint: disable = (no-member)
+        model.eval()
+
+        dataset = dataset_factory.get_dataset()
+        with self.phase_recorder.phase("dataset_preparation"):
+            batches = prepare_batches(
+                dataset=dataset,
+                batch_size=batch_size,
+                drop_last=requires_full_batches(model),
+                device=device,
+                data_mode=self.measurement_options.get("data_mode", "preload"),
+                prefetch_batches=self.measurement_options.get("prefetch_batches", 2),
+            )
+
+        # in-memory caches of a process would make a second compilation warm even
+        # without on-disk caches, so the model is compiled once per process and the
+        # compilation is warm only if on-disk caches were written by a previous run
+        dynamo.reset()
+        compiled_model = torch.compile(
+            model,
+            mode=kwargs.get("compile_mode", "default"),
+            dynamic=COMPILE_DYNAMIC_OPTIONS[kwargs.get("compile_dynamic", "auto")],
+        )
+        start_time = time.perf_counter_ns()
+        # model is compiled lazily by the first call
+        warmup_model(compiled_model, device, 1, batches)
+        compile_time = (time.perf_counter_ns() - start_time) / NS_IN_MS
+        # model is compiled by its first call, so cold start of the compiled model
+        # is the compilation
+        self.phase_recorder.record("conversion", compile_time)
+
+        # shapes of all batches are compiled before latency is measured
+        warmup_model(compiled_model, device, len(batches), batches)
+
+        measurement, f1_score = measure_inference_latency(
+            model=compiled_model,
+            device=device,
+            batch_size=batch_size,
+            dataset=dataset,
+            n_runs=n_runs,
+            batches=batches,
+            phase_recorder=self.phase_recorder,
+            **self.measurement_options,
+        )
+        measurement["cold_compile_time"] = (
+            None if compile_cache_reused else round(compile_time, 5)
+        )
+        measurement["warm_compile_time"] = (
+            round(compile_time, 5) if compile_cache_reused else None
+        )
+        measurement["compile_cache_reused"] = compile_cache_reused
+        return measurement, f1_score
@@ -1,72 +1,42 @@
 # pylint: disable = (missing-module-docstring)
 
+import itertools
 import time
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Tuple, Union
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 import numpy as np
-import onnxruntime as onnxrt
 import torch
-
-# to install version 1.3.0 follow
-# https://github.com/pytorch/TensorRT/issues/1371#issuecomment-1256035010
-import torch_tensorrt
-import torchmetrics
-import transformers
 from torch.jit import ScriptModule
-from torch.nn.utils import prune
-from transformers import BatchEncoding
-
-from src.dataset_utils import CustomDataset, DatasetFactory
-from src.memory import get_memory_info
-from src.model import T5, Bert, CustomLSTM, GPTNeo
-from src.model_utils import get_model_name, load_model, load_torchscript_model, to_numpy
 
-torch_tensorrt.logging.set_reportable_log_level(
-    torch_tensorrt.logging.Level(torch_tensorrt.logging.Level.Error)
+from src.data_pipeline import Batch, StreamingBatchLoader, prepare_batches
+from src.dataset_utils import DatasetFactory
+from src.latency_stats import (
+    StoppingRule,
+    compute_latency_statistics,
+    create_latency_samples,
+    save_latency_samples,
 )
+from src.memory import MemoryMonitor, save_memory_samples
+from src.model import CustomLSTM
+from src.model_utils import (
+    MODEL_REGISTRY,
+    load_model,
+    load_torchscript_model,
+    optimize_torchscript_model,
+)
+from src.phase_timing import PhaseRecorder
 
-
-def prepare_dataset(
-    dataset: Union[torch.utils.data.Dataset, torch.utils.data.DataLoader],
-    batch_size: int,
-    drop_last: bool,
-    device: torch.device,  # pylint: disable = (no-member)
-    dtype: str = "fp32",
-) -> Tuple[List[torch.Tensor], List[torch.Tensor]]:
-    samples: List[torch.Tensor] = []
-    labels: List[torch.Tensor] = []
-    data_iterator: Union[torch.utils.data.DataLoader, CustomDataset]
-    if isinstance(dataset, CustomDataset):
-        data_iterator = dataset
-    else:
-        testloader = torch.utils.data.DataLoader(
-            dataset,
-            batch_size=batch_size,
-            shuffle=False,
-            num_workers=4,
-            drop_last=drop_last,
-        )
-        data_iterator = testloader
-
-    for sample_batch, label_batch in data_iterator:
-        samples.append(sample_batch)
-        labels.append(label_batch)
-
-    for index, _ in enumerate(samples):
-        if isinstance(samples[index], torch.Tensor):
-            samples[index] = samples[index].to(device)
-            samples[index] = samples[index].to(
-                memory_format=torch.channels_last
-            )  # pylint: disable = (no-member)
-        else:  # for BatchEncoding
-            samples[index] = samples[index].to(device)
-
-        if dtype == "fp16":
-            if isinstance(samples[index], torch.Tensor):
-                samples[index] = samples[index].half()
-
-    return samples, labels
+# class names of models generating text, their outputs are not classified
+NLG_MODEL_CLASS_NAMES: Tuple[str, ...] = tuple(
+    spec.class_name for spec in MODEL_REGISTRY.values() if spec.is_nlg
+)
+LANGUAGE_MODEL_CLASS_NAMES: Tuple[str, ...] = tuple(
+    spec.class_name
+    for spec in MODEL_REGISTRY.values()
+    if spec.task != "image_classification"
+)
 
 
 def get_model_label(
@@ -86,35 +56,58 @@ def load_model_based_on_mode(
     batch_size: int,
     model_torchscript_path: str,
     use_jit: bool,
+    phase_recorder: Optional[PhaseRecorder] = None,
+    cache_frozen_torchscript: bool = False,
 ) -> Union[torch.nn.Module, torch._C.ScriptModule]:
+    if phase_recorder is None:
+        phase_recorder = PhaseRecorder()
+
     model: Union[torch.nn.Module, torch._C.ScriptModule]
     if not use_jit:
-        model = load_model(
-            model_name=model_name,
-            device=device,
-            batch_size=batch_size,
-        ).to(device)
+        with phase_recorder.phase("model_load"):
+            model = load_model(
+                model_name=model_name,
+                device=device,
+                batch_size=batch_size,
+            ).to(device)
     else:
-        model = load_torchscript_model(
-            model_torchscript_path=model_torchscript_path,
-            device=device,
-        )
+        with phase_recorder.phase("model_load"):
+            model = load_torchscript_model(
+                model_torchscript_path=model_torchscript_path,
+                device=device,
+                optimize=False,
+                cache_frozen=cache_frozen_torchscript,
+            )
+        with phase_recorder.phase("conversion"):
+            model = optimize_torchscript_model(model)
 
     return model
 
 
-def create_tensorrt_inputs(
-    batch_size: int,
-    sample: Union[transformers.BatchEncoding, torch.Tensor],
-) -> torch_tensorrt.Input:
-    if isinstance(sample, BatchEncoding):
-        inputs = [
-            torch_tensorrt.Input((batch_size, *(val.shape))) for val in sample.values()
-        ]
-    elif isinstance(sample, torch.Tensor):
-        inputs = [torch_tensorrt.Input((batch_size, *list(sample.shape)))]
+def get_model_class_name(
+    model: Union[torch.nn.Module, torch._C.ScriptModule],
+) -> str:
+    if isinstance(model, ScriptModule):
+        return model.original_name
 
-    return inputs
+    # models wrapped by `torch.compile` keep the original model in `_orig_mod`
+    return getattr(model, "_orig_mod", model).__class__.__name__
+
+
+def is_language_model(
+    model: Union[torch.nn.Module, torch._C.ScriptModule],
+) -> bool:
+    return get_model_class_name(model) in LANGUAGE_MODEL_CLASS_NAMES
+
+
+def requires_full_batches(
+    model: Union[torch.nn.Module, torch._C.ScriptModule],
+) -> bool:
+    # for LSTM model in TorchScript size of network is known in advance
+    # changing batch_size will cause dimension mismatch
+    return isinstance(model, CustomLSTM) or (
+        isinstance(model, ScriptModule) and model.original_name == "CustomLSTM"
+    )
 
 
 def measure_inference_latency(
@@ -126,7 +119,18 @@ def measure_inference_latency(
     dtype: str = "fp32",
     num_warmups: int = 5,
     drop_last: bool = False,
-) -> Tuple[float, float]:
+    throughput_duration: Optional[float] = None,
+    data_mode: str = "preload",
+    prefetch_batches: int = 2,
+    latency_scope: str = "model",
+    channels_last: bool = True,
+    batches: Optional[Union[List[Batch], StreamingBatchLoader]] = None,
+    phase_recorder: Optional[PhaseRecorder] = None,
+    ci_target: Optional[float] = None,
+    min_iterations: int = 10,
+    max_iterations: Optional[int] = None,
+    time_budget: Optional[float] = None,
+) -> Tuple[Dict[str, Any], Optional[float]]:
     # https://developer.nvidia.com/blog/accelerating-inference-up-to-6x-faster-in-pytorch-with-torch-tensorrt/
 
     # improve performance:
@@ -136,21 +140,22 @@ def measure_inference_latency(
         model.to(memory_format=torch.channels_last)  # pylint: disable = (no-member)
         model.eval()
 
-    # for LSTM model in TorchScript size of network is known in advance
-    # changing batch_size will cause dimension mismatch
-    if isinstance(model, CustomLSTM) or (
-        isinstance(model, ScriptModule) and model.original_name == "CustomLSTM"
-    ):
-        drop_last = True
-
-    sample_batches, label_batches = prepare_dataset(
-        dataset=dataset,
-        batch_size=batch_size,
-        drop_last=drop_last,
-        device=device,
-        dtype=dtype,
-    )
-    num_samples = len(sample_batches)
+    if phase_recorder is None:
+        phase_recorder = PhaseRecorder()
+    if batches is None:
+        with phase_recorder.phase("dataset_preparation"):
+            batches = prepare_batches(
+                dataset=dataset,
+                batch_size=batch_size,
+                drop_last=drop_last or requires_full_batches(model),
+                device=device,
+                dtype=dtype,
+                data_mode=data_mode,
+                prefetch_batches=prefetch_batches,
+                channels_last=channels_last,
+            )
+
+    num_samples = len(batches)
     if num_samples < num_warmups:
         print(
             "WARNING: Number of warmup steps is lower than number of data samples."
@@ -158,40 +163,76 @@ def measure_inference_latency(
         )
         num_warmups = num_samples
 
-    warmup_model(model, device, num_warmups, sample_batches)
+    # first call pays for lazy initialization, e.g. memory allocation or selection
+    # of kernels, so it is timed apart from the rest of the warmup
+    with phase_recorder.phase("first_inference"):
+        warmup_model(model, device, min(1, num_warmups), batches)
+    with phase_recorder.phase("warmup"):
+        warmup_model(model, device, max(0, num_warmups - 1), batches)
+
+    is_nlg_model: bool = get_model_class_name(model) in NLG_MODEL_CLASS_NAMES
+
+    # number of iterations is adaptive if any limit of the stopping rule is set,
+    # otherwise the dataset is run `n_runs` times
+    stopping_rule = None
+    if any(limit is not None for limit in (ci_target, max_iterations, time_budget)):
+        stopping_rule = StoppingRule(
+            ci_target=ci_target,
+            min_iterations=min_iterations,
+            max_iterations=max_iterations,
+            time_budget=time_budget,
+        )
 
-    is_t5_model: bool = isinstance(model, T5) or (
-        isinstance(model, ScriptModule) and model.original_name == "T5"
-    )
-    is_gpt_model: bool = isinstance(model, GPTNeo) or (
-        isinstance(model, ScriptModule) and model.original_name == "GPTNeo"
-    )
-    is_nlg_model: bool = is_t5_model or is_gpt_model
-
-    elapsed_time, f1_score = measure_inference_run(
-        model,
-        device,
-        sample_batches,
-        label_batches,
-        is_nlg_model,
-        n_runs,
-    )
+    with phase_recorder.phase("inference"):
+        latency_samples, f1_score = measure_inference_run(
+            model,
+            device,
+            batches,
+            is_nlg_model,
+            n_runs,
+            include_loading=latency_scope == "end_to_end",
+            stopping_rule=stopping_rule,
+        )
+        measurement: Dict[str, Any] = {
+            "latency_samples": latency_samples,
+            "data_mode": data_mode,
+            "latency_scope": latency_scope,
+        }
+        if stopping_rule is not None:
+            measurement.update(stopping_rule.get_results())
+
+        if throughput_duration is not None:
+            measurement.update(
+                measure_throughput_run(
+                    model,
+                    device,
+                    batches,
+                    throughput_duration,
+                )
+            )
 
-    return elapsed_time, f1_score
+    return measurement, f1_score
+
+
+def get_batch_size(sample: Union[torch.Tensor, Mapping]) -> int:
+    if isinstance(sample, Mapping):
+        return next(iter(sample.values())).shape[0]
+
+    return sample.shape[0]
 
 
 def warmup_model(
     model: Union[torch.nn.Module, torch._C.ScriptModule],
     device: torch.device,  # pylint: disable = (no-member)
     num_warmups: int,
-    sample_batches: List[Union[torch.Tensor, BatchEncoding]],
+    batches: Iterable[Batch],
 ) -> None:
     with torch.no_grad():
-        for index in range(num_warmups):
-            if isinstance(sample_batches[index], BatchEncoding):
-                _ = model(**sample_batches[index])
+        for sample, _ in itertools.islice(batches, num_warmups):
+            if isinstance(sample, Mapping):
+                _ = model(**sample)
             else:
-                _ = model(sample_batches[index])
+                _ = model(sample)
     if "cuda" in device.type:
         torch.cuda.synchronize()
 
@@ -199,35 +240,67 @@ def warmup_model(
 def measure_inference_run(
     model: Union[torch.nn.Module, torch._C.ScriptModule],
     device: torch.device,  # pylint: disable = (no-member)
-    sample_batches: List[torch.Tensor],
-    label_batches: List[torch.Tensor],
+    batches: Iterable[Batch],
     is_nlg_model: bool,
     n_runs: int,
-) -> Tuple[float, Optional[float]]:
-    total_time: List[float] = []
+    include_loading: bool = False,
+    stopping_rule: Optional[StoppingRule] = None,
+) -> Tuple[np.ndarray, Optional[float]]:
+    is_cuda = "cuda" in device.type
+    times_ns: List[int] = []
+    batch_sizes: List[int] = []
+    # predictions of all runs, the last run may be stopped before its end
+    predicted_class: List[torch.Tensor] = []
+    label_batches: List[torch.Tensor] = []
+    if stopping_rule is not None:
+        stopping_rule.start()
     with torch.no_grad():
-        for _ in range(0, n_runs):
-            predicted_class: List[torch.Tensor] = []
-            for sample in sample_batches:
-                if isinstance(sample, BatchEncoding):
-                    start_time = time.time()
+        run_index = 0
+        stopped = False
+        # with a stopping rule the dataset is run until the rule stops it
+        while not stopped and (stopping_rule is not None or run_index < n_runs):
+            run_index += 1
+            batch_iterator = iter(batches)
+            while True:
+                # end-to-end latency includes waiting for the next batch
+                load_start_time = time.perf_counter_ns()
+                try:
+                    sample, label_batch = next(batch_iterator)
+                except StopIteration:
+                    # empty dataset would be run forever
+                    stopped = not times_ns
+                    break
+
+                if isinstance(sample, Mapping):
+                    start_time = time.perf_counter_ns()
                     y_pred = model(**sample)
-                    end_time = time.time()
                 else:
-                    start_time = time.time()
+                    start_time = time.perf_counter_ns()
                     y_pred = model(sample)
-                    end_time = time.time()
-
-                if "cuda" in device.type:
+                # wait for queued CUDA kernels to time the whole inference
+                if is_cuda:
                     torch.cuda.synchronize()
+                end_time = time.perf_counter_ns()
 
                 if not is_nlg_model:
                     predicted_class.append(torch.argmax(y_pred, dim=1))
+                label_batches.append(label_batch)
 
-                total_time.append(end_time - start_time)
+                times_ns.append(
+                    end_time - (load_start_time if include_loading else start_time)
+                )
+                batch_sizes.append(get_batch_size(sample))
+                if stopping_rule is not None and stopping_rule.update(times_ns[-1]):
+                    stopped = True
+                    break
+    if not times_ns:
+        raise RuntimeError("Dataset is empty, no batches to measure latency on.")
 
     score_rounded = None
     if not is_nlg_model:
+        # torchmetrics is imported only when F1 score is computed, it is slow to import
+        import torchmetrics  # pylint: disable = (import-outside-toplevel)
+
         f1_metric = torchmetrics.F1Score(task="multiclass", num_classes=1000)
         preds = (
             torch.hstack(predicted_class)  # pylint: disable = (no-member)
@@ -242,18 +315,83 @@ def measure_inference_run(
         )
         score_rounded = round(score.cpu().detach().item(), 3)
 
-    mean_batch_inference_time = (
-        float(np.mean(total_time)) * 1000
-    )  # convert to milliseconds
-    return (mean_batch_inference_time, score_rounded)
+    latency_samples = create_latency_samples(
+        times_ns=np.asarray(times_ns, dtype=np.int64),
+        batch_sizes=np.asarray(batch_sizes, dtype=np.int64),
+    )
+    return (latency_samples, score_rounded)
+
+
+def measure_throughput_run(
+    model: Union[torch.nn.Module, torch._C.ScriptModule],
+    device: torch.device,  # pylint: disable = (no-member)
+    batches: Iterable[Batch],
+    duration: float,
+) -> Dict[str, float]:
+    """Run batches back-to-back for a fixed wall-clock budget.
+
+    Utilization is the fraction of the wall-clock time spent inside model calls, the
+    rest is an overhead of the benchmark loop and, in streaming mode, of waiting for
+    data.
+
+    Args:
+        model: Benchmarked model or inference function.
+        device: Device of the model.
+        batches: Batches processed in a loop until the budget is spent.
+        duration: Wall-clock budget in seconds.
+
+    Returns:
+        Sustained throughput in samples and batches per second and utilization.
+    """
+    is_cuda = "cuda" in device.type
+    num_batches = 0
+    num_samples = 0
+    busy_time_ns = 0
+    with torch.no_grad():
+        start_time = time.perf_counter_ns()
+        deadline = start_time + int(duration * 1e9)
+        end_time = start_time
+        while end_time < deadline:
+            for sample, _ in batches:
+                call_start_time = time.perf_counter_ns()
+                if isinstance(sample, Mapping):
+                    _ = model(**sample)
+                else:
+                    _ = model(sample)
+                end_time = time.perf_counter_ns()
+                busy_time_ns += end_time - call_start_time
+                num_batches += 1
+                num_samples += get_batch_size(sample)
+                if end_time >= deadline:
+                    break
+            # empty dataset would be run forever
+            if num_batches == 0:
+                raise RuntimeError("No batches to measure throughput on.")
+        # batches are not synchronized one by one to keep the device busy
+        if is_cuda:
+            torch.cuda.synchronize()
+            end_time = time.perf_counter_ns()
+
+    elapsed_time = (end_time - start_time) / 1e9
+    return {
+        "throughput_duration": round(elapsed_time, 5),
+        "throughput_samples_per_sec": round(num_samples / elapsed_time, 5),
+        "throughput_batches_per_sec": round(num_batches / elapsed_time, 5),
+        "throughput_utilization": round(busy_time_ns / 1e9 / elapsed_time, 5),
+    }
 
 
 class Benchmark(ABC):
     """Abstract benchmark class."""
 
-    @classmethod
-    def measure_vram(cls):
-        return get_memory_info()
+    def __init__(
+        self, memory_monitor: Optional[MemoryMonitor] = None, **measurement_options
+    ):
+        # options of `measure_inference_latency` shared by every benchmark type,
+        # e.g. `throughput_duration`
+        self.measurement_options: Dict[str, Any] = measurement_options
+        # time and peak memory of phases of the current benchmark run
+        self.phase_recorder = PhaseRecorder(memory_monitor=memory_monitor)
 
     @abstractmethod
     def get_benchmark_name(
@@ -273,7 +411,7 @@ class Benchmark(ABC):
         use_fp16: bool,
         n_runs: int,
         **kwargs,
-    ) -> Tuple[float, float]:
+    ) -> Tuple[Dict[str, Any], Optional[float]]:
         ...
 
     def benchmark(
@@ -286,9 +424,11 @@ class Benchmark(ABC):
         use_jit: bool,
         use_fp16: bool,
         n_runs: int,
+        latency_samples_dir: Optional[str] = None,
         **kwargs,
-    ) -> Dict[str, Union[float, int]]:
-        inference_time, f1_score = self.measure_time_and_f1_score(
+    ) -> Dict[str, Any]:
+        self.phase_recorder.reset()
+        measurement, f1_score = self.measure_time_and_f1_score(
             model_name=model_name,
             device=device,
             batch_size=batch_size,
@@ -299,470 +439,57 @@ class Benchmark(ABC):
             n_runs=n_runs,
             **kwargs,
         )
-
-        inference_time_rounded = round(inference_time, 5)
-        peak_memory_usage = self.measure_vram()
-        return {
-            "mean_inference_time_per_batch": inference_time_rounded,
-            "max_memory_usage": peak_memory_usage,
-            "mean_f1": f1_score,
-            "batch_size": batch_size,
-            "use_jit": use_jit,
-            "use_fp16": use_fp16,
-            "benchmark_name": self.get_benchmark_name(),
-            **kwargs,
-        }
-
-
-class BenchmarkCPU(Benchmark):
-    """CPU benchmark class."""
-
-    def get_benchmark_name(
-        self,
-    ) -> str:
-        return self.__class__.__name__
-
-    def measure_time_and_f1_score(
-        self,
-        model_name: str,
-        device: torch.device,  # pylint: disable = (no-member)
-        batch_size: int,
-        dataset_factory: DatasetFactory,
-        model_torchscript_path: str,
-        use_jit: bool,
-        use_fp16: bool,
-        n_runs: int,
-        **kwargs,
-    ) -> Tuple[float, float]:
-        dataset = dataset_factory.get_dataset()
-
-        model = load_model_based_on_mode(
+        return self.create_result(
+            measurement=measurement,
+            f1_score=f1_score,
             model_name=model_name,
-            device=device,
             batch_size=batch_size,
-            model_torchscript_path=model_torchscript_path,
             use_jit=use_jit,
+            use_fp16=use_fp16,
+            latency_samples_dir=latency_samples_dir,
+            **kwargs,
         )
 
-        inference_time, f1_score = measure_inference_latency(
-            model=model,
-            device=device,
-            batch_size=batch_size,
-            dataset=dataset,
-            n_runs=n_runs,
-        )
-        return inference_time, f1_score
-
-
-class BenchmarkCUDA(Benchmark):
-    """CUDA benchmark class."""
-
-    def get_benchmark_name(
-        self,
-    ) -> str:
-        return self.__class__.__name__
-
-    def measure_time_and_f1_score(
+    def create_result(
         self,
+        measurement: Dict[str, Any],
+        f1_score: Optional[float],
         model_name: str,
-        device: torch.device,  # pylint: disable = (no-member)
         batch_size: int,
-        dataset_factory: DatasetFactory,
-        model_torchscript_path: str,
         use_jit: bool,
         use_fp16: bool,
-        n_runs: int,
+        latency_samples_dir: Optional[str] = None,
         **kwargs,
-    ) -> Tuple[float, float]:
-        if use_fp16 and use_jit:
-            torch._C._jit_set_autocast_mode(  # pylint: disable = (protected-access,c-extension-no-member)
-                True
+    ) -> Dict[str, Any]:
+        latency_samples: np.ndarray = measurement.pop("latency_samples")
+        latency_statistics = compute_latency_statistics(latency_samples)
+        if latency_samples_dir is not None:
+            measurement["latency_samples_file"] = save_latency_samples(
+                latency_samples=latency_samples,
+                samples_dir=latency_samples_dir,
+                prefix=f"{model_name}_{self.get_benchmark_name()}_{batch_size}",
             )
 
-        model = load_model_based_on_mode(
-            model_name=model_name,
-            device=device,
-            batch_size=batch_size,
-            model_torchscript_path=model_torchscript_path,
-            use_jit=use_jit,
-        )
-        dataset = dataset_factory.get_dataset()
-
-        if not use_fp16:
-            inference_time, f1_score = measure_inference_latency(
-                model=model,
-                device=device,
-                batch_size=batch_size,
-                dataset=dataset,
-                n_runs=n_runs,
-            )
-        else:
-            with torch.amp.autocast(
-                device_type="cuda",
-                dtype=torch.bfloat16,  # pylint: disable = (no-member)
-            ):
-                inference_time, f1_score = measure_inference_latency(
-                    model=model,
-                    device=device,
-                    batch_size=batch_size,
-                    dataset=dataset,
-                    n_runs=n_runs,
+        memory_monitor = self.phase_recorder.memory_monitor
+        if latency_samples_dir is not None and memory_monitor is not None:
+            memory_samples = memory_monitor.get_samples()
+            if memory_samples is not None:
+                measurement["memory_samples_file"] = save_memory_samples(
+                    memory_samples=memory_samples,
+                    samples_dir=latency_samples_dir,
+                    prefix=f"{model_name}_{self.get_benchmark_name()}_{batch_size}",
                 )
 
-        return inference_time, f1_score
-
-
-class BenchmarkTensorRT(Benchmark):
-    """TensorRT benchmark class."""
-
-    def get_benchmark_name(
-        self,
-    ) -> str:
-        return self.__class__.__name__
-
-    def measure_time_and_f1_score(
-        self,
-        model_name: str,
-        device: torch.device,  # pylint: disable = (no-member)
-        batch_size: int,
-        dataset_factory: DatasetFactory,
-        model_torchscript_path: str,
-        use_jit: bool,
-        use_fp16: bool,
-        n_runs: int,
-        **kwargs,
-    ) -> Tuple[float, float]:
-        dataset = dataset_factory.get_dataset()
-        sample = dataset[0][0]
-
-        inputs = create_tensorrt_inputs(batch_size=batch_size, sample=sample)
-
-        if not use_fp16:
-            enabled_precisions = set(
-                [
-                    torch_tensorrt._enums.dtype.float  # pylint: disable = (protected-access)
-                ]
-            )
-        else:
-            # run FP16: https://github.com/pytorch/TensorRT/issues/603
-            enabled_precisions = {torch.float16}  # pylint: disable = (no-member)
-
-        model = load_model_based_on_mode(
-            model_name=model_name,
-            device=device,
-            batch_size=batch_size,
-            model_torchscript_path=model_torchscript_path,
-            use_jit=use_jit,
-        )
-
-        # https://developer.nvidia.com/blog/accelerating-inference-up-to-6x-faster-in-pytorch-with-torch-tensorrt/
-        trt_model = torch_tensorrt.compile(
-            module=model,
-            inputs=inputs,
-            enabled_precisions=enabled_precisions,
-            workspace_size=1
-            << 20,  # prevent OutOfMemory error logs: https://github.com/pytorch/TensorRT/issues/603
-            device={
-                "device_type": torch_tensorrt.DeviceType.GPU,
-                "gpu_id": 0,
-            },
-        )
-
-        inference_time, f1_score = measure_inference_latency(
-            model=trt_model,
-            device=device,
-            batch_size=batch_size,
-            dataset=dataset,
-            n_runs=n_runs,
-        )
-        return inference_time, f1_score
-
-
-class BenchmarkTensorPTQ(Benchmark):
-    """TensorRT PTQ benchmark class."""
-
-    def get_benchmark_name(
-        self,
-    ) -> str:
-        return self.__class__.__name__
-
-    def measure_time_and_f1_score(
-        self,
-        model_name: str,
-        device: torch.device,  # pylint: disable = (no-member)
-        batch_size: int,
-        dataset_factory: DatasetFactory,
-        model_torchscript_path: str,
-        use_jit: bool,
-        use_fp16: bool,
-        n_runs: int,
-        **kwargs,
-    ) -> Tuple[float, float]:
-        dataset = dataset_factory.get_dataset()
-        sample = dataset[0][0]
-
-        # PTQ usage based on https://pytorch.org/TensorRT/tutorials/ptq.html#ptq
-        model_class_name = get_model_name(
-            model_name=model_name, device=device, batch_size=batch_size
-        )
-        model = load_model_based_on_mode(
-            model_name=model_name,
-            device=device,
-            batch_size=batch_size,
-            model_torchscript_path=model_torchscript_path,
-            use_jit=use_jit,
-        )
-
-        cache_file = f"./{model_class_name}.calibration.cache"
-
-        inputs = create_tensorrt_inputs(batch_size=batch_size, sample=sample)
-
-        testing_dataloader = torch.utils.data.DataLoader(
-            dataset, batch_size=batch_size, shuffle=False, num_workers=1
-        )
-        calibrator = torch_tensorrt.ptq.DataLoaderCalibrator(
-            testing_dataloader,
-            cache_file=cache_file,
-            use_cache=False,
-            algo_type=torch_tensorrt.ptq.CalibrationAlgo.ENTROPY_CALIBRATION_2,
-            device=device,
-        )
-
-        trt_pqt_model = torch_tensorrt.compile(
-            module=model,
-            inputs=inputs,
-            enabled_precisions={torch.int8},  # pylint: disable = (no-member)
-            calibrator=calibrator,
-            workspace_size=1
-            << 20,  # prevent OutOfMemory error logs: https://github.com/pytorch/TensorRT/issues/603
-            device={
-                "device_type": torch_tensorrt.DeviceType.GPU,
-                "gpu_id": 0,
-                "dla_core": 0,
-                "allow_gpu_fallback": False,
-                "disable_tf32": False,
-            },
-        )
-        del calibrator
-
-        inference_time, f1_score = measure_inference_latency(
-            model=trt_pqt_model,
-            device=device,
-            batch_size=batch_size,
-            dataset=dataset,
-            n_runs=n_runs,
-        )
-        return inference_time, f1_score
-
-
-class BenchmarkTensorDynamicQuantization(Benchmark):
-    """Dynamic Quantization benchmark class."""
-
-    def get_benchmark_name(
-        self,
-    ) -> str:
-        return self.__class__.__name__
-
-    def measure_time_and_f1_score(
-        self,
-        model_name: str,
-        device: torch.device,  # pylint: disable = (no-member)
-        batch_size: int,
-        dataset_factory: DatasetFactory,
-        model_torchscript_path: str,
-        use_jit: bool,
-        use_fp16: bool,
-        n_runs: int,
-        **kwargs,
-    ) -> Tuple[float, float]:
-        model = load_model(model_name=model_name, device=device, batch_size=batch_size)
-        dataset = dataset_factory.get_dataset()
-        quantized_model = torch.quantization.quantize_dynamic(
-            model=model,
-            qconfig_spec={torch.nn.Conv2d},
-            dtype=torch.qint8,  # pylint: disable = (no-member)
-        )
-
-        inference_time, f1_score = measure_inference_latency(
-            model=quantized_model,
-            device=device,
-            batch_size=batch_size,
-            dataset=dataset,
-            n_runs=n_runs,
-        )
-        return inference_time, f1_score
-
-
-class BenchmarkTensorPruning(Benchmark):
-    """Pruning benchmark class."""
-
-    def get_benchmark_name(
-        self,
-    ) -> str:
-        return self.__class__.__name__
-
-    def measure_time_and_f1_score(
-        self,
-        model_name: str,
-        device: torch.device,  # pylint: disable = (no-member)
-        batch_size: int,
-        dataset_factory: DatasetFactory,
-        model_torchscript_path: str,
-        use_jit: bool,
-        use_fp16: bool,
-        n_runs: int,
-        **kwargs,
-    ) -> Tuple[float, float]:
-        name: str = kwargs["name"]
-        amount: float = kwargs["amount"]
-        structural_pruning: bool = kwargs.get("structural_pruning", False)
-
-        model = load_model(model_name=model_name, device=device, batch_size=batch_size)
-        dataset = dataset_factory.get_dataset()
-        module_set = set()
-        for module in model.modules():
-            if isinstance(module, (torch.nn.Linear, torch.nn.Conv2d)):
-                module_set.add((module, "weight"))
-                if structural_pruning:
-                    prune.ln_structured(
-                        module=module,
-                        name=name,
-                        amount=amount,
-                        n=2,
-                        dim=0,
-                    )
-
-        if not structural_pruning:
-            prune.global_unstructured(
-                parameters=module_set,
-                pruning_method=prune.L1Unstructured,
-                amount=amount,
-            )
-
-        inference_time, f1_score = measure_inference_latency(
-            model=model,
-            device=device,
-            batch_size=batch_size,
-            dataset=dataset,
-            n_runs=n_runs,
-        )
-        return inference_time, f1_score
-
-
-class BenchmarkONNX(Benchmark):
-    """ONNX benchmark class."""
-
-    def get_benchmark_name(
-        self,
-    ) -> str:
-        return self.__class__.__name__
-
-    def measure_time_and_f1_score(
-        self,
-        model_name: str,
-        device: torch.device,  # pylint: disable = (no-member)
-        batch_size: int,
-        dataset_factory: DatasetFactory,
-        model_torchscript_path: str,
-        use_jit: bool,
-        use_fp16: bool,
-        n_runs: int,
-        use_cuda: bool,
-        **kwargs,
-    ) -> Tuple[float, float]:
-        model = load_model_based_on_mode(
-            model_name=model_name,
-            device=device,
-            batch_size=batch_size,
-            model_torchscript_path=model_torchscript_path,
-            use_jit=use_jit,
-        )
-        if isinstance(model, (T5, GPTNeo, Bert)):
-            raise RuntimeError(
-                "ONNX at the moment is not supported for language models."
-            )
-
-        dataset = dataset_factory.get_dataset()
-        sample = dataset[0][0]
-        onnx_model_path, providers = self.convert_to_onnx(
-            model=model,
-            device=device,
-            batch_size=batch_size,
-            sample=sample,
-            use_cuda=use_cuda,
-        )
-
-        session_options = onnxrt.SessionOptions()
-        session_options.graph_optimization_level = (
-            onnxrt.GraphOptimizationLevel.ORT_ENABLE_BASIC
-        )
-        # disable optimizations to prevent non-deterministic differences in VRAM usage
-        session_options.enable_cpu_mem_arena = False
-        session_options.enable_mem_pattern = False
-
-        # create ONNX runtime with given Runtime: CPU or GPU
-        onnx_session = onnxrt.InferenceSession(
-            onnx_model_path,
-            providers=providers,
-            sess_options=session_options,
-        )
-
-        # define wrapper function to process tensors
-        def onnx_inference_func(x: torch.Tensor) -> torch.Tensor:
-            onnx_inputs = {onnx_session.get_inputs()[0].name: to_numpy(x)}
-            y_pred: List[np.ndarray] = onnx_session.run(None, onnx_inputs)
-            return torch.vstack([torch.from_numpy(item).float() for item in y_pred])
-
-        inference_time, f1_score = measure_inference_latency(
-            model=onnx_inference_func,
-            device=device,
-            batch_size=batch_size,
-            dataset=dataset,
-            n_runs=n_runs,
-            drop_last=False,
-        )
-        return inference_time, f1_score
-
-    def convert_to_onnx(
-        self,
-        model: Union[torch.nn.Module, torch._C.ScriptModule],
-        device: torch.device,
-        batch_size: int,
-        use_cuda: bool,
-        sample,
-        onnx_model_path: str = "model.onnx",
-    ):
-        # define ONNX Runtime
-        providers: List[str] = ["CPUExecutionProvider"]
-        if use_cuda:
-            providers = ["CUDAExecutionProvider"]
-
-        # dynamic batch size in ONNX model according to PyTorch tutorial:
-        # https://pytorch.org/tutorials/advanced/super_resolution_with_onnxruntime.html
-        # define batch_size as variable dimension
-        input_names: List[str] = ["input"]
-        output_names: List[str] = ["output"]
-        dynamic_axes_dict: Dict[str, Dict[int, str]] = {
-            input_names[0]: {0: "batch_size"},
-            output_names[0]: {0: "batch_size"},
+        peak_memory_usage = self.phase_recorder.get_max_memory_usage()
+        return {
+            **latency_statistics,
+            **self.phase_recorder.get_results(),
+            **measurement,
+            "max_memory_usage": peak_memory_usage,
+            "mean_f1": f1_score,
+            "batch_size": batch_size,
+            "use_jit": use_jit,
+            "use_fp16": use_fp16,
+            "benchmark_name": self.get_benchmark_name(),
+            **kwargs,
         }
-
-        if isinstance(sample, torch.Tensor):
-            sample_input = torch.randn(batch_size, *list(sample.shape)).to(device)
-        elif isinstance(sample, BatchEncoding):
-            sample_input = (val.to(device) for val in sample.data.values())
-        else:
-            raise RuntimeError(f"Unrecognized sample type: {type(sample)}")
-
-        # export model to ONNX format
-        torch.onnx.export(
-            model,
-            sample_input,
-            onnx_model_path,
-            export_params=True,
-            input_names=input_names,
-            output_names=output_names,
-            dynamic_axes=dynamic_axes_dict,
-        )
-
-        return onnx_model_path, providers
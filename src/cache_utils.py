@@ -0,0 +1,117 @@
+# pylint: disable = (missing-module-docstring)
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+
+def compute_cache_key(params: Dict[str, Any]) -> str:
+    serialized = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def load_npy(path: str) -> np.ndarray:
+    # copy-on-write mapping: pages are read lazily from disk and shared between
+    # processes, while the array stays writable, as expected by `torch.from_numpy`
+    return np.load(path, mmap_mode="c")
+
+
+def commit_cache_dir(tmp_dir: str, cache_dir: str) -> None:
+    """Atomically move a fully written cache entry into its final location.
+
+    Args:
+        tmp_dir: Temporary directory with the cache entry.
+        cache_dir: Final directory of the cache entry.
+    """
+    try:
+        os.replace(tmp_dir, cache_dir)
+    except OSError:
+        # entry was created by a concurrent run in the meantime
+        if not os.path.exists(cache_dir):
+            raise
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+class ArtifactCache:
+    """Directory of artifact files addressed by a key with LRU eviction.
+
+    Every lookup hit refreshes modification time of the artifact, the least recently
+    used artifacts are removed when the size of the cache exceeds `max_size_mb`.
+    """
+
+    def __init__(self, cache_dir: str, max_size_mb: Optional[float] = None):
+        self.cache_dir = cache_dir
+        self.max_size_mb = max_size_mb
+
+    def get_path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{suffix}")
+
+    def lookup(self, key: str, suffix: str) -> Optional[str]:
+        path = self.get_path(key=key, suffix=suffix)
+        if not os.path.exists(path):
+            return None
+
+        os.utime(path)
+        return path
+
+    def store(
+        self,
+        key: str,
+        suffix: str,
+        write_artifact: Callable[[str], None],
+    ) -> str:
+        """Write an artifact under a key.
+
+        Args:
+            key: Cache key of the artifact.
+            suffix: Suffix of the artifact filename, e.g. file extension.
+            write_artifact: Function that writes the artifact to the given path.
+
+        Returns:
+            Path of the cached artifact.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.get_path(key=key, suffix=suffix)
+        # write under a unique name first, concurrent runs never see partial files
+        tmp_path = f"{path}.tmp-{os.getpid()}-{uuid.uuid4().hex}"
+        try:
+            write_artifact(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self.evict(keep_path=path)
+        return path
+
+    def evict(self, keep_path: Optional[str] = None) -> None:
+        if self.max_size_mb is None or not os.path.exists(self.cache_dir):
+            return
+
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, filename)
+            if ".tmp-" in filename:
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:  # removed by a concurrent run
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size_mb * 2**20:
+                break
+            if path == keep_path:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:  # removed by a concurrent run
+                pass
+            total_size -= size
@@ -0,0 +1,244 @@
+# pylint: disable = (missing-module-docstring)
+
+import itertools
+import queue
+import threading
+from collections.abc import Mapping
+from typing import Iterator, List, Optional, Tuple, Union
+
+import torch
+
+from src.dataset_utils import CustomDataset
+
+# tokenized samples are `BatchEncoding` mappings of input names to tensors
+Batch = Tuple[Union[torch.Tensor, Mapping], torch.Tensor]
+
+
+def create_data_iterator(
+    dataset: torch.utils.data.Dataset,
+    batch_size: int,
+    drop_last: bool,
+) -> Union[torch.utils.data.DataLoader, CustomDataset]:
+    # CustomDataset already contains batches
+    if isinstance(dataset, CustomDataset):
+        return dataset
+
+    return torch.utils.data.DataLoader(
+        dataset,
+        batch_size=batch_size,
+        shuffle=False,
+        num_workers=4,
+        drop_last=drop_last,
+    )
+
+
+def prepare_batch(
+    sample: Union[torch.Tensor, Mapping],
+    device: torch.device,  # pylint: disable = (no-member)
+    dtype: str = "fp32",
+    non_blocking: bool = False,
+    channels_last: bool = True,
+) -> Union[torch.Tensor, Mapping]:
+    if isinstance(sample, torch.Tensor):
+        sample = sample.to(device, non_blocking=non_blocking)
+        if channels_last:
+            sample = sample.to(
+                memory_format=torch.channels_last
+            )  # pylint: disable = (no-member)
+        if dtype == "fp16":
+            sample = sample.half()
+        elif sample.dtype == torch.float16:  # from dataset cache
+            sample = sample.float()
+    else:  # for BatchEncoding
+        sample = sample.to(device)
+
+    return sample
+
+
+def prepare_dataset(
+    dataset: Union[torch.utils.data.Dataset, torch.utils.data.DataLoader],
+    batch_size: int,
+    drop_last: bool,
+    device: torch.device,  # pylint: disable = (no-member)
+    dtype: str = "fp32",
+    channels_last: bool = True,
+) -> Tuple[List[torch.Tensor], List[torch.Tensor]]:
+    samples: List[torch.Tensor] = []
+    labels: List[torch.Tensor] = []
+    data_iterator = create_data_iterator(
+        dataset=dataset, batch_size=batch_size, drop_last=drop_last
+    )
+
+    for sample_batch, label_batch in data_iterator:
+        samples.append(sample_batch)
+        labels.append(label_batch)
+
+    for index, _ in enumerate(samples):
+        samples[index] = prepare_batch(
+            samples[index], device=device, dtype=dtype, channels_last=channels_last
+        )
+
+    return samples, labels
+
+
+def load_calibration_batches(
+    dataset: torch.utils.data.Dataset,
+    batch_size: int,
+    n_batches: int,
+    device: torch.device,  # pylint: disable = (no-member)
+    channels_last: bool = True,
+) -> List[Union[torch.Tensor, Mapping]]:
+    # only the first batches are loaded, calibration does not need labels
+    data_iterator = create_data_iterator(
+        dataset=dataset, batch_size=batch_size, drop_last=False
+    )
+    return [
+        prepare_batch(sample_batch, device=device, channels_last=channels_last)
+        for sample_batch, _ in itertools.islice(data_iterator, n_batches)
+    ]
+
+
+class StreamingBatchLoader:
+    """Loads batches on a background thread into a bounded buffer.
+
+    Every iteration starts a new pass over the dataset. At most `prefetch_batches`
+    batches ready on the device are kept in memory at once, so memory usage does not
+    depend on the size of the dataset.
+    """
+
+    def __init__(
+        self,
+        dataset: torch.utils.data.Dataset,
+        batch_size: int,
+        drop_last: bool,
+        device: torch.device,  # pylint: disable = (no-member)
+        dtype: str = "fp32",
+        prefetch_batches: int = 2,
+        channels_last: bool = True,
+    ):
+        self.data_iterator = create_data_iterator(
+            dataset=dataset, batch_size=batch_size, drop_last=drop_last
+        )
+        self.device = device
+        self.dtype = dtype
+        self.prefetch_batches = prefetch_batches
+        self.channels_last = channels_last
+
+    def __len__(self) -> int:
+        return len(self.data_iterator)
+
+    def __iter__(self) -> Iterator[Batch]:
+        buffer: "queue.Queue[Optional[Batch]]" = queue.Queue(
+            maxsize=self.prefetch_batches
+        )
+        stop_event = threading.Event()
+        errors: List[BaseException] = []
+        worker = threading.Thread(
+            target=self._load_batches,
+            args=(buffer, stop_event, errors),
+            daemon=True,
+        )
+        worker.start()
+        try:
+            while True:
+                batch = buffer.get()
+                if batch is None:
+                    break
+                yield batch
+        finally:
+            # consumer may stop early, e.g. after warmup batches
+            stop_event.set()
+            while worker.is_alive():
+                try:
+                    buffer.get_nowait()
+                except queue.Empty:
+                    worker.join(timeout=0.01)
+
+        if errors:
+            raise errors[0]
+
+    def _load_batches(
+        self,
+        buffer: "queue.Queue[Optional[Batch]]",
+        stop_event: threading.Event,
+        errors: List[BaseException],
+    ) -> None:
+        # copy batches on a side stream so they do not queue up behind the model
+        is_cuda = "cuda" in self.device.type
+        copy_stream = torch.cuda.Stream(device=self.device) if is_cuda else None
+        try:
+            for sample_batch, label_batch in self.data_iterator:
+                if stop_event.is_set():
+                    break
+                if copy_stream is not None:
+                    with torch.cuda.stream(copy_stream):
+                        sample_batch = prepare_batch(
+                            sample_batch,
+                            device=self.device,
+                            dtype=self.dtype,
+                            non_blocking=True,
+                            channels_last=self.channels_last,
+                        )
+                    copy_stream.synchronize()
+                else:
+                    sample_batch = prepare_batch(
+                        sample_batch,
+                        device=self.device,
+                        dtype=self.dtype,
+                        channels_last=self.channels_last,
+                    )
+                if not self._put(buffer, (sample_batch, label_batch), stop_event):
+                    return
+        except Exception as error:  # pylint: disable = (broad-except)
+            errors.append(error)
+
+        self._put(buffer, None, stop_event)
+
+    @staticmethod
+    def _put(
+        buffer: "queue.Queue[Optional[Batch]]",
+        item: Optional[Batch],
+        stop_event: threading.Event,
+    ) -> bool:
+        while not stop_event.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+
+def prepare_batches(
+    dataset: torch.utils.data.Dataset,
+    batch_size: int,
+    drop_last: bool,
+    device: torch.device,  # pylint: disable = (no-member)
+    dtype: str = "fp32",
+    data_mode: str = "preload",
+    prefetch_batches: int = 2,
+    channels_last: bool = True,
+) -> Union[List[Batch], StreamingBatchLoader]:
+    if data_mode == "stream":
+        # only `prefetch_batches` batches are kept in memory, the next ones are
+        # loaded in the background while the current one is processed
+        return StreamingBatchLoader(
+            dataset=dataset,
+            batch_size=batch_size,
+            drop_last=drop_last,
+            device=device,
+            dtype=dtype,
+            prefetch_batches=prefetch_batches,
+            channels_last=channels_last,
+        )
+
+    sample_batches, label_batches = prepare_dataset(
+        dataset=dataset,
+        batch_size=batch_size,
+        drop_last=drop_last,
+        device=device,
+        dtype=dtype,
+        channels_last=channels_last,
+    )
+    return list(zip(sample_batches, label_batches))
@@ -1,42 +1,229 @@
 # pylint: disable = (missing-module-docstring)
 
+import json
 import os
 from abc import ABC, abstractmethod
-from typing import List, Optional, Tuple
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
 
+import numpy as np
 import torch
 import torchvision
-from datasets import load_dataset
 from more_itertools import chunked
 from torchvision import transforms
-from transformers import AutoTokenizer, BatchEncoding, GPT2Tokenizer, GPT2TokenizerFast
+
+from src.cache_utils import commit_cache_dir, compute_cache_key, load_npy
+
+if TYPE_CHECKING:
+    from transformers import PreTrainedTokenizerBase
+
+# datasets and transformers are imported only by the IMDB dataset, they are slow to
+# import
+# pylint: disable = (import-outside-toplevel)
+
+# preprocessing of ImageNet-Mini images, part of the preprocessed dataset cache key
+IMAGENET_TRANSFORM_PARAMS: Dict[str, Any] = {
+    "resize": 256,
+    "center_crop": 224,
+    "mean": (0.485, 0.456, 0.406),
+    "std": (0.229, 0.224, 0.225),
+}
+IMAGENET_CACHE_SHARD_SIZE = 1024
+IMAGENET_CACHE_VERSION = 1
+IMDB_CACHE_VERSION = 1
+
+
+def collate_float32(batch: List[Tuple[torch.Tensor, int]]) -> List[torch.Tensor]:
+    # samples from the fp16/uint8 dataset cache as FP32 batch for external consumers
+    samples, labels = torch.utils.data.default_collate(batch)
+    return [samples.float(), labels]
 
 
 class CustomDataset(torch.utils.data.Dataset):
     """Custom Datasets class for ImageNet-Mini dataset."""
 
-    def __init__(self, data: List[BatchEncoding], labels: List[torch.Tensor]):
+    def __init__(self, data: List[Mapping], labels: List[torch.Tensor]):
         self.data = data
         self.labels = labels
 
     def __len__(self) -> int:
         return len(self.data)
 
-    def __getitem__(self, idx: int) -> Tuple[BatchEncoding, torch.Tensor]:
+    def __getitem__(self, idx: int) -> Tuple[Mapping, torch.Tensor]:
         return self.data[idx], self.labels[idx]
 
 
+class MemmapImageDataset(torch.utils.data.Dataset):
+    """Preprocessed images stored in memory-mapped `.npy` shards."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        with open(
+            os.path.join(cache_dir, "metadata.json"), "r", encoding="utf-8"
+        ) as file:
+            self.metadata: Dict[str, Any] = json.load(file)
+
+        self.num_samples: int = self.metadata["num_samples"]
+        self.shard_size: int = self.metadata["shard_size"]
+        self.storage_dtype: str = self.metadata["storage_dtype"]
+        self.labels = np.load(os.path.join(cache_dir, "labels.npy"))
+        self.mean = torch.tensor(self.metadata["mean"]).view(-1, 1, 1)
+        self.std = torch.tensor(self.metadata["std"]).view(-1, 1, 1)
+        # shards are mapped lazily, so each DataLoader worker maps them on its own
+        self._shards: Optional[List[np.ndarray]] = None
+
+    def _get_shards(self) -> List[np.ndarray]:
+        if self._shards is None:
+            self._shards = [
+                load_npy(os.path.join(self.cache_dir, filename))
+                for filename in self.metadata["shards"]
+            ]
+
+        return self._shards
+
+    def __len__(self) -> int:
+        return self.num_samples
+
+    def __getitem__(self, idx: int) -> Tuple[torch.Tensor, int]:
+        shard_index, shard_offset = divmod(idx, self.shard_size)
+        # view on the memory-mapped shard, no data is copied
+        sample = torch.from_numpy(self._get_shards()[shard_index][shard_offset])
+        if self.storage_dtype == "uint8":
+            sample = (sample.float() / 255.0 - self.mean) / self.std
+
+        return sample, int(self.labels[idx])
+
+
+def build_imagenet_cache(
+    image_root: str,
+    cache_dir: str,
+    params: Dict[str, Any],
+    num_workers: int = 4,
+) -> None:
+    """Decode, preprocess and store ImageNet-Mini images in memory-mapped shards.
+
+    Shards are written batch by batch, so the subset never has to fit in RAM.
+
+    Args:
+        image_root: Directory with images in `ImageFolder` layout.
+        cache_dir: Directory of the cache entry.
+        params: Cache parameters: transform parameters, storage dtype and shard size.
+        num_workers: Number of DataLoader workers decoding images.
+    """
+    storage_dtype: str = params["storage_dtype"]
+    shard_size: int = params["shard_size"]
+    transform_list = [
+        transforms.ToTensor(),
+        transforms.Resize(params["resize"]),
+        transforms.CenterCrop(params["center_crop"]),
+    ]
+    # uint8 shards keep unnormalized pixels, normalization is applied on read
+    if storage_dtype != "uint8":
+        transform_list.append(transforms.Normalize(params["mean"], params["std"]))
+    image_folder = torchvision.datasets.ImageFolder(
+        root=image_root, transform=transforms.Compose(transform_list)
+    )
+    num_samples = len(image_folder)
+    sample_shape = tuple(image_folder[0][0].shape)
+    np_dtype = np.uint8 if storage_dtype == "uint8" else np.float16
+
+    tmp_dir = f"{cache_dir}.tmp-{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    shard_filenames: List[str] = []
+    labels = np.empty(num_samples, dtype=np.int64)
+    loader = torch.utils.data.DataLoader(
+        image_folder, batch_size=64, shuffle=False, num_workers=num_workers
+    )
+    shard: Optional[np.ndarray] = None
+    for batch_index, (sample_batch, label_batch) in enumerate(loader):
+        start = batch_index * loader.batch_size
+        if storage_dtype == "uint8":
+            sample_batch = (sample_batch * 255.0).round().clamp(0, 255)
+        labels[start : start + len(label_batch)] = label_batch.numpy()
+        for offset, sample in enumerate(sample_batch.numpy()):
+            index = start + offset
+            shard_offset = index % shard_size
+            if shard_offset == 0:
+                if shard is not None:
+                    shard.flush()
+                shard_filenames.append(f"shard_{len(shard_filenames):05d}.npy")
+                shard = np.lib.format.open_memmap(
+                    os.path.join(tmp_dir, shard_filenames[-1]),
+                    mode="w+",
+                    dtype=np_dtype,
+                    shape=(min(shard_size, num_samples - index), *sample_shape),
+                )
+            shard[shard_offset] = sample
+    if shard is not None:
+        shard.flush()
+    del shard
+
+    np.save(os.path.join(tmp_dir, "labels.npy"), labels)
+    with open(os.path.join(tmp_dir, "metadata.json"), "w", encoding="utf-8") as file:
+        json.dump(
+            {**params, "num_samples": num_samples, "shards": shard_filenames},
+            file,
+            indent=4,
+        )
+
+    commit_cache_dir(tmp_dir, cache_dir)
+
+
+def create_tokenized_dataset(arrays: Dict[str, np.ndarray]) -> CustomDataset:
+    from transformers import BatchEncoding
+
+    # batches are views on the flat (possibly memory-mapped) arrays, nothing is copied
+    fields = [key for key in arrays.keys() if key not in ["labels", "batch_shapes"]]
+    samples: List[Mapping] = []
+    labels: List[torch.Tensor] = []
+    offset = 0
+    row = 0
+    for batch_size, sequence_length in arrays["batch_shapes"].tolist():
+        size = batch_size * sequence_length
+        samples.append(
+            BatchEncoding(
+                {
+                    key: torch.from_numpy(
+                        arrays[key][offset : offset + size].reshape(
+                            batch_size, sequence_length
+                        )
+                    )
+                    for key in fields
+                }
+            )
+        )
+        labels.append(torch.from_numpy(arrays["labels"][row : row + batch_size]))
+        offset += size
+        row += batch_size
+
+    return CustomDataset(data=samples, labels=labels)
+
+
 class DatasetFactory(ABC):
     """Factory class that returns Dataset class."""
 
+    def __init__(self):
+        self._dataset: Optional[torch.utils.data.Dataset] = None
+
     @abstractmethod
-    def get_dataset(self) -> torch.utils.data.Dataset:
+    def create_dataset(self) -> torch.utils.data.Dataset:
+        ...
+
+    @abstractmethod
+    def get_config(self) -> Dict[str, Union[str, int]]:
         ...
 
+    def get_dataset(self) -> torch.utils.data.Dataset:
+        # build dataset once and reuse it by every benchmark run of this factory
+        if self._dataset is None:
+            self._dataset = self.create_dataset()
+
+        return self._dataset
+
     def get_example_inputs(self) -> Optional[List[torch.Tensor]]:
         sample = self.get_dataset()[0][0]
         example_inputs: Optional[List[torch.Tensor]] = None
-        if isinstance(sample, BatchEncoding):
+        if isinstance(sample, Mapping):
             example_inputs = list(sample.values())
 
         return example_inputs
@@ -49,29 +236,79 @@ class DatasetImagenetMiniFactory(DatasetFactory):
         self,
         data_dir: str,
         subset_name: str,
+        cache_dir: Optional[str] = None,
+        cache_dtype: str = "fp16",
     ):
+        super().__init__()
         self.data_dir = data_dir
         self.subset_name = subset_name
+        self.cache_dir = cache_dir
+        self.cache_dtype = cache_dtype
 
-    def get_dataset(self) -> torch.utils.data.Dataset:
+    def get_config(self) -> Dict[str, Union[str, int]]:
+        return {
+            "dataset": "imagenet-mini",
+            "data_dir": self.data_dir,
+            "subset_name": self.subset_name,
+            "cache_dir": str(self.cache_dir),
+            "cache_dtype": self.cache_dtype,
+        }
+
+    def create_dataset(self) -> torch.utils.data.Dataset:
         # dataset downloaded from https://www.kaggle.com/datasets/ifigotin/imagenetmini-1000
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
 
+        image_root = os.path.join(self.data_dir, "imagenet-mini", self.subset_name)
+        if self.cache_dir is not None:
+            return self.load_cached_dataset(
+                image_root=image_root, cache_dir=self.cache_dir
+            )
+
         testing_dataset = torchvision.datasets.ImageFolder(
-            root=os.path.join(self.data_dir, "imagenet-mini", self.subset_name),
+            root=image_root,
             transform=transforms.Compose(
                 [
                     transforms.ToTensor(),
-                    transforms.Resize(256),
-                    transforms.CenterCrop(224),
-                    transforms.Normalize((0.485, 0.456, 0.406), (0.229, 0.224, 0.225)),
+                    transforms.Resize(IMAGENET_TRANSFORM_PARAMS["resize"]),
+                    transforms.CenterCrop(IMAGENET_TRANSFORM_PARAMS["center_crop"]),
+                    transforms.Normalize(
+                        IMAGENET_TRANSFORM_PARAMS["mean"],
+                        IMAGENET_TRANSFORM_PARAMS["std"],
+                    ),
                 ]
             ),
         )
 
         return testing_dataset
 
+    def load_cached_dataset(
+        self,
+        image_root: str,
+        cache_dir: str,
+    ) -> MemmapImageDataset:
+        params: Dict[str, Any] = {
+            **IMAGENET_TRANSFORM_PARAMS,
+            "image_root": os.path.abspath(image_root),
+            "subset_name": self.subset_name,
+            "storage_dtype": self.cache_dtype,
+            "shard_size": IMAGENET_CACHE_SHARD_SIZE,
+            "version": IMAGENET_CACHE_VERSION,
+        }
+        cache_key = compute_cache_key(params)
+        dataset_cache_dir = os.path.join(
+            cache_dir, f"imagenet-mini-{self.subset_name}-{cache_key[:16]}"
+        )
+        if not os.path.exists(os.path.join(dataset_cache_dir, "metadata.json")):
+            os.makedirs(cache_dir, exist_ok=True)
+            build_imagenet_cache(
+                image_root=image_root,
+                cache_dir=dataset_cache_dir,
+                params=params,
+            )
+
+        return MemmapImageDataset(cache_dir=dataset_cache_dir)
+
 
 class DatasetIMDBFactory(DatasetFactory):
     """IMDB dataset factory class."""
@@ -82,13 +319,28 @@ class DatasetIMDBFactory(DatasetFactory):
         dataset_size: int,
         max_length: int,
         batch_size: int,
+        cache_dir: Optional[str] = None,
     ):
+        super().__init__()
         self.pretrained_model_name = pretrained_model_name
         self.dataset_size = dataset_size
         self.max_length = max_length
         self.batch_size = batch_size
+        self.cache_dir = cache_dir
+
+    def get_config(self) -> Dict[str, Union[str, int]]:
+        return {
+            "dataset": "imdb",
+            "pretrained_model_name": self.pretrained_model_name,
+            "dataset_size": self.dataset_size,
+            "max_length": self.max_length,
+            "batch_size": self.batch_size,
+            "cache_dir": str(self.cache_dir),
+        }
+
+    def create_dataset(self) -> torch.utils.data.Dataset:
+        from transformers import AutoTokenizer, GPT2Tokenizer, GPT2TokenizerFast
 
-    def get_dataset(self) -> torch.utils.data.Dataset:
         tokenizer = AutoTokenizer.from_pretrained(
             self.pretrained_model_name, model_max_length=self.max_length
         )
@@ -98,40 +350,102 @@ class DatasetIMDBFactory(DatasetFactory):
             tokenizer.pad_token_id = tokenizer.eos_token_id
             tokenizer.padding_side = "left"
 
-        dataset = load_dataset(path="imdb")
+        if self.cache_dir is None:
+            return create_tokenized_dataset(self.tokenize(tokenizer=tokenizer))
 
-        samples: List[BatchEncoding] = []
-        labels: List[torch.Tensor] = []
-        sample_batches = list(
-            chunked(
-                [
-                    d["text"]
-                    for index, d in enumerate(dataset["test"])
-                    if index < self.dataset_size
-                ],
-                self.batch_size,
-            )
+        params: Dict[str, Any] = {
+            "dataset": "imdb",
+            "split": "test",
+            "pretrained_model_name": self.pretrained_model_name,
+            "max_length": self.max_length,
+            "dataset_size": self.dataset_size,
+            "batch_size": self.batch_size,
+            "padding_side": tokenizer.padding_side,
+            "version": IMDB_CACHE_VERSION,
+        }
+        cache_key = compute_cache_key(params)
+        dataset_cache_dir = os.path.join(self.cache_dir, f"imdb-{cache_key[:16]}")
+        if not os.path.exists(os.path.join(dataset_cache_dir, "metadata.json")):
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_dir = f"{dataset_cache_dir}.tmp-{os.getpid()}"
+            os.makedirs(tmp_dir, exist_ok=True)
+            arrays = self.tokenize(tokenizer=tokenizer)
+            for array_name, array in arrays.items():
+                np.save(os.path.join(tmp_dir, f"{array_name}.npy"), array)
+            with open(
+                os.path.join(tmp_dir, "metadata.json"), "w", encoding="utf-8"
+            ) as file:
+                json.dump({**params, "arrays": list(arrays.keys())}, file, indent=4)
+            commit_cache_dir(tmp_dir, dataset_cache_dir)
+
+        with open(
+            os.path.join(dataset_cache_dir, "metadata.json"), "r", encoding="utf-8"
+        ) as file:
+            metadata = json.load(file)
+
+        return create_tokenized_dataset(
+            {
+                array_name: load_npy(
+                    os.path.join(dataset_cache_dir, f"{array_name}.npy")
+                )
+                for array_name in metadata["arrays"]
+            }
         )
-        label_batches = list(
-            chunked(
-                [
-                    d["label"]
-                    for index, d in enumerate(dataset["test"])
-                    if index < self.dataset_size
-                ],
-                self.batch_size,
-            )
+
+    def tokenize(
+        self,
+        tokenizer: "PreTrainedTokenizerBase",
+    ) -> Dict[str, np.ndarray]:
+        """Tokenize IMDB test samples in a single batched tokenizer call.
+
+        Every batch is padded to its longest sample, as when it is tokenized on its
+        own, and all batches of a field are concatenated into one flat array.
+
+        Args:
+            tokenizer: Tokenizer of the benchmarked model.
+
+        Returns:
+            Flat arrays of tokenized fields and labels with `batch_shapes` array of
+            (batch size, sequence length) of every batch.
+        """
+        from datasets import load_dataset
+
+        dataset = load_dataset(path="imdb", split="test")
+        dataset = dataset.select(range(min(self.dataset_size, len(dataset))))
+        encodings = tokenizer(
+            dataset["text"],
+            max_length=self.max_length,
+            truncation=True,
         )
 
-        for x_batch, y_batch in zip(sample_batches, label_batches):
-            batch_encoding_sample = tokenizer(
-                x_batch,
-                return_tensors="pt",
-                max_length=self.max_length,
-                truncation=True,
-                padding=True,
+        pad_values: Dict[str, int] = {
+            "input_ids": tokenizer.pad_token_id,
+            "token_type_ids": tokenizer.pad_token_type_id,
+            "attention_mask": 0,
+        }
+        fields: Dict[str, List[np.ndarray]] = {key: [] for key in encodings.keys()}
+        batch_shapes: List[Tuple[int, int]] = []
+        for batch_indices in chunked(range(len(dataset)), self.batch_size):
+            sequence_length = max(
+                len(encodings["input_ids"][index]) for index in batch_indices
             )
-            samples.append(batch_encoding_sample)
-            labels.append(torch.tensor(y_batch))  # pylint: disable = (no-member)
+            batch_shapes.append((len(batch_indices), sequence_length))
+            for key, values in encodings.items():
+                batch = np.full(
+                    (len(batch_indices), sequence_length),
+                    pad_values.get(key, 0),
+                    dtype=np.int64,
+                )
+                for row, index in enumerate(batch_indices):
+                    sequence = values[index]
+                    if tokenizer.padding_side == "left":
+                        batch[row, sequence_length - len(sequence) :] = sequence
+                    else:
+                        batch[row, : len(sequence)] = sequence
+                fields[key].append(batch.ravel())
 
-        return CustomDataset(data=samples, labels=labels)
+        return {
+            **{key: np.concatenate(batches) for key, batches in fields.items()},
+            "labels": np.asarray(dataset["label"], dtype=np.int64),
+            "batch_shapes": np.asarray(batch_shapes, dtype=np.int64).reshape(-1, 2),
+        }
@@ -0,0 +1,250 @@
+# pylint: disable = (missing-module-docstring)
+
+import math
+import os
+import time
+import uuid
+from statistics import NormalDist
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+
+# raw per-iteration measurements: wall time of a batch and number of its samples
+LATENCY_SAMPLES_DTYPE = np.dtype([("time_ns", np.int64), ("batch_size", np.int64)])
+LATENCY_PERCENTILES: Tuple[int, ...] = (50, 90, 95, 99)
+NS_IN_MS = 1e6
+# wall-clock budget in seconds of a run stopped by the confidence interval alone,
+# the interval of a noisy model may never reach the target
+DEFAULT_TIME_BUDGET = 60.0
+
+
+def create_latency_samples(
+    times_ns: np.ndarray,
+    batch_sizes: np.ndarray,
+) -> np.ndarray:
+    latency_samples = np.empty(len(times_ns), dtype=LATENCY_SAMPLES_DTYPE)
+    latency_samples["time_ns"] = times_ns
+    latency_samples["batch_size"] = batch_sizes
+    return latency_samples
+
+
+def bootstrap_means(
+    values: np.ndarray,
+    n_bootstrap: int = 1000,
+    seed: int = 0,
+) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    means = np.empty(n_bootstrap)
+    # resample in chunks to bound memory usage for long runs
+    chunk_size = max(1, min(n_bootstrap, 10_000_000 // max(1, len(values))))
+    for start in range(0, n_bootstrap, chunk_size):
+        end = min(start + chunk_size, n_bootstrap)
+        indices = rng.integers(0, len(values), size=(end - start, len(values)))
+        means[start:end] = values[indices].mean(axis=1)
+    return means
+
+
+def bootstrap_mean_ci(
+    values: np.ndarray,
+    confidence: float = 0.95,
+    n_bootstrap: int = 1000,
+    seed: int = 0,
+) -> Tuple[float, float]:
+    """Compute bootstrap percentile confidence interval of the mean.
+
+    Args:
+        values: Measured values.
+        confidence: Confidence level of the interval.
+        n_bootstrap: Number of bootstrap resamples.
+        seed: Seed of the random generator, fixed for reproducible results.
+
+    Returns:
+        Lower and upper bound of the confidence interval.
+    """
+    means = bootstrap_means(values, n_bootstrap=n_bootstrap, seed=seed)
+    alpha = (1.0 - confidence) / 2.0
+    low, high = np.quantile(means, [alpha, 1.0 - alpha])
+    return float(low), float(high)
+
+
+def bootstrap_relative_change_ci(
+    baseline: np.ndarray,
+    candidate: np.ndarray,
+    confidence: float = 0.95,
+    n_bootstrap: int = 1000,
+    seed: int = 0,
+) -> Tuple[float, float]:
+    """Compute bootstrap percentile confidence interval of relative change of the mean.
+
+    Both samples are resampled independently.
+
+    Args:
+        baseline: Values measured before the change.
+        candidate: Values measured after the change.
+        confidence: Confidence level of the interval.
+        n_bootstrap: Number of bootstrap resamples.
+        seed: Seed of the random generator, fixed for reproducible results.
+
+    Returns:
+        Lower and upper bound of the confidence interval of
+        `mean(candidate) / mean(baseline) - 1`.
+    """
+    baseline_means = bootstrap_means(baseline, n_bootstrap=n_bootstrap, seed=seed)
+    candidate_means = bootstrap_means(candidate, n_bootstrap=n_bootstrap, seed=seed + 1)
+    alpha = (1.0 - confidence) / 2.0
+    low, high = np.quantile(
+        candidate_means / baseline_means - 1.0, [alpha, 1.0 - alpha]
+    )
+    return float(low), float(high)
+
+
+class StoppingRule:
+    """Decides when the timed run has measured enough iterations.
+
+    The run stops when relative half-width of the confidence interval of the mean
+    latency drops below the target, or when the maximum number of iterations or the
+    wall-clock budget is reached, whichever comes first. The interval is the normal
+    approximation updated with running sums, so checking it after every iteration
+    costs a few arithmetic operations, unlike the bootstrap interval in the results.
+    """
+
+    def __init__(
+        self,
+        ci_target: Optional[float] = None,
+        min_iterations: int = 10,
+        max_iterations: Optional[int] = None,
+        time_budget: Optional[float] = None,
+        confidence: float = 0.95,
+    ):
+        """Create stopping rule of the timed run.
+
+        Args:
+            ci_target: Relative half-width of the confidence interval of the mean,
+                e.g. 0.01 for +-1%, not checked if not set.
+            min_iterations: Number of iterations measured before the interval is
+                checked.
+            max_iterations: Maximum number of iterations, unlimited if not set.
+            time_budget: Wall-clock budget of the run in seconds, unlimited if not set,
+                `DEFAULT_TIME_BUDGET` if only `ci_target` is set.
+            confidence: Confidence level of the interval.
+        """
+        self.ci_target = ci_target
+        self.min_iterations = max(2, min_iterations)
+        self.max_iterations = max_iterations
+        self.time_budget = time_budget
+        if ci_target is not None and max_iterations is None and time_budget is None:
+            self.time_budget = DEFAULT_TIME_BUDGET
+        self.z_score = NormalDist().inv_cdf((1.0 + confidence) / 2.0)
+        self.start()
+
+    def start(self) -> None:
+        self.start_time = time.perf_counter_ns()
+        self.n_iterations = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.stop_reason: Optional[str] = None
+
+    def get_relative_ci_half_width(self) -> float:
+        if self.n_iterations < 2 or self.total <= 0.0:
+            return math.inf
+
+        mean = self.total / self.n_iterations
+        variance = max(
+            0.0,
+            (self.total_squares - self.n_iterations * mean**2)
+            / (self.n_iterations - 1),
+        )
+        return self.z_score * math.sqrt(variance / self.n_iterations) / mean
+
+    def update(self, time_ns: int) -> bool:
+        """Record latency of an iteration.
+
+        Args:
+            time_ns: Latency of the iteration in nanoseconds.
+
+        Returns:
+            Whether the run should stop, the reason is kept in `stop_reason`.
+        """
+        self.n_iterations += 1
+        self.total += time_ns
+        self.total_squares += float(time_ns) ** 2
+
+        if (
+            self.ci_target is not None
+            and self.n_iterations >= self.min_iterations
+            and self.get_relative_ci_half_width() <= self.ci_target
+        ):
+            self.stop_reason = "ci_target"
+        elif (
+            self.max_iterations is not None and self.n_iterations >= self.max_iterations
+        ):
+            self.stop_reason = "max_iterations"
+        elif (
+            self.time_budget is not None
+            and time.perf_counter_ns() - self.start_time >= self.time_budget * 1e9
+        ):
+            self.stop_reason = "time_budget"
+        return self.stop_reason is not None
+
+    def get_results(self, decimals: int = 5) -> Dict[str, Union[float, str, None]]:
+        half_width = self.get_relative_ci_half_width()
+        return {
+            "ci_target": self.ci_target,
+            "max_iterations": self.max_iterations,
+            "time_budget": self.time_budget,
+            "stop_reason": self.stop_reason,
+            "relative_ci_half_width": (
+                round(half_width, decimals) if math.isfinite(half_width) else None
+            ),
+        }
+
+
+def compute_latency_statistics(
+    latency_samples: np.ndarray,
+    decimals: int = 5,
+) -> Dict[str, Union[float, int]]:
+    """Compute latency distribution statistics in milliseconds.
+
+    Args:
+        latency_samples: Per-iteration measurements of `LATENCY_SAMPLES_DTYPE` type.
+        decimals: Number of decimals of the reported values.
+
+    Returns:
+        Statistics of per-batch and per-sample latency.
+    """
+    batch_times = latency_samples["time_ns"] / NS_IN_MS
+    sample_times = batch_times / latency_samples["batch_size"]
+    statistics: Dict[str, float] = {}
+    for unit, times in (("batch", batch_times), ("sample", sample_times)):
+        statistics[f"mean_inference_time_per_{unit}"] = float(np.mean(times))
+        statistics[f"std_inference_time_per_{unit}"] = float(np.std(times))
+        for percentile in LATENCY_PERCENTILES:
+            statistics[f"p{percentile}_inference_time_per_{unit}"] = float(
+                np.percentile(times, percentile)
+            )
+        statistics[f"max_inference_time_per_{unit}"] = float(np.max(times))
+
+    ci_low, ci_high = bootstrap_mean_ci(batch_times)
+    statistics["mean_inference_time_per_batch_ci_low"] = ci_low
+    statistics["mean_inference_time_per_batch_ci_high"] = ci_high
+
+    return {
+        **{key: round(value, decimals) for key, value in statistics.items()},
+        "n_latency_samples": len(latency_samples),
+    }
+
+
+def save_latency_samples(
+    latency_samples: np.ndarray,
+    samples_dir: str,
+    prefix: str,
+) -> str:
+    os.makedirs(samples_dir, exist_ok=True)
+    # unique name, concurrent runs of the same configuration must not collide
+    path = os.path.join(samples_dir, f"{prefix}_{uuid.uuid4().hex}.npy")
+    np.save(path, latency_samples)
+    return path
+
+
+def load_latency_samples(path: str) -> np.ndarray:
+    return np.load(path)
@@ -1,35 +1,386 @@
 # pylint: disable = (missing-module-docstring)
 
-from nvitop import Device, ResourceMetricCollector
-
-initial_memory_used = None
-global_max_memory_used = 0.0
-
-# Record metrics to the logger in background every 5 seconds.
-# It will collect 5-second mean/min/max for each metric.
-def vram_monitor_factory(interval: float, device: str):
-    def on_collect(metrics):  # will be called periodically
-        global global_max_memory_used
-        global initial_memory_used
-        for k, v in metrics.items():
-            if "memory_used" in k and "max" in k and device in k:
-                max_memory_used = v
-                if initial_memory_used is None:
-                    initial_memory_used = max_memory_used
-                elif max_memory_used > global_max_memory_used:
-                    global_max_memory_used = max_memory_used
-        return True
-
-    ResourceMetricCollector(Device.cuda.all()).daemonize(
-        on_collect=on_collect,
-        interval=interval,
-    )
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import torch
+
+from src.memory_sampler import MemorySampler, create_memory_reader
+
+KB_IN_MB = 1024
+BYTES_IN_MB = 1024 * 1024
+PROC_STATUS_PATH = "/proc/self/status"
+PROC_SMAPS_ROLLUP_PATH = "/proc/self/smaps_rollup"
+PROC_CLEAR_REFS_PATH = "/proc/self/clear_refs"
+# memory time series of a benchmark, time is relative to the start of the monitor,
+# samples taken between phases have an empty phase
+MEMORY_SAMPLES_DTYPE = np.dtype(
+    [("time_ns", np.int64), ("memory_used", np.int64), ("phase", "U24")]
+)
+
+
+class MemoryMonitor(ABC):
+    """Measures peak memory usage of a benchmark separately for each of its phases.
+
+    Peak is reset when a phase starts and read when it ends, phases must not overlap.
+    Nothing is measured inside of a phase by the monitor itself, so it does not slow
+    down the timed code. Memory time series is collected by an optional sampler
+    running in a separate process, its samples are read only between phases.
+    """
+
+    name = ""
+
+    def __init__(self, sampler: Optional[MemorySampler] = None):
+        self.phase_peaks: Dict[str, float] = {}
+        self.sampler = sampler
+        self.start_time = time.monotonic_ns()
+        self.samples: List[np.ndarray] = []
+
+    def reset(self) -> None:
+        self.phase_peaks = {}
+        # samples taken before the reset belong to the previous run
+        self.collect_samples("")
+        self.samples = []
+
+    def close(self) -> None:
+        if self.sampler is not None:
+            self.sampler.close()
+
+    def collect_samples(self, phase: str) -> None:
+        if self.sampler is None:
+            return
+
+        ring_samples = self.sampler.read()
+        samples = np.empty(len(ring_samples), dtype=MEMORY_SAMPLES_DTYPE)
+        samples["time_ns"] = ring_samples["time_ns"] - self.start_time
+        samples["memory_used"] = ring_samples["memory_used"]
+        samples["phase"] = phase
+        self.samples.append(samples)
+
+    def get_samples(self) -> Optional[np.ndarray]:
+        """Get memory time series of the current run.
+
+        Returns:
+            Samples of `MEMORY_SAMPLES_DTYPE`, `None` if memory is not sampled.
+        """
+        if self.sampler is None:
+            return None
+
+        self.collect_samples("")
+        return np.concatenate([np.empty(0, dtype=MEMORY_SAMPLES_DTYPE), *self.samples])
+
+    @abstractmethod
+    def reset_peak(self) -> None:
+        ...
+
+    @abstractmethod
+    def get_peak(self) -> float:
+        """Get peak memory usage in MB since the last reset of the peak."""
+
+    def start_phase(self, name: str) -> None:  # pylint: disable = (unused-argument)
+        self.collect_samples("")
+        self.reset_peak()
+
+    def end_phase(self, name: str) -> None:
+        self.collect_samples(name)
+        # peak of a phase entered many times is the highest one
+        self.phase_peaks[name] = max(self.phase_peaks.get(name, 0.0), self.get_peak())
+
+    def get_max_memory_usage(self) -> Optional[float]:
+        if not self.phase_peaks:
+            return None
+        return round(max(self.phase_peaks.values()), 3)
+
+    def get_results(self, phases: Sequence[str], decimals: int = 3) -> Dict[str, Any]:
+        """Get peak memory usage of every phase in MB as result fields.
+
+        Args:
+            phases: Names of all phases of a benchmark.
+            decimals: Number of decimals of the reported values.
+
+        Returns:
+            Peak memory usage of every phase, `None` if the benchmark has no such
+            phase, and name of the monitor.
+        """
+        results: Dict[str, Any] = {"memory_monitor": self.name}
+        for name in phases:
+            results[f"{name}_peak_memory"] = (
+                round(self.phase_peaks[name], decimals)
+                if name in self.phase_peaks
+                else None
+            )
+        if self.sampler is not None:
+            results["memory_sampling_interval"] = self.sampler.interval
+            results["memory_samples_dropped"] = self.sampler.dropped_count
+        return results
+
+
+def read_proc_status() -> Dict[str, int]:
+    # memory fields of the process in kB, e.g. VmRSS and VmHWM
+    fields: Dict[str, int] = {}
+    with open(PROC_STATUS_PATH, encoding="utf-8") as status_file:
+        for line in status_file:
+            key, _, value = line.partition(":")
+            if key.startswith("Vm"):
+                fields[key] = int(value.split()[0])
+    return fields
+
+
+def read_uss() -> Optional[int]:
+    # unique set size in kB, memory which is freed when the process exits,
+    # smaps_rollup is available since Linux 4.14
+    if not os.path.exists(PROC_SMAPS_ROLLUP_PATH):
+        return None
+
+    uss = 0
+    with open(PROC_SMAPS_ROLLUP_PATH, encoding="utf-8") as smaps_file:
+        for line in smaps_file:
+            key, _, value = line.partition(":")
+            if key in ("Private_Clean", "Private_Dirty"):
+                uss += int(value.split()[0])
+    return uss
+
+
+def reset_peak_rss() -> bool:
+    # writing 5 to clear_refs resets VmHWM to the current RSS, since Linux 4.0
+    try:
+        with open(PROC_CLEAR_REFS_PATH, "w", encoding="utf-8") as clear_refs_file:
+            clear_refs_file.write("5")
+    except OSError:
+        return False
+    return True
+
+
+class CPUMemoryMonitor(MemoryMonitor):
+    """Measures resident memory of the benchmark process from /proc."""
 
+    name = "cpu"
+
+    def __init__(
+        self,
+        track_torch_allocator: bool = False,
+        sampler: Optional[MemorySampler] = None,
+    ):
+        super().__init__(sampler)
+        if not os.path.exists(PROC_STATUS_PATH):
+            raise RuntimeError(
+                "CPU memory monitor reads /proc filesystem, available only on Linux."
+            )
+        # torch profiler records allocations of every operator, it slows down the
+        # phase, so it is never used in the timed inference
+        self.track_torch_allocator = track_torch_allocator
+        self.peak_reset_supported = True
+        self.phase_uss: Dict[str, float] = {}
+        self.phase_torch_allocated: Dict[str, float] = {}
+        self.profiler: Optional[torch.profiler.profile] = None
+
+    def reset(self) -> None:
+        super().reset()
+        self.phase_uss = {}
+        self.phase_torch_allocated = {}
+
+    def reset_peak(self) -> None:
+        # without reset VmHWM is the peak of the whole process lifetime
+        self.peak_reset_supported = reset_peak_rss() and self.peak_reset_supported
+
+    def get_peak(self) -> float:
+        return read_proc_status()["VmHWM"] / KB_IN_MB
+
+    def start_phase(self, name: str) -> None:
+        super().start_phase(name)
+        if self.track_torch_allocator and name != "inference":
+            self.profiler = torch.profiler.profile(
+                activities=[torch.profiler.ProfilerActivity.CPU], profile_memory=True
+            )
+            self.profiler.start()
+
+    def end_phase(self, name: str) -> None:
+        if self.profiler is not None:
+            self.profiler.stop()
+            allocated_bytes = sum(
+                max(0, event.self_cpu_memory_usage) for event in self.profiler.events()
+            )
+            self.phase_torch_allocated[name] = (
+                self.phase_torch_allocated.get(name, 0.0)
+                + allocated_bytes / BYTES_IN_MB
+            )
+            self.profiler = None
+
+        super().end_phase(name)
+        uss = read_uss()
+        if uss is not None:
+            # memory retained by the process at the end of the phase
+            self.phase_uss[name] = uss / KB_IN_MB
+
+    def get_results(self, phases: Sequence[str], decimals: int = 3) -> Dict[str, Any]:
+        results = super().get_results(phases, decimals)
+        for name in phases:
+            results[f"{name}_uss"] = (
+                round(self.phase_uss[name], decimals)
+                if name in self.phase_uss
+                else None
+            )
+            if self.track_torch_allocator:
+                results[f"{name}_torch_allocated"] = (
+                    round(self.phase_torch_allocated[name], decimals)
+                    if name in self.phase_torch_allocated
+                    else None
+                )
+        results["peak_memory_reset"] = self.peak_reset_supported
+        return results
+
+
+class GPUMemoryMonitor(MemoryMonitor):
+    """Measures memory of a CUDA device allocated by torch.
+
+    Memory allocated outside of torch, e.g. by TensorRT engines or ONNX Runtime, is
+    visible only in `max_memory_usage`, which is the peak of sampled memory used on
+    the device. Without the sampler, memory used on the device is read between
+    phases, which misses short peaks inside of a phase.
+    """
+
+    name = "gpu"
+
+    def __init__(
+        self,
+        device: torch.device,  # pylint: disable = (no-member)
+        sampler: Optional[MemorySampler] = None,
+    ):
+        super().__init__(sampler)
+        self.device = device
+        self.baseline_memory_used: Optional[int] = None
+        self.read_memory_used: Optional[Callable[[], int]] = None
+        self.max_memory_used: Optional[int] = None
+        if sampler is None:
+            self.read_memory_used = create_memory_reader("gpu", device.index or 0)
+            self.baseline_memory_used = self.read_memory_used()
+
+    def reset(self) -> None:
+        super().reset()
+        self.max_memory_used = None
+
+    def record_memory_used(self) -> None:
+        if self.read_memory_used is None:
+            return
+
+        memory_used = self.read_memory_used()
+        if self.max_memory_used is None or memory_used > self.max_memory_used:
+            self.max_memory_used = memory_used
+
+    def start_phase(self, name: str) -> None:
+        super().start_phase(name)
+        self.record_memory_used()
+
+    def end_phase(self, name: str) -> None:
+        self.record_memory_used()
+        super().end_phase(name)
+
+    def reset_peak(self) -> None:
+        torch.cuda.reset_peak_memory_stats(self.device)
+
+    def get_peak(self) -> float:
+        return torch.cuda.max_memory_allocated(self.device) / BYTES_IN_MB
+
+    def get_max_memory_usage(self) -> Optional[float]:
+        samples = self.get_samples()
+        if samples is None or len(samples) == 0:
+            if self.max_memory_used is None or self.baseline_memory_used is None:
+                return super().get_max_memory_usage()
+            return round(
+                (self.max_memory_used - self.baseline_memory_used) / BYTES_IN_MB, 3
+            )
+
+        # memory used on the device by the run, other processes use the baseline
+        if self.baseline_memory_used is None:
+            self.baseline_memory_used = int(samples["memory_used"][0])
+        return round(
+            (samples["memory_used"].max() - self.baseline_memory_used) / BYTES_IN_MB, 3
+        )
+
+
+MEMORY_MONITORS = ("auto", "cpu", "gpu", "none")
+
+
+def create_memory_monitor(
+    monitor_type: str,
+    device: torch.device,  # pylint: disable = (no-member)
+    use_cuda: bool = False,
+    track_torch_allocator: bool = False,
+    sampling_interval: Optional[float] = None,
+) -> Optional[MemoryMonitor]:
+    """Create memory monitor of a benchmark.
+
+    Args:
+        monitor_type: One of `MEMORY_MONITORS`, `auto` selects the GPU monitor if the
+            model is run on CUDA device.
+        device: Device of the benchmarked model.
+        use_cuda: Whether the model is run on CUDA regardless of the device, e.g. by
+            ONNX Runtime.
+        track_torch_allocator: Whether CPU monitor records memory allocated by torch
+            operators.
+        sampling_interval: Interval in milliseconds of the memory sampler, resident
+            memory of the process is sampled by CPU monitor and memory used on the
+            device by GPU monitor. Disabled if not set.
+
+    Returns:
+        Memory monitor, `None` if memory is not monitored. It has to be closed to
+        stop its sampler.
+    """
+    if monitor_type not in MEMORY_MONITORS:
+        raise RuntimeError(
+            f"Unknown memory monitor {monitor_type}, known monitors: {MEMORY_MONITORS}"
+        )
+
+    if monitor_type == "auto":
+        monitor_type = "gpu" if "cuda" in device.type or use_cuda else "cpu"
+    if monitor_type == "gpu":
+        if not torch.cuda.is_available():
+            raise RuntimeError(
+                "No CUDA device detected, required by GPU memory monitor."
+            )
+        cuda_device = (
+            device
+            if "cuda" in device.type
+            else torch.device("cuda:0")  # pylint: disable = (no-member)
+        )
+        return GPUMemoryMonitor(
+            cuda_device,
+            sampler=start_memory_sampler(
+                "gpu", cuda_device.index or 0, sampling_interval
+            ),
+        )
+    if monitor_type == "cpu":
+        return CPUMemoryMonitor(
+            track_torch_allocator=track_torch_allocator,
+            sampler=start_memory_sampler("process", os.getpid(), sampling_interval),
+        )
+    return None
+
+
+def start_memory_sampler(
+    source: str, target: int, sampling_interval: Optional[float]
+) -> Optional[MemorySampler]:
+    if sampling_interval is None:
+        return None
+
+    sampler = MemorySampler(
+        source=source, target=target, interval=sampling_interval / 1e3
+    )
+    sampler.start()
+    return sampler
 
-def get_memory_info() -> float:
-    value = global_max_memory_used
-    if initial_memory_used is not None:
-        value -= initial_memory_used
 
-    # print(f"max_memory_used: \t {value:.3f} MB")
-    return value
+def save_memory_samples(
+    memory_samples: np.ndarray,
+    samples_dir: str,
+    prefix: str,
+) -> str:
+    os.makedirs(samples_dir, exist_ok=True)
+    # unique name, concurrent runs of the same configuration must not collide
+    path = os.path.join(samples_dir, f"{prefix}_memory_{uuid.uuid4().hex}.npy")
+    np.save(path, memory_samples)
+    return path
@@ -0,0 +1,196 @@
+# pylint: disable = (missing-module-docstring)
+
+import os
+import subprocess
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+# samples written by the sampler process, time is read from the monotonic clock,
+# which is shared by all processes, memory is in bytes
+RING_SAMPLE_DTYPE = np.dtype([("time_ns", np.int64), ("memory_used", np.int64)])
+# number of written samples and stop flag precede the samples
+RING_HEADER_SIZE = 2
+RING_CAPACITY = 1 << 20
+SAMPLE_SOURCES = ("process", "gpu")
+
+
+def create_ring_views(
+    buffer: memoryview, capacity: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    header = np.ndarray((RING_HEADER_SIZE,), dtype=np.int64, buffer=buffer)
+    ring = np.ndarray(
+        (capacity,),
+        dtype=RING_SAMPLE_DTYPE,
+        buffer=buffer,
+        offset=header.nbytes,
+    )
+    return header, ring
+
+
+class MemorySampler:
+    """Samples memory in a separate process into a ring buffer in shared memory.
+
+    The sampler process is the only writer of the ring buffer and the benchmark
+    process the only reader, the number of written samples is published after the
+    sample, so neither of them takes a lock. The benchmark process reads the buffer
+    only between phases, the timed code shares neither the GIL nor a lock with the
+    sampler.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        target: int,
+        interval: float,
+        capacity: int = RING_CAPACITY,
+    ):
+        """Create memory sampler, it is started by `start`.
+
+        Args:
+            source: `process` samples resident memory of a process, `gpu` memory
+                used on a CUDA device.
+            target: PID of the sampled process or index of the sampled device.
+            interval: Sampling interval in seconds.
+            capacity: Number of samples kept in the ring buffer, older samples are
+                overwritten if they are not read in time.
+        """
+        if source not in SAMPLE_SOURCES:
+            raise RuntimeError(
+                f"Unknown sample source {source}, known sources: {SAMPLE_SOURCES}"
+            )
+        self.source = source
+        self.target = target
+        self.interval = interval
+        self.capacity = capacity
+        self.read_count = 0
+        self.dropped_count = 0
+        self.shared_memory: Optional[shared_memory.SharedMemory] = None
+        self.header: Optional[np.ndarray] = None
+        self.ring: Optional[np.ndarray] = None
+        self.process: Optional[subprocess.Popen] = None
+
+    def start(self, timeout: float = 10.0) -> None:
+        self.shared_memory = shared_memory.SharedMemory(
+            create=True,
+            size=RING_HEADER_SIZE * 8 + self.capacity * RING_SAMPLE_DTYPE.itemsize,
+        )
+        self.header, self.ring = create_ring_views(
+            self.shared_memory.buf, self.capacity
+        )
+        self.header[:] = 0
+        # fresh interpreter imports only this module, not torch, the process runs
+        # until `close`, so it is not managed by a context
+        self.process = subprocess.Popen(  # pylint: disable = (consider-using-with)
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                self.shared_memory.name,
+                self.source,
+                str(self.target),
+                str(self.interval),
+                str(self.capacity),
+            ]
+        )
+        # first sample is the baseline of the measurement
+        deadline = time.monotonic() + timeout
+        while self.header[0] == 0:
+            if self.process.poll() is not None or time.monotonic() > deadline:
+                self.close()
+                raise RuntimeError(f"Memory sampler of {self.source} failed to start.")
+            time.sleep(1e-3)
+
+    def read(self) -> np.ndarray:
+        """Read samples written since the previous read.
+
+        Returns:
+            Samples of `RING_SAMPLE_DTYPE` in the order they were taken.
+        """
+        if self.shared_memory is None:
+            return np.empty(0, dtype=RING_SAMPLE_DTYPE)
+
+        write_count = int(self.header[0])
+        start = max(self.read_count, write_count - self.capacity)
+        indices = np.arange(start, write_count) % self.capacity
+        samples = self.ring[indices].copy()
+        # samples overwritten by the sampler during the copy are dropped
+        overwritten = int(self.header[0]) - self.capacity - start
+        if overwritten > 0:
+            samples = samples[overwritten:]
+            start += overwritten
+        self.dropped_count += start - self.read_count
+        self.read_count = write_count
+        return samples
+
+    def close(self) -> None:
+        if self.process is not None:
+            self.header[1] = 1
+            try:
+                self.process.wait(timeout=10.0)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+        if self.shared_memory is not None:
+            # views must be released before the shared memory is closed
+            self.header = None
+            self.ring = None
+            self.shared_memory.close()
+            self.shared_memory.unlink()
+            self.shared_memory = None
+
+
+def create_memory_reader(source: str, target: int) -> Callable[[], int]:
+    if source == "gpu":
+        # nvitop is imported only in the sampler process of GPU memory
+        from nvitop import Device  # pylint: disable = (import-outside-toplevel)
+
+        device = Device(target)
+        return device.memory_used
+
+    # resident set size is the second field of statm, in pages
+    statm_fd = os.open(f"/proc/{target}/statm", os.O_RDONLY)
+    page_size = os.sysconf("SC_PAGE_SIZE")
+
+    def read_resident_memory() -> int:
+        return int(os.pread(statm_fd, 256, 0).split()[1]) * page_size
+
+    return read_resident_memory
+
+
+def run_sampler(
+    shared_memory_name: str, source: str, target: int, interval: float, capacity: int
+) -> None:
+    buffer = shared_memory.SharedMemory(name=shared_memory_name)
+    # the buffer is owned and unlinked by the benchmark process
+    resource_tracker.unregister(
+        buffer._name, "shared_memory"  # pylint: disable = (protected-access)
+    )
+    header, ring = create_ring_views(buffer.buf, capacity)
+    read_memory = create_memory_reader(source, target)
+    parent_pid = os.getppid()
+
+    write_count = 0
+    # stop if the benchmark process exits without stopping the sampler
+    while header[1] == 0 and os.getppid() == parent_pid:
+        ring[write_count % capacity] = (time.monotonic_ns(), read_memory())
+        write_count += 1
+        # sample is written before it is published
+        header[0] = write_count
+        time.sleep(interval)
+
+    del header, ring
+    buffer.close()
+
+
+if __name__ == "__main__":
+    run_sampler(
+        shared_memory_name=sys.argv[1],
+        source=sys.argv[2],
+        target=int(sys.argv[3]),
+        interval=float(sys.argv[4]),
+        capacity=int(sys.argv[5]),
+    )
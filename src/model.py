@@ -1,12 +1,9 @@
 # pylint: disable = (missing-module-docstring)
 
 import torch
-from transformers import (
-    AutoTokenizer,
-    BertForSequenceClassification,
-    GPTNeoForCausalLM,
-    T5ForConditionalGeneration,
-)
+
+# transformers is imported by language model wrappers only, it is slow to import
+# pylint: disable = (import-outside-toplevel)
 
 
 class CustomFCN(torch.nn.Module):
@@ -176,6 +173,8 @@ class Bert(torch.nn.Module):
     """BERT wrapper."""
 
     def __init__(self, model_name: str = "textattack/bert-base-uncased-imdb"):
+        from transformers import BertForSequenceClassification
+
         super().__init__()
         self.model = BertForSequenceClassification.from_pretrained(
             model_name, torchscript=True
@@ -216,6 +215,8 @@ class T5(torch.nn.Module):
         min_length: int = 100,
         num_beams: int = 4,
     ):
+        from transformers import T5ForConditionalGeneration
+
         super().__init__()
         self.model_name = model_name
         self.max_length = max_length
@@ -259,6 +260,8 @@ class GPTNeo(torch.nn.Module):
         min_length: int = 100,
         num_beams: int = 4,
     ):
+        from transformers import AutoTokenizer, GPTNeoForCausalLM
+
         super().__init__()
         self.model_name = model_name
         self.max_length = max_length
@@ -1,6 +1,10 @@
 # pylint: disable = (missing-module-docstring)
 
+import copy
+import hashlib
 import os
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple, Union
 
 import numpy as np
 import torch
@@ -15,55 +19,188 @@ from torchvision.models import (
     vit_b_16,
 )
 
+from src.cache_utils import ArtifactCache, compute_cache_key
 from src.model import T5, Bert, CustomCNN, CustomFCN, CustomLSTM, GPTNeo
 
+InputSpec = Dict[str, Tuple[Optional[int], ...]]
 
-def get_model_name(
-    model_name: str,
-    device: torch.device,  # pylint: disable = (no-member)
-    batch_size: int,
-) -> str:
-    model = load_model(
-        model_name=model_name,
-        device=device,
-        batch_size=batch_size,
-    )
-    return model.__class__.__name__
+IMAGE_INPUT_SPEC: InputSpec = {"sample": (3, 224, 224)}
+# sequence length depends on the tokenizer settings of the dataset
+TEXT_CLASSIFICATION_INPUT_SPEC: InputSpec = {
+    "input_ids": (None,),
+    "token_type_ids": (None,),
+    "attention_mask": (None,),
+}
+TEXT_GENERATION_INPUT_SPEC: InputSpec = {
+    "input_ids": (None,),
+    "attention_mask": (None,),
+}
 
 
-def load_model(
-    model_name: str,
-    device: torch.device,  # pylint: disable = (no-member)
-    batch_size: int,
-) -> torch.nn.Module:
-    if model_name == "swin_t":
-        model = swin_t(weights=Swin_T_Weights.IMAGENET1K_V1)
-    elif model_name == "vit":
-        model = vit_b_16(weights=ViT_B_16_Weights.IMAGENET1K_V1)
-    elif model_name == "resnet":
-        model = resnet18(weights=ResNet18_Weights.IMAGENET1K_V1)
-    elif model_name == "mobilenet":
-        model = mobilenet_v3_large(weights=MobileNet_V3_Large_Weights.IMAGENET1K_V1)
-    elif model_name == "fcn":
-        model = CustomFCN(input_size=3 * 224 * 224, hidden_size=224, num_classes=1000)
-    elif model_name == "cnn":
-        model = CustomCNN(num_classes=1000)
-    elif model_name == "rnn":
-        model = CustomLSTM(
+class ModelSpec:
+    """Registry entry with metadata of a model, available without building it."""
+
+    def __init__(
+        self,
+        class_name: str,
+        task: str,
+        input_spec: InputSpec,
+        builder: Callable[[torch.device, int], torch.nn.Module],
+    ):
+        self.class_name = class_name
+        self.task = task
+        # input names and their shapes without the batch dimension
+        self.input_spec = input_spec
+        self.builder = builder
+
+    @property
+    def is_nlg(self) -> bool:
+        return self.task == "text_generation"
+
+
+MODEL_REGISTRY: Dict[str, ModelSpec] = {
+    "swin_t": ModelSpec(
+        class_name="SwinTransformer",
+        task="image_classification",
+        input_spec=IMAGE_INPUT_SPEC,
+        builder=lambda device, batch_size: swin_t(weights=Swin_T_Weights.IMAGENET1K_V1),
+    ),
+    "vit": ModelSpec(
+        class_name="VisionTransformer",
+        task="image_classification",
+        input_spec=IMAGE_INPUT_SPEC,
+        builder=lambda device, batch_size: vit_b_16(
+            weights=ViT_B_16_Weights.IMAGENET1K_V1
+        ),
+    ),
+    "resnet": ModelSpec(
+        class_name="ResNet",
+        task="image_classification",
+        input_spec=IMAGE_INPUT_SPEC,
+        builder=lambda device, batch_size: resnet18(
+            weights=ResNet18_Weights.IMAGENET1K_V1
+        ),
+    ),
+    "mobilenet": ModelSpec(
+        class_name="MobileNetV3",
+        task="image_classification",
+        input_spec=IMAGE_INPUT_SPEC,
+        builder=lambda device, batch_size: mobilenet_v3_large(
+            weights=MobileNet_V3_Large_Weights.IMAGENET1K_V1
+        ),
+    ),
+    "fcn": ModelSpec(
+        class_name=CustomFCN.__name__,
+        task="image_classification",
+        input_spec=IMAGE_INPUT_SPEC,
+        builder=lambda device, batch_size: CustomFCN(
+            input_size=3 * 224 * 224, hidden_size=224, num_classes=1000
+        ),
+    ),
+    "cnn": ModelSpec(
+        class_name=CustomCNN.__name__,
+        task="image_classification",
+        input_spec=IMAGE_INPUT_SPEC,
+        builder=lambda device, batch_size: CustomCNN(num_classes=1000),
+    ),
+    "rnn": ModelSpec(
+        class_name=CustomLSTM.__name__,
+        task="image_classification",
+        input_spec=IMAGE_INPUT_SPEC,
+        builder=lambda device, batch_size: CustomLSTM(
             input_size=224,
             hidden_size=100,
             layer_size=100,
             num_classes=1000,
             batch_size=batch_size,
             device=device,
+        ),
+    ),
+    "bert": ModelSpec(
+        class_name=Bert.__name__,
+        task="text_classification",
+        input_spec=TEXT_CLASSIFICATION_INPUT_SPEC,
+        builder=lambda device, batch_size: Bert(),
+    ),
+    "t5": ModelSpec(
+        class_name=T5.__name__,
+        task="text_generation",
+        input_spec=TEXT_GENERATION_INPUT_SPEC,
+        builder=lambda device, batch_size: T5(),
+    ),
+    "gptneo": ModelSpec(
+        class_name=GPTNeo.__name__,
+        task="text_generation",
+        input_spec=TEXT_GENERATION_INPUT_SPEC,
+        builder=lambda device, batch_size: GPTNeo(),
+    ),
+}
+
+# models built by `load_model`, the least recently used ones are dropped first
+_model_cache: "OrderedDict[Tuple[str, str, int], torch.nn.Module]" = OrderedDict()
+_model_cache_max_size: int = 0
+
+
+def enable_model_cache(enabled: bool = True, max_size: int = 2) -> None:
+    """Reuse models built by `load_model`, e.g. in a sweep.
+
+    Args:
+        enabled: Whether models are cached.
+        max_size: Maximum number of cached models, every cached model is kept in
+            memory next to the benchmarked copy.
+    """
+    global _model_cache_max_size
+    _model_cache_max_size = max_size if enabled else 0
+    while len(_model_cache) > _model_cache_max_size:
+        _model_cache.popitem(last=False)
+
+
+def clear_model_cache() -> None:
+    _model_cache.clear()
+
+
+def get_model_spec(model_name: str) -> ModelSpec:
+    if model_name not in MODEL_REGISTRY:
+        raise RuntimeError(
+            f"Unknown model {model_name}, known models: {list(MODEL_REGISTRY)}"
         )
-    elif model_name == "bert":
-        model = Bert()
-    elif model_name == "t5":
-        model = T5()
-    elif model_name == "gptneo":
-        model = GPTNeo()
 
+    return MODEL_REGISTRY[model_name]
+
+
+def get_model_name(model_name: str) -> str:
+    return get_model_spec(model_name).class_name
+
+
+def load_model(
+    model_name: str,
+    device: torch.device,  # pylint: disable = (no-member)
+    batch_size: int,
+) -> torch.nn.Module:
+    if _model_cache_max_size <= 0:
+        return build_model(model_name=model_name, device=device, batch_size=batch_size)
+
+    key = (model_name, str(device), batch_size)
+    if key in _model_cache:
+        _model_cache.move_to_end(key)
+    else:
+        _model_cache[key] = build_model(
+            model_name=model_name, device=device, batch_size=batch_size
+        )
+        if len(_model_cache) > _model_cache_max_size:
+            _model_cache.popitem(last=False)
+
+    # benchmarks modify models in place (pruning, quantization, moving to device),
+    # so every caller gets its own copy of the cached model
+    return copy.deepcopy(_model_cache[key])
+
+
+def build_model(
+    model_name: str,
+    device: torch.device,  # pylint: disable = (no-member)
+    batch_size: int,
+) -> torch.nn.Module:
+    model = get_model_spec(model_name).builder(device, batch_size)
     model.eval()
     return model
 
@@ -90,28 +227,126 @@ def save_torchscript_model(
 def load_torchscript_model(
     model_torchscript_path: str,
     device: torch.device,  # pylint: disable = (no-member)
+    optimize: bool = True,
+    cache_frozen: bool = False,
+) -> torch.ScriptModule:  # pylint: disable = (no-member)
+    """Load TorchScript model in eval mode.
+
+    Args:
+        model_torchscript_path: Path of saved TorchScript model.
+        device: Device the model is loaded to.
+        optimize: Whether to apply `torch.jit.optimize_for_inference`.
+        cache_frozen: Whether to cache the frozen model next to the saved one. Only
+            freezing is cached, modules optimized for inference hold prepacked
+            weights, which can not be serialized.
+
+    Returns:
+        Loaded model.
+    """
+    if not cache_frozen:
+        model = torch.jit.load(model_torchscript_path, map_location=device).eval()
+    else:
+        cache_key = compute_cache_key(
+            {
+                "model": os.path.basename(model_torchscript_path),
+                "device": str(device),
+                "torch_version": torch.__version__,
+            }
+        )
+        cache = ArtifactCache(cache_dir=os.path.dirname(model_torchscript_path))
+        model_name = os.path.splitext(os.path.basename(model_torchscript_path))[0]
+        cache_entry = f"{model_name}-frozen-{cache_key[:16]}"
+        frozen_model_path = cache.lookup(key=cache_entry, suffix=".pth")
+        if frozen_model_path is None:
+            frozen_model_path = cache.store(
+                key=cache_entry,
+                suffix=".pth",
+                write_artifact=lambda path: torch.jit.save(
+                    torch.jit.freeze(
+                        torch.jit.load(
+                            model_torchscript_path, map_location=device
+                        ).eval()
+                    ),
+                    path,
+                ),
+            )
+        model = torch.jit.load(frozen_model_path, map_location=device)
+
+    if optimize:
+        model = optimize_torchscript_model(model)
+    return model
+
+
+def optimize_torchscript_model(
+    model: torch.ScriptModule,  # pylint: disable = (no-member)
 ) -> torch.ScriptModule:  # pylint: disable = (no-member)
-    model = torch.jit.load(model_torchscript_path, map_location=device).eval()
     # essential line
     # https://pytorch.org/docs/stable/generated/torch.jit.optimize_for_inference.html#torch.jit.optimize_for_inference
-    model = torch.jit.optimize_for_inference(model)
-    return model
+    return torch.jit.optimize_for_inference(model)
 
 
 def save_torchscript(
     model_name: str,
     device: torch.device,  # pylint: disable = (no-member)
     batch_size: int,
-    model_torchscript_path: str,
+    model_dir: str,
     example_inputs=None,
-) -> None:
-    model = load_model(model_name=model_name, device=device, batch_size=batch_size)
-    save_torchscript_model(
-        model=model,
-        model_torchscript_path=model_torchscript_path,
-        example_inputs=example_inputs,
+) -> str:
+    """Save TorchScript model in a cache shared by all runs.
+
+    Models are traced if example inputs are given and scripted otherwise. Cached
+    models are keyed by the model name, batch size, shapes of example inputs, mode
+    and torch version, so a cache hit neither builds nor converts the model.
+
+    Args:
+        model_name: Name of the model.
+        device: Device the model is converted on.
+        batch_size: Batch size.
+        model_dir: Directory of cached TorchScript models.
+        example_inputs: Inputs used to trace the model.
+
+    Returns:
+        Path of the saved TorchScript model.
+    """
+    mode = "script" if example_inputs is None else "trace"
+    cache_key = compute_cache_key(
+        {
+            "model_name": model_name,
+            "batch_size": batch_size,
+            "input_shapes": [list(item.shape) for item in example_inputs or []],
+            "mode": mode,
+            "device": str(device),
+            "torch_version": torch.__version__,
+        }
     )
-    del model
+    cache = ArtifactCache(cache_dir=model_dir)
+    cache_entry = f"{model_name}-{mode}-{cache_key[:16]}"
+    model_torchscript_path = cache.lookup(key=cache_entry, suffix=".pth")
+    if model_torchscript_path is not None:
+        return model_torchscript_path
+
+    def build_and_save(path: str) -> None:
+        model = load_model(model_name=model_name, device=device, batch_size=batch_size)
+        save_torchscript_model(
+            model=model,
+            model_torchscript_path=path,
+            example_inputs=example_inputs,
+        )
+
+    return cache.store(key=cache_entry, suffix=".pth", write_artifact=build_and_save)
+
+
+def compute_weights_hash(
+    model: Union[torch.nn.Module, torch.ScriptModule],  # pylint: disable = (no-member)
+) -> str:
+    weights_hash = hashlib.sha256()
+    for name, tensor in model.state_dict().items():
+        weights_hash.update(name.encode("utf-8"))
+        weights_hash.update(
+            tensor.detach().cpu().contiguous().reshape(-1).view(torch.uint8).numpy()
+        )
+
+    return weights_hash.hexdigest()
 
 
 def to_numpy(tensor: torch.Tensor) -> np.ndarray:
@@ -0,0 +1,299 @@
+# pylint: disable = (missing-module-docstring)
+
+import os
+import platform
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import onnx
+import onnxruntime as onnxrt
+import torch
+from onnxruntime.quantization import (
+    CalibrationDataReader,
+    CalibrationMethod,
+    QuantFormat,
+    QuantType,
+    quantize_static,
+)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+from src.cache_utils import ArtifactCache, compute_cache_key
+
+TORCH_TO_NUMPY_DTYPE = {
+    torch.float32: np.float32,  # pylint: disable = (no-member)
+    torch.float16: np.float16,  # pylint: disable = (no-member)
+    torch.int64: np.int64,  # pylint: disable = (no-member)
+    torch.int32: np.int32,  # pylint: disable = (no-member)
+}
+ONNX_TO_TORCH_DTYPE = {
+    "tensor(float)": torch.float32,  # pylint: disable = (no-member)
+    "tensor(float16)": torch.float16,  # pylint: disable = (no-member)
+    "tensor(int64)": torch.int64,  # pylint: disable = (no-member)
+    "tensor(int32)": torch.int32,  # pylint: disable = (no-member)
+}
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disabled": onnxrt.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": onnxrt.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": onnxrt.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": onnxrt.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+EXECUTION_MODES = {
+    "sequential": onnxrt.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": onnxrt.ExecutionMode.ORT_PARALLEL,
+}
+
+QUANT_FORMATS = {
+    "qdq": QuantFormat.QDQ,
+    "qoperator": QuantFormat.QOperator,
+}
+# activation types recommended by ONNX Runtime for x86-64 CPUs
+QUANT_ACTIVATION_TYPES = {
+    "qdq": QuantType.QInt8,
+    "qoperator": QuantType.QUInt8,
+}
+CALIBRATION_METHODS = {
+    "minmax": CalibrationMethod.MinMax,
+    "entropy": CalibrationMethod.Entropy,
+    "percentile": CalibrationMethod.Percentile,
+}
+
+
+def create_session_options(
+    graph_optimization_level: str = "basic",
+    intra_op_num_threads: int = 0,
+    inter_op_num_threads: int = 0,
+    execution_mode: str = "sequential",
+    enable_cpu_mem_arena: bool = False,
+    enable_mem_pattern: bool = False,
+) -> onnxrt.SessionOptions:
+    session_options = onnxrt.SessionOptions()
+    session_options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[
+        graph_optimization_level
+    ]
+    # 0 lets ONNX Runtime choose number of threads
+    session_options.intra_op_num_threads = intra_op_num_threads
+    session_options.inter_op_num_threads = inter_op_num_threads
+    session_options.execution_mode = EXECUTION_MODES[execution_mode]
+    session_options.enable_cpu_mem_arena = enable_cpu_mem_arena
+    session_options.enable_mem_pattern = enable_mem_pattern
+    return session_options
+
+
+def create_inference_session(
+    onnx_model_path: str,
+    providers: List[str],
+    cache: Optional[ArtifactCache] = None,
+    graph_optimization_level: str = "basic",
+    **session_options_kwargs,
+) -> Tuple[onnxrt.InferenceSession, bool]:
+    """Create ONNX Runtime session, reusing graph optimized by a previous session.
+
+    Graph optimized by ONNX Runtime is saved in the cache, keyed by the source model,
+    optimization level, providers, ONNX Runtime version and machine. The following
+    sessions load the optimized graph with optimizations disabled, so they start
+    faster.
+
+    Args:
+        onnx_model_path: Path of ONNX model.
+        providers: ONNX Runtime execution providers.
+        cache: Cache of optimized graphs. Optimized graphs are not persisted if not
+            set.
+        graph_optimization_level: Graph optimization level, see
+            `GRAPH_OPTIMIZATION_LEVELS`.
+        **session_options_kwargs: Other options of `create_session_options`.
+
+    Returns:
+        ONNX Runtime session and whether it was created from a cached optimized graph.
+    """
+    if cache is None or graph_optimization_level == "disabled":
+        session_options = create_session_options(
+            graph_optimization_level=graph_optimization_level,
+            **session_options_kwargs,
+        )
+        session = onnxrt.InferenceSession(
+            onnx_model_path, providers=providers, sess_options=session_options
+        )
+        return session, False
+
+    cache_key = compute_cache_key(
+        {
+            "onnx_model": os.path.basename(onnx_model_path),
+            "graph_optimization_level": graph_optimization_level,
+            "providers": providers,
+            "onnxruntime_version": onnxrt.__version__,
+            # highest level may apply optimizations specific to the hardware
+            "machine": platform.machine(),
+        }
+    )
+    model_name = os.path.splitext(os.path.basename(onnx_model_path))[0]
+    cache_entry = f"{model_name}-optimized-{cache_key[:16]}"
+    optimized_model_path = cache.lookup(key=cache_entry, suffix=".onnx")
+    if optimized_model_path is not None:
+        session_options = create_session_options(
+            graph_optimization_level="disabled", **session_options_kwargs
+        )
+        session = onnxrt.InferenceSession(
+            optimized_model_path, providers=providers, sess_options=session_options
+        )
+        return session, True
+
+    sessions: List[onnxrt.InferenceSession] = []
+
+    def create_and_save_optimized(path: str) -> None:
+        session_options = create_session_options(
+            graph_optimization_level=graph_optimization_level,
+            **session_options_kwargs,
+        )
+        session_options.optimized_model_filepath = path
+        sessions.append(
+            onnxrt.InferenceSession(
+                onnx_model_path, providers=providers, sess_options=session_options
+            )
+        )
+
+    cache.store(
+        key=cache_entry, suffix=".onnx", write_artifact=create_and_save_optimized
+    )
+    return sessions[0], False
+
+
+class OnnxCalibrationDataReader(CalibrationDataReader):
+    """Feeds calibration batches to ONNX Runtime static quantization."""
+
+    def __init__(self, input_name: str, batches: List[np.ndarray]):
+        self.input_name = input_name
+        self.batches = batches
+        self._iterator = iter(batches)
+
+    def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+        batch = next(self._iterator, None)
+        if batch is None:
+            return None
+
+        return {self.input_name: batch}
+
+    def rewind(self) -> None:
+        self._iterator = iter(self.batches)
+
+
+def quantize_onnx_model(
+    onnx_model_path: str,
+    quantized_model_path: str,
+    calibration_batches: List[np.ndarray],
+    quant_format: str = "qdq",
+    calibration_method: str = "minmax",
+    per_channel: bool = False,
+) -> None:
+    """Quantize ONNX model to INT8 with ONNX Runtime static quantization.
+
+    Args:
+        onnx_model_path: Path of FP32 ONNX model.
+        quantized_model_path: Path where the quantized model is saved.
+        calibration_batches: Input batches used to compute activation ranges.
+        quant_format: Format of the quantized model, see `QUANT_FORMATS`.
+        calibration_method: Method of computing activation ranges, see
+            `CALIBRATION_METHODS`.
+        per_channel: Whether to quantize weights per channel.
+    """
+    onnx_model = onnx.load(onnx_model_path, load_external_data=False)
+    data_reader = OnnxCalibrationDataReader(
+        input_name=onnx_model.graph.input[0].name, batches=calibration_batches
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # shape inference and graph fusions let more tensors be quantized
+        preprocessed_model_path = os.path.join(tmp_dir, "preprocessed.onnx")
+        quant_pre_process(
+            input_model_path=onnx_model_path,
+            output_model_path=preprocessed_model_path,
+        )
+        quantize_static(
+            model_input=preprocessed_model_path,
+            model_output=quantized_model_path,
+            calibration_data_reader=data_reader,
+            quant_format=QUANT_FORMATS[quant_format],
+            activation_type=QUANT_ACTIVATION_TYPES[quant_format],
+            weight_type=QuantType.QInt8,
+            calibrate_method=CALIBRATION_METHODS[calibration_method],
+            per_channel=per_channel,
+        )
+
+
+class OnnxIOBindingRunner:
+    """Runs ONNX Runtime session on torch tensors without copying inputs and outputs.
+
+    Input and output names are resolved once. Inputs are bound by their memory
+    address and outputs are written by ONNX Runtime into preallocated torch tensors,
+    reused by every call with the same input shape. A returned tensor is therefore
+    overwritten by the next call with the same input shape.
+    """
+
+    def __init__(self, session: onnxrt.InferenceSession):
+        self.session = session
+        self.input_name: str = session.get_inputs()[0].name
+        self.outputs = session.get_outputs()
+        self.io_binding = session.io_binding()
+        self._output_buffers: Dict[Tuple[int, ...], List[torch.Tensor]] = {}
+
+    def _get_output_buffers(self, sample: torch.Tensor) -> Optional[List[torch.Tensor]]:
+        input_shape = tuple(sample.shape)
+        if input_shape not in self._output_buffers:
+            buffers: List[torch.Tensor] = []
+            for output in self.outputs:
+                # first dimension is the dynamic batch size
+                shape = [sample.shape[0], *output.shape[1:]]
+                if not all(isinstance(dim, int) for dim in shape):
+                    return None
+                buffers.append(
+                    torch.empty(
+                        shape,
+                        dtype=ONNX_TO_TORCH_DTYPE[output.type],
+                        device=sample.device,
+                    )
+                )
+            self._output_buffers[input_shape] = buffers
+
+        return self._output_buffers[input_shape]
+
+    def __call__(self, sample: torch.Tensor) -> torch.Tensor:
+        # no-op for contiguous tensors, ONNX Runtime expects dense NCHW layout
+        sample = sample.contiguous()
+        device_type = sample.device.type
+        device_id = sample.device.index or 0
+        self.io_binding.bind_input(
+            name=self.input_name,
+            device_type=device_type,
+            device_id=device_id,
+            element_type=TORCH_TO_NUMPY_DTYPE[sample.dtype],
+            shape=tuple(sample.shape),
+            buffer_ptr=sample.data_ptr(),
+        )
+
+        output_buffers = self._get_output_buffers(sample)
+        if output_buffers is None:
+            # output shape is not known in advance, let ONNX Runtime allocate it
+            for output in self.outputs:
+                self.io_binding.bind_output(output.name, device_type, device_id)
+            self.session.run_with_iobinding(self.io_binding)
+            output_buffers = [
+                torch.from_numpy(item) for item in self.io_binding.copy_outputs_to_cpu()
+            ]
+        else:
+            for output, buffer in zip(self.outputs, output_buffers):
+                self.io_binding.bind_output(
+                    name=output.name,
+                    device_type=device_type,
+                    device_id=device_id,
+                    element_type=TORCH_TO_NUMPY_DTYPE[buffer.dtype],
+                    shape=tuple(buffer.shape),
+                    buffer_ptr=buffer.data_ptr(),
+                )
+            self.session.run_with_iobinding(self.io_binding)
+
+        if len(output_buffers) == 1:
+            return output_buffers[0]
+
+        return torch.vstack(  # pylint: disable = (no-member)
+            [item.float() for item in output_buffers]
+        )
@@ -0,0 +1,103 @@
+# pylint: disable = (missing-module-docstring)
+
+import contextlib
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import torch
+
+from src.latency_stats import NS_IN_MS
+from src.memory import MemoryMonitor
+
+# cold start phases in the order they happen, from loading the model to the end
+# of the warmup
+COLD_START_PHASES: Tuple[str, ...] = (
+    "model_load",
+    "conversion",
+    "session_creation",
+    "first_inference",
+    "warmup",
+)
+# all phases of a benchmark run, preparation of the dataset and the timed inference
+# are not a part of the cold start of the model
+BENCHMARK_PHASES: Tuple[str, ...] = (
+    "dataset_preparation",
+    *COLD_START_PHASES,
+    "inference",
+)
+
+
+class PhaseRecorder:
+    """Records wall-clock time and peak memory of phases of a benchmark.
+
+    Time of a phase entered many times is accumulated. Queued CUDA kernels are
+    synchronized at the end of every phase, so asynchronous work is attributed to the
+    phase that launched it. Memory is measured only if a memory monitor is set.
+    """
+
+    def __init__(self, memory_monitor: Optional[MemoryMonitor] = None):
+        self.phase_times: Dict[str, float] = {}
+        self.memory_monitor = memory_monitor
+
+    def reset(self) -> None:
+        self.phase_times = {}
+        if self.memory_monitor is not None:
+            self.memory_monitor.reset()
+
+    def record(self, name: str, elapsed_time: float) -> None:
+        if name not in BENCHMARK_PHASES:
+            raise RuntimeError(
+                f"Unknown benchmark phase {name}, known phases: {BENCHMARK_PHASES}"
+            )
+        self.phase_times[name] = self.phase_times.get(name, 0.0) + elapsed_time
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        if self.memory_monitor is not None:
+            self.memory_monitor.start_phase(name)
+        start_time = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            if torch.cuda.is_available() and torch.cuda.is_initialized():
+                torch.cuda.synchronize()
+            self.record(name, (time.perf_counter_ns() - start_time) / NS_IN_MS)
+            # memory is read after the phase is timed
+            if self.memory_monitor is not None:
+                self.memory_monitor.end_phase(name)
+
+    def get_max_memory_usage(self) -> Optional[float]:
+        if self.memory_monitor is None:
+            return None
+        return self.memory_monitor.get_max_memory_usage()
+
+    def get_results(self, decimals: int = 5) -> Dict[str, Any]:
+        """Get time of every phase in milliseconds and its peak memory as result fields.
+
+        Args:
+            decimals: Number of decimals of the reported times.
+
+        Returns:
+            Time of every phase, `None` if the benchmark has no such phase, time to
+            first inference, the sum of cold start phases before the warmup, and peak
+            memory of every phase if it is monitored.
+        """
+        results: Dict[str, Any] = {
+            f"{name}_time": (
+                round(self.phase_times[name], decimals)
+                if name in self.phase_times
+                else None
+            )
+            for name in BENCHMARK_PHASES
+        }
+        results["time_to_first_inference"] = round(
+            sum(
+                elapsed_time
+                for name, elapsed_time in self.phase_times.items()
+                if name in COLD_START_PHASES and name != "warmup"
+            ),
+            decimals,
+        )
+        if self.memory_monitor is not None:
+            results.update(self.memory_monitor.get_results(BENCHMARK_PHASES))
+        return results
@@ -0,0 +1,614 @@
+# pylint: disable = (missing-module-docstring)
+
+import copy
+import math
+import time
+from collections import Counter
+from collections.abc import Mapping
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import torch
+from torch.fx.passes.shape_prop import ShapeProp
+from torch.nn.utils import prune
+
+from src.latency_stats import NS_IN_MS
+
+# layers which keep channels of their input in place
+CHANNEL_PRESERVING_MODULES: Tuple[type, ...] = (
+    torch.nn.ReLU,
+    torch.nn.ReLU6,
+    torch.nn.LeakyReLU,
+    torch.nn.GELU,
+    torch.nn.SiLU,
+    torch.nn.Hardswish,
+    torch.nn.Sigmoid,
+    torch.nn.Tanh,
+    torch.nn.Dropout,
+    torch.nn.Identity,
+    torch.nn.MaxPool2d,
+    torch.nn.AvgPool2d,
+    torch.nn.AdaptiveAvgPool2d,
+)
+CHANNEL_PRESERVING_FUNCTIONS = (
+    torch.relu,
+    torch.sigmoid,
+    torch.tanh,
+    torch.nn.functional.relu,
+    torch.nn.functional.relu6,
+    torch.nn.functional.leaky_relu,
+    torch.nn.functional.gelu,
+    torch.nn.functional.silu,
+    torch.nn.functional.hardswish,
+    torch.nn.functional.dropout,
+    torch.nn.functional.max_pool2d,
+    torch.nn.functional.avg_pool2d,
+    torch.nn.functional.adaptive_avg_pool2d,
+)
+CHANNEL_PRESERVING_METHODS: Tuple[str, ...] = ("relu", "sigmoid", "tanh")
+NORMALIZATION_MODULES: Tuple[type, ...] = (torch.nn.BatchNorm1d, torch.nn.BatchNorm2d)
+
+
+class PruningChain:
+    """Layer whose output channels are consumed by exactly one other layer."""
+
+    def __init__(
+        self,
+        producer: str,
+        consumer: str,
+        norms: List[str],
+        features_per_channel: int,
+    ):
+        self.producer = producer
+        self.consumer = consumer
+        # normalization layers between producer and consumer, pruned with producer
+        self.norms = norms
+        # number of consumer input features per producer channel, e.g. after flatten
+        self.features_per_channel = features_per_channel
+
+
+def trace_model(
+    model: torch.nn.Module,
+    example_input: torch.Tensor,
+) -> torch.fx.GraphModule:
+    try:
+        graph_module = torch.fx.symbolic_trace(model)
+    except Exception as error:
+        raise RuntimeError(
+            f"Model {model.__class__.__name__} cannot be traced with torch.fx: {error}"
+        ) from error
+
+    # records output shape of every node in its `tensor_meta`
+    with torch.no_grad():
+        ShapeProp(graph_module).propagate(example_input)
+    return graph_module
+
+
+def count_parameters(model: torch.nn.Module) -> int:
+    return sum(parameter.numel() for parameter in model.parameters())
+
+
+def count_flops(graph_module: torch.fx.GraphModule) -> int:
+    """Count FLOPs per sample of convolution and linear layers.
+
+    Args:
+        graph_module: Traced model with shapes propagated by `trace_model`.
+
+    Returns:
+        Number of floating point operations per sample, a multiply-add counts as two.
+    """
+    modules = dict(graph_module.named_modules())
+    flops = 0
+    batch_size = 1
+    for node in graph_module.graph.nodes:
+        if node.op == "placeholder" and "tensor_meta" in node.meta:
+            batch_size = node.meta["tensor_meta"].shape[0]
+        if node.op != "call_module":
+            continue
+        module = modules[node.target]
+        output_shape = node.meta["tensor_meta"].shape
+        if isinstance(module, torch.nn.Conv2d):
+            flops += (
+                2
+                * math.prod(output_shape)
+                * (module.in_channels // module.groups)
+                * math.prod(module.kernel_size)
+            )
+        elif isinstance(module, torch.nn.Linear):
+            flops += 2 * math.prod(output_shape) * module.in_features
+
+    return flops // batch_size
+
+
+def _is_prunable_layer(module: torch.nn.Module) -> bool:
+    if isinstance(module, torch.nn.Conv2d):
+        # channels of grouped convolutions depend on each other
+        return module.groups == 1
+
+    return isinstance(module, torch.nn.Linear)
+
+
+def _is_flatten(node: torch.fx.Node, modules: Dict[str, torch.nn.Module]) -> bool:
+    # only flattening of all dimensions except batch keeps channels contiguous
+    if node.op == "call_module":
+        module = modules[node.target]
+        return (
+            isinstance(module, torch.nn.Flatten)
+            and module.start_dim == 1
+            and module.end_dim == -1
+        )
+    if (node.op == "call_function" and node.target is torch.flatten) or (
+        node.op == "call_method" and node.target == "flatten"
+    ):
+        start_dim = (
+            node.args[1] if len(node.args) > 1 else node.kwargs.get("start_dim", 0)
+        )
+        end_dim = node.args[2] if len(node.args) > 2 else node.kwargs.get("end_dim", -1)
+        return start_dim == 1 and end_dim == -1
+
+    return False
+
+
+def find_pruning_chains(graph_module: torch.fx.GraphModule) -> List[PruningChain]:
+    """Find Conv2d and Linear layers whose output channels can be removed.
+
+    Output of a producer layer has to reach a single consumer layer only through
+    normalization, activation, pooling, dropout and flatten layers. Outputs with
+    multiple users, e.g. residual connections, and grouped convolutions are skipped.
+
+    Args:
+        graph_module: Traced model with shapes propagated by `trace_model`.
+
+    Returns:
+        Chains of producer and consumer layers.
+    """
+    modules = dict(graph_module.named_modules())
+    # weights of layers called more than once are shared between graph nodes,
+    # stateless layers like activations can be shared
+    call_counts = Counter(
+        node.target for node in graph_module.graph.nodes if node.op == "call_module"
+    )
+    chains: List[PruningChain] = []
+    for node in graph_module.graph.nodes:
+        if (
+            node.op != "call_module"
+            or not _is_prunable_layer(modules[node.target])
+            or call_counts[node.target] != 1
+        ):
+            continue
+
+        is_conv = isinstance(modules[node.target], torch.nn.Conv2d)
+        norms: List[str] = []
+        features_per_channel = 1
+        is_flattened = False
+        consumer: Optional[str] = None
+        current = node
+        while len(current.users) == 1:
+            user = next(iter(current.users))
+            if user.all_input_nodes != [current]:
+                break
+            if _is_flatten(user, modules):
+                if not is_conv or is_flattened:
+                    break
+                features_per_channel = math.prod(current.meta["tensor_meta"].shape[2:])
+                is_flattened = True
+            elif user.op == "call_module":
+                module = modules[user.target]
+                if _is_prunable_layer(module):
+                    if call_counts[user.target] != 1:
+                        break
+                    # convolution output reaches linear layer only after flatten
+                    is_consumer_conv = isinstance(module, torch.nn.Conv2d)
+                    if is_consumer_conv == (is_conv and not is_flattened):
+                        consumer = user.target
+                    break
+                if isinstance(module, NORMALIZATION_MODULES):
+                    if is_flattened or call_counts[user.target] != 1:
+                        break
+                    norms.append(user.target)
+                elif not isinstance(module, CHANNEL_PRESERVING_MODULES):
+                    break
+            elif user.op == "call_function":
+                if user.target not in CHANNEL_PRESERVING_FUNCTIONS:
+                    break
+            elif user.op == "call_method":
+                if user.target not in CHANNEL_PRESERVING_METHODS:
+                    break
+            else:
+                break
+            current = user
+
+        if consumer is not None:
+            chains.append(
+                PruningChain(
+                    producer=node.target,
+                    consumer=consumer,
+                    norms=norms,
+                    features_per_channel=features_per_channel,
+                )
+            )
+
+    return chains
+
+
+def select_channels(module: torch.nn.Module, amount: float) -> torch.Tensor:
+    # channels with the smallest L2 norm of weights are removed
+    channel_norms = module.weight.detach().flatten(1).norm(p=2, dim=1)
+    n_kept = max(1, round(len(channel_norms) * (1.0 - amount)))
+    return torch.topk(channel_norms, n_kept).indices.sort().values
+
+
+def slice_layer(
+    module: torch.nn.Module,
+    out_indices: Optional[torch.Tensor] = None,
+    in_indices: Optional[torch.Tensor] = None,
+) -> torch.nn.Module:
+    weight = module.weight.detach()
+    bias = module.bias.detach() if module.bias is not None else None
+    if out_indices is not None:
+        weight = weight[out_indices]
+        bias = bias[out_indices] if bias is not None else None
+    if in_indices is not None:
+        weight = weight[:, in_indices]
+
+    new_module: torch.nn.Module
+    if isinstance(module, torch.nn.Conv2d):
+        new_module = torch.nn.Conv2d(
+            in_channels=weight.shape[1],
+            out_channels=weight.shape[0],
+            kernel_size=module.kernel_size,
+            stride=module.stride,
+            padding=module.padding,
+            dilation=module.dilation,
+            bias=bias is not None,
+            padding_mode=module.padding_mode,
+            device=weight.device,
+            dtype=weight.dtype,
+        )
+    else:
+        new_module = torch.nn.Linear(
+            in_features=weight.shape[1],
+            out_features=weight.shape[0],
+            bias=bias is not None,
+            device=weight.device,
+            dtype=weight.dtype,
+        )
+
+    with torch.no_grad():
+        new_module.weight.copy_(weight)
+        if bias is not None:
+            new_module.bias.copy_(bias)
+
+    return new_module.train(module.training)
+
+
+def slice_norm(module: torch.nn.Module, indices: torch.Tensor) -> torch.nn.Module:
+    new_module = type(module)(
+        num_features=len(indices),
+        eps=module.eps,
+        momentum=module.momentum,
+        affine=module.affine,
+        track_running_stats=module.track_running_stats,
+        device=indices.device,
+    )
+    with torch.no_grad():
+        if module.affine:
+            new_module.weight.copy_(module.weight[indices])
+            new_module.bias.copy_(module.bias[indices])
+        if module.track_running_stats:
+            new_module.running_mean.copy_(module.running_mean[indices])
+            new_module.running_var.copy_(module.running_var[indices])
+            new_module.num_batches_tracked.copy_(module.num_batches_tracked)
+
+    return new_module.to(module.weight.dtype).train(module.training)
+
+
+def count_nonzero_parameters(model: torch.nn.Module) -> int:
+    n_nonzero = 0
+    for module in model.modules():
+        if isinstance(module, SparseLinear):
+            n_nonzero += int(module.weight.values().count_nonzero())
+            if module.bias is not None:
+                n_nonzero += int(module.bias.count_nonzero())
+            continue
+        for name, parameter in module.named_parameters(recurse=False):
+            # pruned `weight` is a masked copy of `weight_orig` parameter
+            if name.endswith("_orig"):
+                parameter = getattr(module, name[: -len("_orig")])
+            n_nonzero += int(parameter.count_nonzero())
+
+    return n_nonzero
+
+
+def find_pareto_optimal(points: List[Tuple[float, ...]]) -> List[bool]:
+    """Find points not dominated by any other point, all coordinates are minimized.
+
+    Args:
+        points: Points to compare.
+
+    Returns:
+        Whether every point lies on the Pareto frontier.
+    """
+    return [
+        not any(
+            all(other_value <= value for other_value, value in zip(other, point))
+            and other != point
+            for other in points
+        )
+        for point in points
+    ]
+
+
+def set_module(model: torch.nn.Module, name: str, module: torch.nn.Module) -> None:
+    parent_name, _, attribute_name = name.rpartition(".")
+    parent = model.get_submodule(parent_name) if parent_name else model
+    setattr(parent, attribute_name, module)
+
+
+def remove_pruned_channels(
+    model: torch.nn.Module,
+    example_input: torch.Tensor,
+    amount: float,
+) -> Tuple[torch.nn.Module, Dict[str, Any]]:
+    """Prune channels with the smallest L2 norm and remove them from the model.
+
+    Unlike pruning masks, pruned Conv2d and Linear layers are replaced with smaller
+    dense layers, together with input channels of their consumers and following
+    normalization layers, so the pruned model needs less compute.
+
+    Args:
+        model: Model to prune, it is modified in place.
+        example_input: Input batch used to trace the model and compute FLOPs.
+        amount: Ratio of removed output channels of every prunable layer.
+
+    Returns:
+        Pruned model and report of parameters and FLOPs before and after pruning.
+    """
+    graph_module = trace_model(model=model, example_input=example_input)
+    params_before = count_parameters(model)
+    flops_before = count_flops(graph_module)
+
+    chains = find_pruning_chains(graph_module)
+    modules = dict(model.named_modules())
+    out_indices: Dict[str, torch.Tensor] = {}
+    in_indices: Dict[str, torch.Tensor] = {}
+    for chain in chains:
+        indices = select_channels(modules[chain.producer], amount=amount)
+        out_indices[chain.producer] = indices
+        for norm in chain.norms:
+            set_module(model, norm, slice_norm(modules[norm], indices))
+        # every channel maps to a contiguous block of flattened features
+        in_indices[chain.consumer] = (
+            indices[:, None] * chain.features_per_channel
+            + torch.arange(chain.features_per_channel, device=indices.device)
+        ).reshape(-1)
+
+    # layer can be both producer and consumer, it is sliced only once
+    for name in set(out_indices) | set(in_indices):
+        set_module(
+            model,
+            name,
+            slice_layer(
+                modules[name],
+                out_indices=out_indices.get(name),
+                in_indices=in_indices.get(name),
+            ),
+        )
+
+    if not chains:
+        print("WARNING: no layer of the model can be pruned structurally.")
+
+    return model, {
+        "n_pruned_layers": len(chains),
+        "params_before": params_before,
+        "params_after": count_parameters(model),
+        "flops_before": flops_before,
+        "flops_after": count_flops(
+            trace_model(model=model, example_input=example_input)
+        ),
+    }
+
+
+class SparseLinear(torch.nn.Module):
+    """Linear layer multiplying inputs by a sparse CSR or BSR weight."""
+
+    def __init__(
+        self,
+        linear: torch.nn.Linear,
+        layout: str = "csr",
+        blocksize: int = 4,
+    ):
+        super().__init__()
+        self.in_features = linear.in_features
+        self.out_features = linear.out_features
+        weight = linear.weight.detach()
+        if layout == "csr":
+            self.register_buffer("weight", weight.to_sparse_csr())
+        elif layout == "bsr":
+            self.register_buffer("weight", weight.to_sparse_bsr((blocksize, blocksize)))
+        else:
+            raise RuntimeError(f"Unknown sparse layout: {layout}")
+        # column vector broadcast over the batch of the transposed output
+        self.register_buffer(
+            "bias",
+            linear.bias.detach().unsqueeze(1) if linear.bias is not None else None,
+        )
+
+    def forward(self, sample: torch.Tensor) -> torch.Tensor:
+        # sparse matrix has to be the left operand: (out, in) @ (in, batch)
+        flat_sample = sample.reshape(-1, self.in_features).t()
+        if self.bias is not None:
+            output = torch.addmm(self.bias, self.weight, flat_sample)
+        else:
+            output = torch.mm(self.weight, flat_sample)
+        return output.t().reshape(*sample.shape[:-1], self.out_features)
+
+
+def is_sparse_compatible(
+    module: torch.nn.Linear,
+    layout: str = "csr",
+    blocksize: int = 4,
+) -> bool:
+    if layout == "bsr":
+        return (
+            module.in_features % blocksize == 0 and module.out_features % blocksize == 0
+        )
+
+    return True
+
+
+def check_sparse_layout(
+    layout: str,
+    blocksize: int,
+    device: torch.device,  # pylint: disable = (no-member)
+) -> None:
+    if layout != "bsr":
+        return
+
+    # BSR matmul is missing on some devices, e.g. on CPU in PyTorch 1.13
+    weight = torch.eye(blocksize, device=device)
+    try:
+        torch.addmm(
+            torch.zeros(blocksize, 1, device=device),
+            weight.to_sparse_bsr((blocksize, blocksize)),
+            torch.ones(blocksize, 1, device=device),
+        )
+    except (RuntimeError, NotImplementedError) as error:
+        raise RuntimeError(
+            f"bsr sparse layout is not supported on {device} by PyTorch "
+            + f"{torch.__version__}, use csr sparse layout."
+        ) from error
+
+
+def convert_to_sparse(
+    model: torch.nn.Module,
+    layout: str = "csr",
+    blocksize: int = 4,
+) -> Tuple[torch.nn.Module, Dict[str, Any]]:
+    """Replace pruned Linear layers with layers using sparse weights.
+
+    Pruning reparametrization is removed first, so zeroed weights become permanent.
+
+    Args:
+        model: Model pruned with `torch.nn.utils.prune`, it is modified in place.
+        layout: Sparse layout of weights, `csr` or `bsr`.
+        blocksize: Size of square blocks of `bsr` layout.
+
+    Returns:
+        Converted model and report of converted layers with sparsity of their weights.
+    """
+    check_sparse_layout(
+        layout=layout, blocksize=blocksize, device=next(model.parameters()).device
+    )
+    n_weights = 0
+    n_zeros = 0
+    n_sparse_layers = 0
+    for name, module in list(model.named_modules()):
+        if hasattr(module, "weight_mask"):
+            prune.remove(module, "weight")
+        if not isinstance(module, torch.nn.Linear) or not is_sparse_compatible(
+            module, layout=layout, blocksize=blocksize
+        ):
+            continue
+        n_weights += module.weight.numel()
+        n_zeros += int((module.weight == 0).sum())
+        set_module(
+            model, name, SparseLinear(module, layout=layout, blocksize=blocksize)
+        )
+        n_sparse_layers += 1
+
+    return model, {
+        "n_sparse_layers": n_sparse_layers,
+        "sparse_layers_sparsity": n_zeros / n_weights if n_weights else 0.0,
+    }
+
+
+def _measure_forward_time(
+    model: torch.nn.Module,
+    example_input: Union[torch.Tensor, Mapping],
+    n_repeats: int,
+) -> float:
+    def forward() -> None:
+        if isinstance(example_input, Mapping):  # tokenized text
+            model(**example_input)
+        else:
+            model(example_input)
+
+    with torch.no_grad():
+        forward()  # warmup
+        times_ns = []
+        for _ in range(n_repeats):
+            start = time.perf_counter_ns()
+            forward()
+            times_ns.append(time.perf_counter_ns() - start)
+
+    return float(np.median(times_ns)) / NS_IN_MS
+
+
+def measure_sparse_crossover(
+    model: torch.nn.Module,
+    example_input: Union[torch.Tensor, Mapping],
+    sparsity_levels: List[float],
+    layout: str = "csr",
+    blocksize: int = 4,
+    n_repeats: int = 20,
+) -> Dict[str, Any]:
+    """Find sparsity of Linear layers above which the sparse model beats dense one.
+
+    At each sparsity level every Linear layer of a copy of the model is pruned with
+    L1 unstructured pruning and the whole model is timed end to end on
+    `example_input`, with dense weights containing zeros and with sparse weights.
+
+    Args:
+        model: Model with Linear layers, it is not modified.
+        example_input: Input batch of the model.
+        sparsity_levels: Sparsity levels to measure.
+        layout: Sparse layout of weights, `csr` or `bsr`.
+        blocksize: Size of square blocks of `bsr` layout.
+        n_repeats: Number of timed forward passes of every model, median is used.
+
+    Returns:
+        Dense and sparse time of the model in milliseconds at every sparsity level
+        and the lowest level from which sparse execution is faster, None if it is
+        never faster.
+    """
+    check_sparse_layout(
+        layout=layout, blocksize=blocksize, device=next(model.parameters()).device
+    )
+    sparsity_levels = sorted(sparsity_levels)
+    dense_times: List[float] = []
+    sparse_times: List[float] = []
+    for level in sparsity_levels:
+        dense_model = copy.deepcopy(model).eval()
+        for module in dense_model.modules():
+            if isinstance(module, torch.nn.Linear) and is_sparse_compatible(
+                module, layout=layout, blocksize=blocksize
+            ):
+                prune.l1_unstructured(module, name="weight", amount=level)
+                prune.remove(module, "weight")
+        sparse_model, _ = convert_to_sparse(
+            copy.deepcopy(dense_model), layout=layout, blocksize=blocksize
+        )
+        dense_times.append(
+            round(_measure_forward_time(dense_model, example_input, n_repeats), 5)
+        )
+        sparse_times.append(
+            round(_measure_forward_time(sparse_model, example_input, n_repeats), 5)
+        )
+        del dense_model, sparse_model
+
+    # sparse execution wins from the lowest level after which it is always faster
+    crossover_sparsity: Optional[float] = None
+    for level, dense_time, sparse_time in reversed(
+        list(zip(sparsity_levels, dense_times, sparse_times))
+    ):
+        if sparse_time >= dense_time:
+            break
+        crossover_sparsity = level
+
+    return {
+        "sparse_crossover_levels": sparsity_levels,
+        "sparse_crossover_dense_time": dense_times,
+        "sparse_crossover_sparse_time": sparse_times,
+        "sparse_crossover_sparsity": crossover_sparsity,
+    }
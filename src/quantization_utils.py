@@ -0,0 +1,160 @@
+# pylint: disable = (missing-module-docstring)
+
+import fnmatch
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+from torch.ao.quantization import get_default_qconfig_mapping
+from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+# module types supported by dynamic quantization, convolutions are not supported
+DYNAMIC_QUANTIZATION_MODULES: Tuple[type, ...] = (
+    torch.nn.Linear,
+    torch.nn.LSTM,
+    torch.nn.GRU,
+)
+DYNAMIC_QUANTIZATION_DTYPES = {
+    "qint8": torch.qint8,  # pylint: disable = (no-member)
+    "float16": torch.float16,  # pylint: disable = (no-member)
+}
+DYNAMIC_QUANTIZATION_QCONFIGS = {
+    "qint8": torch.quantization.default_dynamic_qconfig,
+    "float16": torch.quantization.float16_dynamic_qconfig,
+}
+DYNAMIC_QUANTIZATION_WEIGHT_BYTES = {
+    "qint8": 1,
+    "float16": 2,
+}
+STATIC_QUANTIZATION_BACKENDS: Tuple[str, ...] = ("x86", "fbgemm", "qnnpack")
+
+
+def select_dynamic_quantization_modules(
+    model: torch.nn.Module,
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+) -> List[str]:
+    """Select names of modules converted by dynamic quantization.
+
+    Args:
+        model: Model to quantize.
+        include: Patterns of module names to quantize, e.g. `encoder.layer.*`. All
+            supported modules are quantized if not set.
+        exclude: Patterns of module names not to quantize, e.g. `classifier`.
+
+    Returns:
+        Qualified names of selected modules.
+    """
+    module_names: List[str] = []
+    for name, module in model.named_modules():
+        if not isinstance(module, DYNAMIC_QUANTIZATION_MODULES):
+            continue
+        if include and not any(fnmatch.fnmatch(name, item) for item in include):
+            continue
+        if exclude and any(fnmatch.fnmatch(name, item) for item in exclude):
+            continue
+        module_names.append(name)
+
+    return module_names
+
+
+def compute_parameter_bytes(model: torch.nn.Module) -> int:
+    return sum(
+        parameter.numel() * parameter.element_size() for parameter in model.parameters()
+    )
+
+
+def quantize_dynamic_modules(
+    model: torch.nn.Module,
+    dtype: str = "qint8",
+    include: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+) -> Tuple[torch.nn.Module, Dict[str, Any]]:
+    """Apply dynamic quantization to selected Linear, LSTM and GRU modules.
+
+    Args:
+        model: Model to quantize, it is not modified.
+        dtype: Weight dtype of quantized modules, see `DYNAMIC_QUANTIZATION_DTYPES`.
+        include: Patterns of module names to quantize.
+        exclude: Patterns of module names not to quantize.
+
+    Returns:
+        Quantized model and report of converted modules with the weight bytes of the
+        model before and after quantization.
+    """
+    module_names = select_dynamic_quantization_modules(
+        model=model, include=include, exclude=exclude
+    )
+    quantized_model = torch.quantization.quantize_dynamic(
+        model=model,
+        qconfig_spec={
+            name: DYNAMIC_QUANTIZATION_QCONFIGS[dtype] for name in module_names
+        },
+        dtype=DYNAMIC_QUANTIZATION_DTYPES[dtype],
+    )
+
+    # module is converted only if its type was swapped for a quantized one
+    original_modules = dict(model.named_modules())
+    quantized_modules = dict(quantized_model.named_modules())
+    converted_modules = [
+        name
+        for name in module_names
+        if type(quantized_modules[name]) is not type(original_modules[name])
+    ]
+
+    # packed weights of quantized modules are not parameters, so they are computed
+    # from the weights of the original modules
+    weight_bytes_before = compute_parameter_bytes(model)
+    weight_bytes_after = weight_bytes_before
+    for name in converted_modules:
+        for parameter_name, parameter in original_modules[name].named_parameters():
+            if "weight" in parameter_name:
+                weight_bytes_after -= parameter.numel() * (
+                    parameter.element_size() - DYNAMIC_QUANTIZATION_WEIGHT_BYTES[dtype]
+                )
+
+    if not converted_modules:
+        print("WARNING: dynamic quantization did not convert any module.")
+
+    return quantized_model, {
+        "quantized_modules": converted_modules,
+        "n_quantized_modules": len(converted_modules),
+        "weight_bytes_before": weight_bytes_before,
+        "weight_bytes_after": weight_bytes_after,
+    }
+
+
+def set_quantized_engine(backend: str) -> None:
+    if backend not in torch.backends.quantized.supported_engines:
+        raise RuntimeError(
+            f"Quantization backend {backend} is not supported on this machine, "
+            + f"supported backends: {torch.backends.quantized.supported_engines}"
+        )
+    torch.backends.quantized.engine = backend
+
+
+def quantize_static_fx(
+    model: torch.nn.Module,
+    calibration_batches: List[torch.Tensor],
+    backend: str = "x86",
+) -> torch.nn.Module:
+    """Apply FX graph mode static post-training quantization.
+
+    Args:
+        model: Model to quantize in eval mode.
+        calibration_batches: Input batches used to compute activation ranges.
+        backend: Quantized kernels backend, see `STATIC_QUANTIZATION_BACKENDS`.
+
+    Returns:
+        Quantized model.
+    """
+    set_quantized_engine(backend)
+    prepared_model = prepare_fx(
+        model,
+        qconfig_mapping=get_default_qconfig_mapping(backend),
+        example_inputs=(calibration_batches[0],),
+    )
+    with torch.no_grad():
+        for batch in calibration_batches:
+            prepared_model(batch)
+
+    return convert_fx(prepared_model)
@@ -0,0 +1,143 @@
+# pylint: disable = (missing-module-docstring)
+
+import json
+import sqlite3
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+# benchmarks running the model in INT8, whatever `use_fp16` is
+INT8_BENCHMARK_NAMES = (
+    "BenchmarkTensorPTQ",
+    "BenchmarkTensorDynamicQuantization",
+    "BenchmarkTensorStaticQuantization",
+    "BenchmarkONNXInt8",
+)
+# columns results are looked up by, each result is stored as JSON next to them
+INDEXED_COLUMNS = ("model_name", "benchmark_type", "precision", "batch_size")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    model_name TEXT NOT NULL,
+    benchmark_type TEXT,
+    benchmark_name TEXT NOT NULL,
+    precision TEXT NOT NULL,
+    batch_size INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_lookup
+    ON results (model_name, benchmark_type, precision, batch_size);
+"""
+
+
+def get_precision(data: Dict[str, Any]) -> str:
+    if data["benchmark_name"] in INT8_BENCHMARK_NAMES:
+        if data.get("dynamic_quantization_dtype") == "float16":
+            return "fp16"
+        return "int8"
+
+    return "fp16" if data.get("use_fp16") else "fp32"
+
+
+class ResultsStore:
+    """Append-only SQLite store of benchmark results.
+
+    Every result is inserted in its own transaction and existing results are never
+    rewritten, so benchmark processes can append to the same store concurrently.
+    Results are looked up by model, benchmark type, precision and batch size.
+    """
+
+    def __init__(self, path: str, timeout: float = 60.0):
+        # concurrent writers wait for each other up to `timeout` seconds
+        self.connection = sqlite3.connect(path, timeout=timeout)
+        # readers do not block writers in write-ahead log mode
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self) -> "ResultsStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def append(
+        self,
+        model_name: str,
+        data: Dict[str, Any],
+        benchmark_type: Optional[str] = None,
+    ) -> None:
+        """Append result of a benchmark.
+
+        Args:
+            model_name: Name of the benchmarked model.
+            data: Result of the benchmark.
+            benchmark_type: Benchmark type, see `BACKENDS`, `None` if it is unknown,
+                e.g. for imported results.
+        """
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO results (created_at, model_name, benchmark_type, "
+                + "benchmark_name, precision, batch_size, data) "
+                + "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    time.time(),
+                    model_name,
+                    benchmark_type,
+                    data["benchmark_name"],
+                    get_precision(data),
+                    data["batch_size"],
+                    json.dumps(data),
+                ),
+            )
+
+    def get_model_names(self) -> List[str]:
+        rows = self.connection.execute(
+            "SELECT DISTINCT model_name FROM results ORDER BY model_name"
+        )
+        return [model_name for (model_name,) in rows]
+
+    def query(self, **filters: Any) -> Iterator[Dict[str, Any]]:
+        """Iterate over results in the order they were appended.
+
+        Results are read from the database lazily, one by one.
+
+        Args:
+            filters: Values of `INDEXED_COLUMNS` the results must have, filters set
+                to `None` are ignored.
+
+        Returns:
+            Iterator over results with values of `INDEXED_COLUMNS`.
+        """
+        unknown_columns = set(filters) - set(INDEXED_COLUMNS)
+        if unknown_columns:
+            raise RuntimeError(
+                f"Unknown result columns {sorted(unknown_columns)}, "
+                + f"known columns: {INDEXED_COLUMNS}"
+            )
+
+        conditions = {
+            column: value for column, value in filters.items() if value is not None
+        }
+        where = " AND ".join(f"{column} = ?" for column in conditions)
+        cursor = self.connection.execute(
+            f"SELECT {', '.join(INDEXED_COLUMNS)}, data FROM results"
+            + (f" WHERE {where}" if where else "")
+            + " ORDER BY id",
+            tuple(conditions.values()),
+        )
+        for *values, data in cursor:
+            yield {**json.loads(data), **dict(zip(INDEXED_COLUMNS, values))}
+
+
+def append_result(
+    path: str,
+    model_name: str,
+    data: Dict[str, Any],
+    benchmark_type: Optional[str] = None,
+) -> None:
+    with ResultsStore(path) as store:
+        store.append(model_name=model_name, data=data, benchmark_type=benchmark_type)
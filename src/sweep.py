@@ -0,0 +1,44 @@
+# pylint: disable = (missing-module-docstring)
+
+import itertools
+import json
+from typing import Any, Dict, List
+
+
+def load_sweep_spec(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as file:
+        spec = json.load(file)
+
+    if "matrix" not in spec:
+        raise RuntimeError(f"Sweep spec has no 'matrix' entry: {path}")
+
+    return spec
+
+
+def expand_sweep_spec(spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Expand sweep spec into a list of benchmark configurations.
+
+    Spec consists of `defaults`, shared by all configurations, and `matrix`, a list of
+    groups of options. Every option whose value is a list is a sweep axis and the
+    cartesian product of all axes of a group is generated. To pass a list-valued
+    option wrap it in another list.
+
+    Args:
+        spec: Sweep specification.
+
+    Returns:
+        List of benchmark configurations, one dict of options per run.
+    """
+    defaults: Dict[str, Any] = spec.get("defaults", {})
+    configs: List[Dict[str, Any]] = []
+    for group in spec["matrix"]:
+        options = {**defaults, **group}
+        keys = list(options.keys())
+        axes = [
+            options[key] if isinstance(options[key], list) else [options[key]]
+            for key in keys
+        ]
+        for values in itertools.product(*axes):
+            configs.append(dict(zip(keys, values)))
+
+    return configs